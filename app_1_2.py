@@ -3,117 +3,192 @@
 import streamlit as st
 import pandas as pd
 
-import base64
 import io
 import json
-import requests
-
-# ----------------- CONFIG GITHUB -----------------
-GITHUB_TOKEN = st.secrets["github"]["token"]
-GITHUB_REPO = st.secrets["github"]["repo"]       # es. "andreapoi/FantaTennis"
-GITHUB_BRANCH = st.secrets["github"]["branch"]   # es. "main"
-
-GITHUB_API_BASE = f"https://api.github.com/repos/{GITHUB_REPO}/contents"
+import os
+import uuid
+
+from ft_backend.io.github_store import GitHubConfig
+from ft_backend.io.multipliers import canonical_columns, load_multipliers, read_multipliers_frame
+from ft_backend.io.results_partitions import PartitionedResults
+from ft_backend.io.stores import CachedStore, LocalStore, ParsedCache, open_store, preload
+from ft_backend.io.write_queue import WriteBehindQueue
+from ft_backend.compute.breakdown import FLAG_NAMES, ComponentStore
+from ft_backend.compute.multipliers import MultiplierStore, apply_history, row_ids
+from ft_backend.compute.scored_results import ScoredResults, results_fingerprint
+from ft_backend.compute.projections import ProjectionStore, season_projection
+from ft_backend.compute.scoring import BONUS_FLAGS, MALUS_FLAGS
+from ft_backend.config import RepoPaths
+from ft_backend.compute.squad_optimizer import optimize_squad
+
+# ----------------- CONFIG STORAGE -----------------
+# FT_STORE: "github" (default, da st.secrets), "local:<dir>" o "memory".
+# FT_STORE_MIRROR: directory locale da cui servire le letture (read-through);
+# FT_STORE_TTL: secondi di validità delle copie in cache (default 60).
+try:
+    GITHUB_SECRETS = dict(st.secrets["github"])
+except Exception:
+    GITHUB_SECRETS = {}
 
 PLAYERS_PATH = "data/players.csv"
 TEAMS_PATH = "data/teams.json"
-RESULTS_PATH = "data/results.csv"
+RESULTS_PATH = "data/results.csv"          # legacy: letto solo finché non esiste l'indice
+RESULTS_DIR = "data/results"                # partizioni per torneo + index.json
 MULTIPLIERS_PATH = "data/ranking_multipliers.csv"
-
-
-def _github_headers():
-    return {
-        "Authorization": f"token {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github+json",
-    }
+# storico versionato dei moltiplicatori (per id_player, validità da/a)
+MULTIPLIER_HISTORY_PATH = RepoPaths().multiplier_history_csv
+# mart proiezioni (disco locale del processo, non lo store condiviso)
+PROJECTIONS_DIR = os.getenv("FT_PROJECTIONS_DIR", RepoPaths().processed_marts_dir)
+
+
+@st.cache_resource
+def get_store():
+    """Backend unico per processo (condiviso tra sessioni), avvolto nella cache read-through."""
+    spec = os.getenv("FT_STORE", "github")
+    cfg = None
+    if spec == "github":
+        cfg = GitHubConfig(
+            token=GITHUB_SECRETS["token"],
+            repo=GITHUB_SECRETS["repo"],        # es. "andreapoi/FantaTennis"
+            branch=GITHUB_SECRETS.get("branch", "main"),
+        )
+    backend = open_store(spec, cfg)
+    mirror = os.getenv("FT_STORE_MIRROR")
+    return CachedStore(backend, LocalStore(mirror) if mirror else None, ttl=float(os.getenv("FT_STORE_TTL", "60")))
 
 
 def load_file_from_github(path: str):
     """
     Ritorna (content_bytes, sha) se il file esiste,
-    altrimenti (None, None).
+    altrimenti (None, None). Legge dal backend configurato (GitHub di default).
     """
-    url = f"{GITHUB_API_BASE}/{path}"
-    resp = requests.get(url, headers=_github_headers())
-    if resp.status_code == 200:
-        data = resp.json()
-        # "content" è base64
-        content_b64 = data["content"]
-        sha = data["sha"]
-        content = base64.b64decode(content_b64)
-        return content, sha
-    elif resp.status_code == 404:
-        return None, None
-    else:
-        st.error(f"Errore GitHub GET {path}: {resp.status_code} - {resp.text}")
+    try:
+        return get_store().read_bytes(path)
+    except RuntimeError as e:
+        st.error(f"Errore lettura {path}: {e}")
         return None, None
 
 
-def save_file_to_github(path: str, content_bytes: bytes, message: str):
+def save_file_to_github(path: str, content, message: str, key=None) -> int:
     """
-    Crea o aggiorna un file su GitHub nel repo configurato.
+    Accoda la scrittura di un file nel backend configurato (commit su GitHub di default)
+    e ritorna subito il numero di sequenza. `content` sono bytes o una funzione che li
+    produce (serializzazione in background). Salvataggi ravvicinati dello stesso path
+    (o della stessa `key`) diventano un solo commit; lo stato è in get_write_queue().status().
     """
-    url = f"{GITHUB_API_BASE}/{path}"
-    existing_content, existing_sha = load_file_from_github(path)
+    return get_write_queue().submit(path, content, message, key=key)
+
+
+def session_write_key(path: str) -> str:
+    """Chiave di coda per scritture che non vanno fuse con quelle di altre sessioni."""
+    if "write_session" not in st.session_state:
+        st.session_state.write_session = uuid.uuid4().hex[:12]
+    return f"{path}#{st.session_state.write_session}"
 
-    payload = {
-        "message": message,
-        "content": base64.b64encode(content_bytes).decode("utf-8"),
-        "branch": GITHUB_BRANCH,
-    }
-    if existing_sha is not None:
-        payload["sha"] = existing_sha
 
-    resp = requests.put(url, headers=_github_headers(), data=json.dumps(payload))
-    if resp.status_code not in (200, 201):
-        st.error(f"Errore GitHub PUT {path}: {resp.status_code} - {resp.text}")
-    return resp
+@st.cache_resource
+def get_write_queue() -> WriteBehindQueue:
+    """Coda write-behind unica per processo, sopra lo stesso store delle letture."""
+    return WriteBehindQueue(get_store(), delay=float(os.getenv("FT_SAVE_DELAY", "1.5")))
+
+
+def render_save_status() -> None:
+    """Stato dei salvataggi in sidebar: in coda / in scrittura / salvato / errore."""
+    status = get_write_queue().status()
+    if not status:
+        return
+    icons = {"pending": "⏳", "writing": "⬆️", "committed": "✅", "failed": "❌"}
+    st.sidebar.markdown("**Salvataggi**")
+    for key, s in sorted(status.items()):
+        path = s["path"]
+        if key != path and key != session_write_key(path):
+            continue  # scritture per-sessione di altre sessioni
+        line = f"{icons.get(s['state'], '')} `{path}` — {s['state']}"
+        if s["committed_at"] and s["state"] == "committed":
+            line += f" ({s['committed_at'][11:]})"
+        if s["error"]:
+            line += f" — {s['error']}"
+        st.sidebar.caption(line)
 
 
 # -------- PLAYERS (DataFrame) --------
 def load_players_df() -> pd.DataFrame:
-    content, _ = load_file_from_github(PLAYERS_PATH)
+    return parse_players(load_file_from_github(PLAYERS_PATH)[0])
+
+
+def parse_players(content) -> pd.DataFrame:
     if content is None:
         return pd.DataFrame(columns=["Giocatore", "Squadra", "Prezzo"])
     csv_str = content.decode("utf-8")
     return pd.read_csv(io.StringIO(csv_str))
 
 
-def save_players_df(df: pd.DataFrame):
-    csv_bytes = df.to_csv(index=False).encode("utf-8")
-    save_file_to_github(PLAYERS_PATH, csv_bytes, "Update players.csv from app")
+def save_players_df(df: pd.DataFrame) -> int:
+    df = df.copy()
+    return save_file_to_github(PLAYERS_PATH, lambda: df.to_csv(index=False).encode("utf-8"), "Update players.csv from app")
 
 
 # -------- TEAMS (lista di dict) --------
 def load_teams_list():
-    content, _ = load_file_from_github(TEAMS_PATH)
+    return parse_teams(load_file_from_github(TEAMS_PATH)[0])
+
+
+def parse_teams(content) -> list:
     if content is None:
         return []
     json_str = content.decode("utf-8")
     return json.loads(json_str)
 
 
-def save_teams_list(teams: list):
+def save_teams_list(teams: list) -> int:
     json_bytes = json.dumps(teams, ensure_ascii=False, indent=2).encode("utf-8")
-    save_file_to_github(TEAMS_PATH, json_bytes, "Update teams.json from app")
+    return save_file_to_github(TEAMS_PATH, json_bytes, "Update teams.json from app")
 
 
 # -------- RESULTS / STANDINGS --------
-def load_results_df():
-    content, _ = load_file_from_github(RESULTS_PATH)
-    if content is None:
+# I risultati sono partizioni append-only per (Season, Tournament, Tournament Type):
+# un salvataggio scrive solo le righe nuove (o il torneo modificato) e poi l'indice.
+def get_results_partitions() -> PartitionedResults:
+    """Una per sessione: ricorda cosa è stato caricato/salvato per calcolare le differenze."""
+    if "results_partitions" not in st.session_state:
+        st.session_state.results_partitions = PartitionedResults(
+            get_store(), root=RESULTS_DIR, legacy_path=RESULTS_PATH, cache=get_parsed_cache()
+        )
+    return st.session_state.results_partitions
+
+
+def load_results_df(seasons=None) -> pd.DataFrame:
+    """Concatena le partizioni delle stagioni richieste (None = tutte)."""
+    try:
+        return get_results_partitions().load(seasons)
+    except RuntimeError as e:
+        st.error(f"Errore lettura risultati: {e}")
         return pd.DataFrame()
-    csv_str = content.decode("utf-8")
-    return pd.read_csv(io.StringIO(csv_str))
 
 
-def save_results_df(df: pd.DataFrame):
-    csv_bytes = df.to_csv(index=False).encode("utf-8")
-    save_file_to_github(RESULTS_PATH, csv_bytes, "Update results.csv from app")
+def save_results_df(df: pd.DataFrame) -> int:
+    """
+    Accoda il salvataggio: in background si scrivono le sole partizioni cambiate e
+    per ultimo l'indice (il path in coda), quindi più salvataggi ravvicinati della
+    stessa sessione diventano un solo aggiornamento dell'indice. La chiave è per
+    sessione: il commit di un'altra sessione non sostituisce questo in coda, e
+    commit() rilegge e fonde l'indice corrente prima di scriverlo.
+    """
+    df = df.copy()
+    parts = get_results_partitions()
+    return save_file_to_github(
+        parts.index_path,
+        lambda: parts.commit(df, "Append results from app"),
+        "Update results index from app",
+        key=session_write_key(parts.index_path),
+    )
 
 
 def load_multipliers_df():
-    content, _ = load_file_from_github(MULTIPLIERS_PATH)
+    return parse_multipliers(load_file_from_github(MULTIPLIERS_PATH)[0])
+
+
+def parse_multipliers(content) -> pd.DataFrame:
     if content is None:
         return pd.DataFrame(
             columns=[
@@ -123,31 +198,75 @@ def load_multipliers_df():
                 "moltiplicatore malus",
             ]
         )
-    csv_str = content.decode("utf-8")
-    return pd.read_csv(io.StringIO(csv_str))
+    # tab/; /, e utf-8/cp1252: il file reale è tab-separato in cp1252
+    df, _, _ = read_multipliers_frame(content)
+    cols = canonical_columns(df)
+    for c in ("ranking", "moltiplicatore bonus", "moltiplicatore malus", "Prezzo"):
+        if c in cols:
+            df[cols[c]] = pd.to_numeric(df[cols[c]].str.replace(",", ".", regex=False), errors="coerce")
+    return df
 
 
-def save_multipliers_df(df: pd.DataFrame):
-    csv_bytes = df.to_csv(index=False).encode("utf-8")
-    save_file_to_github(
+def save_multipliers_df(df: pd.DataFrame) -> int:
+    df = df.copy()
+    seq = save_file_to_github(
         MULTIPLIERS_PATH,
-        csv_bytes,
+        lambda: df.to_csv(index=False).encode("utf-8"),
         "Update ranking_multipliers.csv from app",
     )
+    record_multiplier_version(df)
+    return seq
+
+
+def record_multiplier_version(df: pd.DataFrame) -> None:
+    """
+    Registra i moltiplicatori salvati come nuova versione dello storico, valida da oggi:
+    i risultati con data del match già giocati restano ai valori di allora.
+    Serve la colonna id_player (lo storico è per id); senza, lo storico non cambia.
+    """
+    if "id_player" not in canonical_columns(df):
+        st.warning("Moltiplicatori senza id_player: storico moltiplicatori non aggiornato.")
+        return
+    # si parte dallo storico sul backend (può averlo aggiornato un'altra sessione)
+    history = MultiplierStore.parse(load_file_from_github(MULTIPLIER_HISTORY_PATH)[0])
+    try:
+        added = history.add_version(df, pd.Timestamp.now())
+    except ValueError as e:
+        st.warning(f"Storico moltiplicatori non aggiornato: {e}")
+        return
+    st.session_state.multiplier_history = history
+    if added:
+        save_file_to_github(MULTIPLIER_HISTORY_PATH, history.to_bytes, "Update multiplier history from app")
 
 
 # -------- INIZIALIZZAZIONE SESSION_STATE DA GITHUB --------
-if "players_df" not in st.session_state:
-    st.session_state.players_df = load_players_df()
+STARTUP_FILES = {
+    "players_df": (PLAYERS_PATH, parse_players),
+    "teams": (TEAMS_PATH, parse_teams),
+    "multipliers_df": (MULTIPLIERS_PATH, parse_multipliers),
+    "multiplier_history": (MULTIPLIER_HISTORY_PATH, MultiplierStore.parse),
+}
 
-if "teams" not in st.session_state:
-    st.session_state.teams = load_teams_list()
 
-if "results_df" not in st.session_state:
-    st.session_state.results_df = load_results_df()
+@st.cache_resource
+def get_parsed_cache() -> ParsedCache:
+    """File già parsati per (path, sha), condivisi tra tutte le sessioni del processo."""
+    return ParsedCache()
 
-if "multipliers_df" not in st.session_state:
-    st.session_state.multipliers_df = load_multipliers_df()
+
+# letture in parallelo: una nuova sessione attende la più lenta, non la somma delle quattro
+_missing = {k: spec for k, spec in STARTUP_FILES.items() if k not in st.session_state}
+if "results_df" not in st.session_state:
+    # indice + partizioni (a loro volta in parallelo), insieme agli altri file
+    _missing["results_df"] = get_results_partitions().load
+if _missing:
+    _loaded, _errors = preload(get_store(), _missing, cache=get_parsed_cache())
+    for _key, _value in _loaded.items():
+        st.session_state[_key] = _value
+    for _err in _errors.values():
+        st.error(f"Errore lettura {_err}")
+    if st.session_state.get("results_df") is None:
+        st.session_state.results_df = pd.DataFrame()
 
 if "tournament_df" not in st.session_state:
     st.session_state.tournament_df = None
@@ -167,171 +286,151 @@ st.set_page_config(
 # ------------------------------------------------------
 # COSTANTI PUNTEGGI
 # ------------------------------------------------------
-ROUND_BONUS = {
-    "Slam": {
-        "Winner": 40,
-        "Final": 25,
-        "SF": 18,
-        "QF": 12,
-        "R16": 7,
-        "R32": 4,
-        "R64": 2,
-        "R128": 0,
-    },
-    "1000": {
-        "Winner": 30,
-        "Final": 18,
-        "SF": 12,
-        "QF": 8,
-        "R16": 4,
-        "R32": 2,
-        "R64": 0,
-        "R128": 0,
-    },
-}
-
+# regole (ROUND_BONUS, BONUS_FLAGS/MALUS_FLAGS, ACE_POINT/DF_POINT): ft_backend.compute.scoring
 ALL_TOURNAMENT_TYPES = ["Slam", "1000"]
 ALL_ROUNDS = [
     "Winner", "Final", "SF", "QF", "R16", "R32", "R64", "R128"
 ]
 
-
-def compute_match_points(wins: int, losses: int) -> int:
-    """
-    Punteggio base:
-    - Vittoria: +6
-    - Sconfitta: +1
-    """
-    return wins * 6 + losses * 1
-
-
-def compute_round_bonus(t_type: str, round_reached: str) -> int:
-    """
-    Bonus extra in base al tipo di torneo e al turno raggiunto.
-    """
-    if t_type not in ROUND_BONUS:
-        return 0
-    return ROUND_BONUS[t_type].get(round_reached, 0)
-
-
-# ---------------- BONUS / MALUS SPECIALI ----------------
-BONUS_FLAGS = {
-    "beat_top10": 3,              # Battuto giocatore top 10
-    "beat_top5": 5,               # Battuto giocatore top 5
-    "beat_num1": 8,               # Battuto numero 1
-    "win_straight_sets": 2,       # Vittoria senza perdere set
-    "win_few_games": 3,           # Vittoria lasciando ≤4 game totali
-    "aces_15_plus": 2,            # ≥15 aces nel match
-    "first_serve_80_plus": 2,     # ≥80% punti vinti con la prima
-    "comeback_0_2_slam": 5,       # Rimonta da 0–2 (in Slam)
-    "comeback_0_1_1000": 3,       # Rimonta da 0–1 (nei 1000)
-    "win_in_fifth_slam": 3,       # Vittoria al quinto set (in Slam)
-}
-
-MALUS_FLAGS = {
-    "df_10_plus": -2,             # ≥10 doppi falli
-    "return_pts_lt_30": -1,       # <30% punti vinti in risposta
-    "second_serve_lt_40": -2,     # <40% punti vinti con la seconda
-    "blew_match_point": -3,       # Butta via un match point
-    "lost_from_2_0_slam": -6,     # Perde dopo aver vinto i primi due set (in Slam)
-}
-
-ACE_POINT = 0.5
-DF_POINT = 0.5
-
-MATCH_BOOL_COLUMNS = list(BONUS_FLAGS.keys()) + list(MALUS_FLAGS.keys())
+MATCH_BOOL_COLUMNS = list(BONUS_FLAGS) + list(MALUS_FLAGS)
 
 
 def build_multiplier_dicts():
     """
-    Ritorna due dict:
+    Ritorna (bonus_mult_dict, malus_mult_dict, report):
     - bonus_mult_dict[player_lower] = moltiplicatore bonus
     - malus_mult_dict[player_lower] = moltiplicatore malus
+    - report: MultiplierLoadReport del loader, o il messaggio se il file non è utilizzabile
+
+    Le colonne sono riconosciute anche con alias (Giocatore/player, ...); righe non
+    valide o che non corrispondono a nessun giocatore di players.csv finiscono nel
+    report, che la pagina mostra una volta sola con render_multiplier_report().
     """
     df = st.session_state.get("multipliers_df", None)
     if df is None or df.empty:
-        return {}, {}
+        return {}, {}, None
 
-    df = df.copy()
-    # normalizza nomi colonna
-    df.columns = [c.strip().lower().replace("\ufeff", "") for c in df.columns]
-
-    required = {
-        "ranking",
-        "player",
-        "moltiplicatore bonus",
-        "moltiplicatore malus",
-    }
-    if not required.issubset(df.columns):
-        return {}, {}
+    players_df = st.session_state.get("players_df", None)
+    md = players_df[["Giocatore"]] if players_df is not None and "Giocatore" in players_df.columns and not players_df.empty else None
+    try:
+        table, report = load_multipliers(df, md_players=md)
+    except ValueError as e:
+        return {}, {}, str(e)
+    bonus_dict, malus_dict = table.to_dicts()
+    return bonus_dict, malus_dict, report
 
-    df["key"] = df["player"].astype(str).str.strip().str.lower()
-    bonus_dict = dict(zip(df["key"], df["moltiplicatore bonus"]))
-    malus_dict = dict(zip(df["key"], df["moltiplicatore malus"]))
 
-    return bonus_dict, malus_dict
+def render_multiplier_report(report) -> None:
+    """Avvisi sui moltiplicatori (file non utilizzabile, righe scartate o senza giocatore)."""
+    if isinstance(report, str):
+        st.error(f"ranking_multipliers.csv non utilizzabile, moltiplicatori ignorati: {report}")
+    elif report is not None and (report.invalid or report.unbound):
+        with st.expander(f"⚠️ Moltiplicatori: {report.summary()}", expanded=False):
+            st.dataframe(pd.DataFrame(report.invalid + report.unbound), use_container_width=True)
 
 
-def compute_points_with_multipliers(row, bonus_mult_dict, malus_mult_dict):
+def score_results(df: pd.DataFrame, bonus_mult_dict, malus_mult_dict, history=None, multipliers_df=None):
+    """
+    Punteggi vettorizzati per tutte le righe (una partita per riga):
+    punti base + round bonus + stats + flag, parte positiva/negativa con i moltiplicatori
+    del giocatore. Ritorna (colonne RawPoints..Fantapoints, ComponentStore): il dettaglio
+    punti di un giocatore si chiede dopo allo store (player_breakdown), non per ogni riga.
+    Con lo storico (`history`) le righe con match_date usano i moltiplicatori di quella data.
     """
-    Per ogni riga (una partita):
-    - calcola punti base (vittoria/sconfitta) + round bonus
-    - aggiunge bonus/malus speciali in base ai flag 0/1
-    - separa parte positiva e negativa
-    - applica moltiplicatori bonus/malus per il giocatore
+    components = ComponentStore(df)
+    keys = components.names.str.lower()
+    bonus = keys.map(bonus_mult_dict).fillna(1.0).to_numpy(dtype=float, copy=True)
+    malus = keys.map(malus_mult_dict).fillna(1.0).to_numpy(dtype=float, copy=True)
+    if history is not None and "match_date" in components.results.columns:
+        ids = row_ids(components.results, components.names, multipliers_df)
+        bonus, malus, _ = apply_history(history, ids, components.results["match_date"], bonus, malus)
+    components.set_multipliers(bonus, malus)
+    scored = components.scored_columns()
+    scored.index = df.index
+    return scored, components
+
+
+def show_points_breakdown(components: ComponentStore, players, key: str):
+    """Selectbox giocatore + dettaglio punti per riga (calcolato solo per il giocatore scelto)."""
+    options = sorted({str(p).strip() for p in players if str(p).strip()})
+    if not options:
+        return
+    with st.expander("🔍 Dettaglio punti giocatore", expanded=False):
+        player = st.selectbox("Giocatore", options=options, key=key)
+        detail = components.player_breakdown(player)
+        flag_cols = [c for c in FLAG_NAMES if c in detail.columns and detail[c].any()]
+        st.dataframe(detail.drop(columns=[c for c in FLAG_NAMES if c not in flag_cols]), use_container_width=True)
+
+
+@st.cache_resource
+def get_projection_store() -> ProjectionStore:
+    """Mart proiezioni su disco (player_tournament_points + fit versionato), unico per processo."""
+    return ProjectionStore(PROJECTIONS_DIR)
+
+
+@st.cache_resource(max_entries=8)
+def synced_projection_store(
+    results_fp: str, scoring_key: str, _results: pd.DataFrame, _bonus: dict, _malus: dict,
+    _history=None, _multipliers=None,
+) -> ProjectionStore:
     """
-    wins = row.get("Matches Won", 0)
-    losses = row.get("Matches Lost", 0)
-    t_type = row.get("Tournament Type", "")
-    r_reached = row.get("Round Reached", "")
+    Una sync per versione di risultati e moltiplicatori: lo store ripunteggia solo i
+    tornei nuovi o cambiati (o tutti, se cambiano i moltiplicatori) e toglie quelli spariti.
+    """
+    def _score(df: pd.DataFrame) -> pd.DataFrame:
+        df = df.copy()
+        if "Tournament Type" in df.columns:
+            df["Tournament Type"] = df["Tournament Type"].astype(str).str.strip().str.title()
+        pts, _ = score_results(df, _bonus, _malus, _history, _multipliers)
+        df["Fantapoints"] = pts["Fantapoints"]
+        return df
 
-    match_pts = compute_match_points(int(wins), int(losses))
-    round_pts = compute_round_bonus(t_type, r_reached)
+    store = get_projection_store()
+    store.sync_results(_results, _score, scoring_key)
+    return store
 
-    # Bonus/malus da statistiche (se presenti)
-    aces = row.get("Aces", 0)
-    dfs = row.get("Double Faults", 0)
 
-    try:
-        aces = float(aces)
-    except Exception:
-        aces = 0.0
+def player_projection_df() -> pd.DataFrame:
+    """
+    Proiezione fantapunti stagionale per giocatore usata dall'ottimizzatore rosa:
+    modello ft_backend.compute.projections (media per tipo torneo ristretta verso il
+    ranking) sul mart ProjectionStore; se non ci sono risultati, proxy dal solo ranking.
+    """
+    players_df = st.session_state.players_df
+    out = players_df[["Giocatore"]].copy()
+    out["Giocatore"] = out["Giocatore"].astype(str).str.strip()
+    out["Proiezione"] = 0.0
+    out["Fonte"] = "—"
+
+    df_res = st.session_state.results_df
+    if df_res is not None and not df_res.empty and "Giocatore" in df_res.columns:
+        mult_df = st.session_state.get("multipliers_df", None)
+        # gli avvisi sul file li mostrano le pagine Torneo e Stagione
+        bonus_dict, malus_dict, _ = build_multiplier_dicts()
+        history = st.session_state.get("multiplier_history")
+        scoring_key = results_fingerprint(mult_df) + (f":{history.version()}" if history is not None else "")
+        store = synced_projection_store(
+            results_fingerprint(df_res), scoring_key, df_res, bonus_dict, malus_dict, history, mult_df
+        )
+        proj = store.projections(mult_df, players=out["Giocatore"])
+        per_player = season_projection(proj).set_index("Giocatore")["Proiezione"]
+        out["Proiezione"] = out["Giocatore"].map(per_player).fillna(0.0)
+        out["Fonte"] = "modello proiezioni"
+        return out
+
+    mult = st.session_state.get("multipliers_df", None)
+    if mult is not None and not mult.empty:
+        cols = {c.strip().lower().replace("\ufeff", ""): c for c in mult.columns}
+        name_col = cols.get("player") or cols.get("giocatore")
+        if name_col and "ranking" in cols:
+            rk = pd.to_numeric(mult[cols["ranking"]], errors="coerce")
+            by_name = dict(zip(mult[name_col].astype(str).str.strip().str.lower(), rk))
+            ranks = out["Giocatore"].str.lower().map(by_name)
+            max_rank = float(rk.max()) if rk.notna().any() else 0.0
+            out["Proiezione"] = (max_rank + 1 - ranks).fillna(0.0)
+            out["Fonte"] = "ranking"
+    return out
 
-    try:
-        dfs = float(dfs)
-    except Exception:
-        dfs = 0.0
-
-    raw = match_pts + round_pts + (aces * ACE_POINT) - (dfs * DF_POINT)
-
-
-    # bonus speciali
-    for col, weight in BONUS_FLAGS.items():
-        if bool(row.get(col, 0)):
-            raw += weight
-
-    # malus speciali
-    for col, weight in MALUS_FLAGS.items():
-        if bool(row.get(col, 0)):
-            raw += weight
-
-    bonus_points = raw if raw >= 0 else 0
-    malus_points = raw if raw < 0 else 0
-
-    key = str(row.get("Giocatore", "")).strip().lower()
-    mb = bonus_mult_dict.get(key, 1.0)
-    mm = malus_mult_dict.get(key, 1.0)
-
-    return pd.Series(
-        {
-            "RawPoints": raw,
-            "BonusPoints": bonus_points,
-            "MalusPoints": malus_points,
-            "BonusMultiplier": mb,
-            "MalusMultiplier": mm,
-            "Fantapoints": bonus_points * mb + malus_points * mm,
-        }
-    )
 
 def normalize_results_upload(df_upload: pd.DataFrame, upload_season: int, upload_tournament: str, upload_type: str) -> pd.DataFrame:
     """
@@ -340,7 +439,7 @@ def normalize_results_upload(df_upload: pd.DataFrame, upload_season: int, upload
     B) Formato 'stats' stile diretta.it (match_id, match_date, tournament_id, event_type, round, player_name, result, aces, double_faults)
        -> viene convertito nel formato classico, aggiungendo anche Aces e Double Faults.
 
-    Ritorna SEMPRE un df nel formato classico (minimo richiesto da compute_points_with_multipliers).
+    Ritorna SEMPRE un df nel formato classico (minimo richiesto da score_results).
     """
 
     df = df_upload.copy()
@@ -412,7 +511,7 @@ def normalize_results_upload(df_upload: pd.DataFrame, upload_season: int, upload
     if "Tournament Type" not in df.columns:
         df["Tournament Type"] = upload_type
 
-    # Se non ci sono colonne stats, inizializzo comunque (così compute_points_with_multipliers non esplode)
+    # Se non ci sono colonne stats, inizializzo comunque (così score_results non esplode)
     if "Aces" not in df.columns:
         df["Aces"] = 0
     if "Double Faults" not in df.columns:
@@ -432,6 +531,7 @@ page = st.sidebar.radio(
 )
 
 st.sidebar.markdown("---")
+render_save_status()
 st.sidebar.caption("Made with Streamlit + Fantatennis rules 😉")
 
 # ------------------------------------------------------
@@ -607,6 +707,62 @@ if page == "👥 Squadre":
             """
         )
 
+        with st.expander("🤖 Suggerisci rosa ottimale (budget)", expanded=False):
+            st.caption(
+                "Sceglie i 10 giocatori con la massima proiezione fantapunti rispettando budget "
+                "(colonna Prezzo) e, opzionalmente, un massimo di giocatori per Squadra. Soluzione esatta."
+            )
+            player_options = st.session_state.players_df["Giocatore"].astype(str).str.strip().tolist()
+
+            oc1, oc2 = st.columns(2)
+            with oc1:
+                opt_budget = st.number_input("Budget", min_value=0, value=100, step=1, key="opt_budget")
+            with oc2:
+                opt_max_club = st.number_input(
+                    "Max giocatori per Squadra (0 = nessun limite)", min_value=0, max_value=10, value=0, step=1,
+                    key="opt_max_club",
+                )
+            opt_locked = st.multiselect("Giocatori da includere", options=player_options, key="opt_locked")
+            opt_excluded = st.multiselect("Giocatori da escludere", options=player_options, key="opt_excluded")
+
+            if st.button("Calcola rosa suggerita"):
+                # proiezioni solo al click: il mart si aggiorna per i soli tornei cambiati
+                proj = player_projection_df()
+                pool = st.session_state.players_df.copy()
+                pool["Giocatore"] = pool["Giocatore"].astype(str).str.strip()
+                pool = pool.merge(proj, on="Giocatore", how="left")
+                try:
+                    sol = optimize_squad(
+                        pool,
+                        budget=opt_budget,
+                        max_per_club=int(opt_max_club) or None,
+                        locked=opt_locked,
+                        excluded=opt_excluded,
+                    )
+                except ValueError as e:
+                    st.error(str(e))
+                    sol = None
+                else:
+                    if sol is None:
+                        st.error("Nessuna rosa da 10 giocatori rispetta budget e vincoli.")
+                fonte = proj["Fonte"].iloc[0] if len(proj) else "—"
+                st.session_state.squad_suggestion = (sol, pool, fonte) if sol is not None else None
+
+            suggestion = st.session_state.get("squad_suggestion")
+            if suggestion is not None:
+                sol, pool, fonte = suggestion
+                st.write(
+                    f"Proiezione totale: **{sol.total_value:.1f}** — Costo: **{sol.total_cost}** / {sol.budget} "
+                    f"(fonte proiezione: {fonte})"
+                )
+                cols_show = [c for c in ["Giocatore", "Squadra", "Prezzo", "Proiezione"] if c in pool.columns]
+                st.dataframe(sol.to_frame(pool)[cols_show], use_container_width=True, hide_index=True)
+                if st.button("Usa questa rosa nel form"):
+                    # il pool ha i nomi normalizzati (strip): si torna ai valori delle options
+                    originals = {str(p).strip(): p for p in st.session_state.players_df["Giocatore"].tolist()}
+                    st.session_state.team_players_select = [originals[p] for p in sol.players if p in originals]
+                    st.rerun()
+
         with st.form("create_team_form"):
             col1, col2 = st.columns(2)
             with col1:
@@ -618,6 +774,7 @@ if page == "👥 Squadre":
             players_list = st.multiselect(
                 "Scegli i 10 giocatori per la rosa (ordine = priorità titolari)",
                 options=st.session_state.players_df["Giocatore"].tolist(),
+                key="team_players_select",
             )
 
             submitted = st.form_submit_button("💾 Salva / Aggiorna squadra")
@@ -687,7 +844,7 @@ if st.checkbox("Test connessione GitHub (admin)"):
     try:
         st.write("Players_df attuale:", st.session_state.players_df.head())
         save_players_df(st.session_state.players_df)
-        st.success("Scrittura su GitHub OK ✅ (controlla il repo: data/players.csv)")
+        st.success("Scrittura su GitHub in coda ⏳ (stato in sidebar, poi controlla il repo: data/players.csv)")
     except Exception as e:
         st.error(f"Errore GitHub API: {e}")
 
@@ -809,13 +966,13 @@ if page == "🏆 Torneo & Punteggi":
             for col in MATCH_BOOL_COLUMNS:
                 df[col] = df[col].fillna(0).astype(int)
 
-            bonus_dict, malus_dict = build_multiplier_dicts()
-            stats_df = df.apply(
-                compute_points_with_multipliers,
-                axis=1,
-                result_type="expand",
-                args=(bonus_dict, malus_dict),
+            bonus_dict, malus_dict, mult_report = build_multiplier_dicts()
+            render_multiplier_report(mult_report)
+            stats_df, components = score_results(
+                df, bonus_dict, malus_dict,
+                st.session_state.get("multiplier_history"), st.session_state.get("multipliers_df"),
             )
+            st.session_state.tournament_components = components
 
             df = pd.concat([df, stats_df], axis=1)
             df_sorted = df.sort_values("Fantapoints", ascending=False)
@@ -922,6 +1079,11 @@ if page == "🏆 Torneo & Punteggi":
                     mime="text/csv",
                 )
 
+        # dettaglio punti dell'ultimo calcolo (persiste tra i rerun del selectbox)
+        components = st.session_state.get("tournament_components")
+        if components is not None:
+            show_points_breakdown(components, components.names, key="tournament_breakdown_player")
+
 # ------------------------------------------------------
 # PAGINA 5: STAGIONE & CLASSIFICA GLOBALE
 # ------------------------------------------------------
@@ -1090,6 +1252,22 @@ if page == "📈 Stagione & Classifica":
     st.markdown("---")
     st.markdown("### 2️⃣ Modifica / inserisci risultati manualmente")
 
+    # Carica solo alcune stagioni: le altre restano salvate e non vengono toccate
+    _all_seasons = get_results_partitions().seasons()
+    if len(_all_seasons) > 1:
+        loaded_seasons = st.multiselect(
+            "Stagioni caricate",
+            options=_all_seasons,
+            default=st.session_state.get("results_seasons") or _all_seasons,
+            help="Le modifiche non salvate vengono perse quando cambi la selezione.",
+        )
+        if loaded_seasons and sorted(loaded_seasons) != sorted(st.session_state.get("results_seasons") or _all_seasons):
+            st.session_state.results_seasons = loaded_seasons
+            st.session_state.results_df = load_results_df(
+                None if sorted(loaded_seasons) == _all_seasons else loaded_seasons
+            )
+            st.rerun()
+
     # Inizializza struttura di base se vuota
     if st.session_state.results_df is None or st.session_state.results_df.empty:
         base_cols = REQUIRED_COLUMNS + MATCH_BOOL_COLUMNS
@@ -1152,13 +1330,33 @@ if page == "📈 Stagione & Classifica":
             mime="text/csv",
         )
     with col_dl2:
-        if st.button("💾 Salva risultati su GitHub (data/results.csv)"):
+        if st.button("💾 Salva risultati su GitHub (data/results/)"):
             try:
                 save_results_df(st.session_state.results_df)
-                st.success("Risultati salvati su GitHub ✅")
+                st.success("Risultati in coda di salvataggio su GitHub ⏳ (stato in sidebar)")
             except Exception as e:
                 st.error(f"Errore nel salvataggio su GitHub: {e}")
 
+    st.markdown("---")
+    st.markdown("### 🎚️ Moltiplicatori ranking")
+    st.caption(
+        "Le modifiche si riflettono subito sulle classifiche qui sotto: "
+        "vengono ricalcolate solo le righe dei giocatori modificati."
+    )
+    edited_multipliers = st.data_editor(
+        st.session_state.multipliers_df,
+        use_container_width=True,
+        num_rows="dynamic",
+        key="multipliers_editor",
+    )
+    st.session_state.multipliers_df = edited_multipliers
+    if st.button("💾 Salva moltiplicatori su GitHub (data/ranking_multipliers.csv)"):
+        try:
+            save_multipliers_df(st.session_state.multipliers_df)
+            st.success("Moltiplicatori in coda di salvataggio su GitHub ⏳ (stato in sidebar)")
+        except Exception as e:
+            st.error(f"Errore nel salvataggio su GitHub: {e}")
+
     st.markdown("---")
     st.markdown("### 3️⃣ Calcola classifica stagione")
 
@@ -1196,14 +1394,27 @@ if page == "📈 Stagione & Classifica":
         for col in MATCH_BOOL_COLUMNS:
             df_res[col] = df_res[col].fillna(0).astype(int)
 
-        bonus_dict, malus_dict = build_multiplier_dicts()
-        stats_df = df_res.apply(
-            compute_points_with_multipliers,
-            axis=1,
-            result_type="expand",
-            args=(bonus_dict, malus_dict),
+        # Punteggi dallo store in sessione: ricostruito solo se cambiano risultati o rose,
+        # una modifica ai moltiplicatori ricalcola solo le righe dei giocatori toccati.
+        # Le righe con match_date restano ai moltiplicatori dello storico a quella data.
+        bonus_dict, malus_dict, mult_report = build_multiplier_dicts()
+        render_multiplier_report(mult_report)
+        history = st.session_state.get("multiplier_history")
+        store_key = (
+            results_fingerprint(df_res),
+            json.dumps(st.session_state.teams, sort_keys=True, default=str),
+            history.version() if history is not None else "",
         )
-        df_res = pd.concat([df_res, stats_df], axis=1)
+        store = st.session_state.get("scored_store")
+        if store is None or st.session_state.get("scored_store_key") != store_key:
+            ids = row_ids(df_res, df_res["Giocatore"], st.session_state.get("multipliers_df"))
+            store = ScoredResults(df_res, st.session_state.teams, history=history, ids=ids)
+            st.session_state.scored_store = store
+            st.session_state.scored_store_key = store_key
+        changed_players = store.sync_multipliers(bonus_dict, malus_dict)
+        if changed_players and len(changed_players) <= 10:
+            st.caption("Moltiplicatori aggiornati per: " + ", ".join(sorted(changed_players)))
+        df_res = store.df
 
         st.markdown("---")
         st.markdown("### 3️⃣ Gestione risultati per singolo torneo")
@@ -1283,52 +1494,17 @@ if page == "📈 Stagione & Classifica":
 
 
         st.subheader("Classifica giocatori (stagionale)")
-        players_season = (
-            df_res.groupby("Giocatore", as_index=False)["Fantapoints"]
-            .sum()
-            .rename(columns={"Fantapoints": "Totale Fantapoints"})
-            .sort_values("Totale Fantapoints", ascending=False)
-        )
+        players_season = store.player_standings()
         st.dataframe(players_season, use_container_width=True)
 
         # Calcolo punti per squadra se sono definite
         if not st.session_state.teams:
             st.info("Nessuna squadra definita: vai nella pagina **Squadre** per crearle.")
         else:
-            rows = []
-            for team in st.session_state.teams:
-                team_players = team.get("players", [])
-                # Titolarità per tipo torneo
-                starters_slam = team_players[:8]
-                starters_1000 = team_players[:6]
-
-                # Filtriamo i risultati solo per i giocatori in rosa
-                df_team = df_res[df_res["Giocatore"].isin(team_players)].copy()
-                if df_team.empty:
-                    total_points = 0
-                else:
-                    # Applichiamo logica titolari per ogni riga
-                    def _is_starter(row):
-                        if row["Tournament Type"] == "Slam":
-                            return row["Giocatore"] in starters_slam
-                        elif row["Tournament Type"] == "1000":
-                            return row["Giocatore"] in starters_1000
-                        return False
-
-                    df_team["IsStarter"] = df_team.apply(_is_starter, axis=1)
-                    total_points = df_team.loc[df_team["IsStarter"], "Fantapoints"].sum()
-
-                rows.append(
-                    {
-                        "Team": team["name"],
-                        "Manager": team["manager"],
-                        "Totale punti stagione (solo titolari)": int(total_points),
-                    }
-                )
-
-            teams_season = pd.DataFrame(rows).sort_values(
-                "Totale punti stagione (solo titolari)", ascending=False
-            )
+            # totali titolari (Slam=8, 1000=6) mantenuti per delta dallo store
+            teams_season = store.team_standings()
 
             st.subheader("Classifica squadre (stagionale)")
             st.dataframe(teams_season, use_container_width=True)
+
+        show_points_breakdown(store.components, players_season["Giocatore"], key="season_breakdown_player")
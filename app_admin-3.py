@@ -1,15 +1,25 @@
 import os
 import json
 import shutil
-import base64
+import tempfile
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Callable, Optional, Tuple
 
 import pandas as pd
-import requests
 import streamlit as st
 
+from ft_backend.compute.match_points import map_results_to_ids, player_points_from_results
+from ft_backend.io.github_store import GitHubConfig, GitHubStore
+from ft_backend.io.snapshot_db import SnapshotDB
+from ft_backend.publish.diff import FEED_NAME, diff_dirs, diff_summary
+from ft_backend.publish.integrity import copy_with_stats, manifest_rows, write_csv_stats
+from ft_backend.publish.local import LatestPublisher
+from ft_backend.publish.pipeline import classic_marts, results_marts, sync_analytics, write_change_feed
+from ft_backend.publish.retention import HISTORY_DIR, INDEX_NAME, RetentionPolicy, compact_snapshots, read_index
+from ft_backend.jobs.runner import JobConflictError, JobContext, JobRunner
+from ft_backend.utils.instrumentation import RunMetrics, latest_report, summarize_report
+
 # ============================================================
 # CONFIG
 # ============================================================
@@ -22,13 +32,27 @@ PROCESSED_DIR = DATA_DIR / "processed"
 PUBLIC_DIR = DATA_DIR / "public"
 PUBLIC_LATEST_DIR = PUBLIC_DIR / "latest"
 PUBLIC_SNAPSHOTS_DIR = PUBLIC_DIR / "snapshots"
+REPO_SNAPSHOTS_DIR = "data/public/snapshots"
 
 RAW_MD_PLAYERS = RAW_DIR / "md_players.csv"
 RAW_TEAM_ROSTERS = RAW_DIR / "team_rosters.csv"
+STAGE_REPORTS_DIR = STAGE_DIR / "reports"
+STAGE_JOBS_DIR = STAGE_DIR / "jobs"
 STAGE_VALIDATION = STAGE_DIR / "validation_report.json"
 PROCESSED_PLAYER_POINTS = PROCESSED_DIR / "player_points.csv"
 PROCESSED_STANDINGS = PROCESSED_DIR / "standings.csv"
+PROCESSED_POINTS_CUBE = PROCESSED_DIR / "points_cube.csv"
+PROCESSED_MARTS_DIR = PROCESSED_DIR / "marts"
+# marts dello scoring classico (app_1_2: data/results, teams.json, ranking_multipliers.csv)
+PROCESSED_LINEUP_HINDSIGHT = PROCESSED_MARTS_DIR / "lineup_hindsight.csv"
 PUBLIC_MANIFEST = PUBLIC_LATEST_DIR / "manifest.json"
+PUBLIC_ANALYTICS_DB = PUBLIC_DIR / "analytics.sqlite"
+# snapshot: tutti quelli degli ultimi N giorni, poi uno al giorno, poi uno a settimana;
+# gli altri finiscono nello storico compresso snapshots/_history/
+SNAPSHOT_RETENTION = RetentionPolicy(
+    keep_all_days=int(os.getenv("FT_SNAPSHOT_KEEP_ALL_DAYS", "7")),
+    daily_days=int(os.getenv("FT_SNAPSHOT_DAILY_DAYS", "30")),
+)
 
 APP_TITLE = "FantaTennis — Admin"
 APP_SUBTITLE = "Setup • Upload • Validate • Compute • Publish"
@@ -52,73 +76,110 @@ def get_github_config() -> Tuple[bool, dict, str]:
         return False, {}, f"GitHub secrets not available: {e}"
 
 
-def github_headers(token: str) -> dict:
-    return {
-        "Authorization": f"token {token}",
-        "Accept": "application/vnd.github+json",
-    }
-
-
-def github_get_file_sha(repo: str, path_in_repo: str, token: str, branch: str) -> Optional[str]:
-    url = f"https://api.github.com/repos/{repo}/contents/{path_in_repo}"
-    resp = requests.get(url, headers=github_headers(token), params={"ref": branch}, timeout=30)
-    if resp.status_code == 200:
-        data = resp.json()
-        return data.get("sha")
-    if resp.status_code == 404:
-        return None
-    raise RuntimeError(f"GitHub GET failed for {path_in_repo}: {resp.status_code} - {resp.text}")
+def github_store() -> Tuple[bool, Optional[GitHubStore], str]:
+    ok, cfg, err = get_github_config()
+    if not ok:
+        return False, None, err
+    return True, GitHubStore(GitHubConfig(token=cfg["token"], repo=cfg["repo"], branch=cfg["branch"])), ""
 
 
 def github_upload_file(local_path: Path, repo_path: str, commit_message: str) -> Tuple[bool, str]:
-    ok, cfg, err = get_github_config()
+    ok, store, err = github_store()
     if not ok:
         return False, err
 
-    token = cfg["token"]
-    repo = cfg["repo"]
-    branch = cfg["branch"]
-
     if not local_path.exists():
         return False, f"Local file not found: {local_path}"
 
     try:
-        content_bytes = local_path.read_bytes()
-        content_b64 = base64.b64encode(content_bytes).decode("utf-8")
-        sha = github_get_file_sha(repo, repo_path, token, branch)
-
-        url = f"https://api.github.com/repos/{repo}/contents/{repo_path}"
-        payload = {
-            "message": commit_message,
-            "content": content_b64,
-            "branch": branch,
-        }
-        if sha:
-            payload["sha"] = sha
-
-        resp = requests.put(url, headers=github_headers(token), json=payload, timeout=60)
-        if resp.status_code in (200, 201):
-            return True, f"Uploaded to GitHub: {repo_path}"
-        return False, f"GitHub PUT failed for {repo_path}: {resp.status_code} - {resp.text}"
+        # oltre LARGE_FILE_BYTES (es. storico snapshot .csv.gz) GitHubStore usa la Git Data API
+        store.write_bytes(repo_path, local_path.read_bytes(), commit_message)
+        return True, f"Uploaded to GitHub: {repo_path}"
     except Exception as e:
         return False, f"GitHub upload error for {repo_path}: {e}"
 
 
-def github_upload_many(files_map: list[tuple[Path, str]], prefix: str = "Publish") -> Tuple[bool, list[str]]:
+def github_upload_many(
+    files_map: list[tuple[Path, str]],
+    prefix: str = "Publish",
+    on_file: Optional[Callable[[str, str], None]] = None,
+) -> Tuple[bool, list[str]]:
+    """on_file(repo_path, status) riceve pending/uploading/ok/error per ogni file (usato dai job in background)."""
     messages = []
     all_ok = True
+    if on_file:
+        for _, repo_path in files_map:
+            on_file(repo_path, "pending")
     for local_path, repo_path in files_map:
+        if on_file:
+            on_file(repo_path, "uploading")
         ok, msg = github_upload_file(
             local_path=local_path,
             repo_path=repo_path,
             commit_message=f"{prefix}: update {repo_path}"
         )
         messages.append(msg)
+        if on_file:
+            on_file(repo_path, "ok" if ok else "error")
         if not ok:
             all_ok = False
     return all_ok, messages
 
 
+def github_prune_folded_snapshots(
+    on_file: Optional[Callable[[str, str], None]] = None,
+) -> Tuple[bool, list[str]]:
+    """
+    Rimuove da GitHub le directory data/public/snapshots/<id> già piegate nello storico
+    (location "history" in snapshots/index.json). Da chiamare dopo l'upload di storico e indice.
+    """
+    folded = {sid for sid, e in read_index(PUBLIC_SNAPSHOTS_DIR).get("snapshots", {}).items()
+              if e.get("location") == "history"}
+    ok, store, err = github_store()
+    if not ok:
+        return False, [err]
+    try:
+        entries = store.list_dir(REPO_SNAPSHOTS_DIR)
+    except Exception as e:
+        return False, [f"GitHub list error for {REPO_SNAPSHOTS_DIR}: {e}"]
+    stale = sorted(e["name"] for e in entries if e.get("type") == "dir" and e.get("name") in folded)
+    messages, all_ok = [], True
+    for sid in stale:
+        try:
+            files = store.list_dir(f"{REPO_SNAPSHOTS_DIR}/{sid}")
+        except Exception as e:
+            messages.append(f"GitHub list error for {REPO_SNAPSHOTS_DIR}/{sid}: {e}")
+            all_ok = False
+            continue
+        for f in files:
+            if on_file:
+                on_file(f["path"], "pending")
+        for f in files:
+            if on_file:
+                on_file(f["path"], "deleting")
+            try:
+                store.delete(f["path"], f"Snapshot retention: fold {sid} into history", sha=f["sha"])
+                ok, msg = True, f"Deleted from GitHub: {f['path']}"
+            except Exception as e:
+                ok, msg = False, f"GitHub delete error for {f['path']}: {e}"
+            messages.append(msg)
+            if on_file:
+                on_file(f["path"], "ok" if ok else "error")
+            all_ok &= ok
+    return all_ok, messages
+
+
+def retention_repo_files() -> list[tuple[Path, str]]:
+    """Indice e storico compresso degli snapshot (snapshots/index.json, snapshots/_history/*.csv.gz)."""
+    index_path = PUBLIC_SNAPSHOTS_DIR / INDEX_NAME
+    if not index_path.exists():
+        return []
+    files = [(index_path, f"{REPO_SNAPSHOTS_DIR}/{INDEX_NAME}")]
+    for p in sorted((PUBLIC_SNAPSHOTS_DIR / HISTORY_DIR).glob("*.csv.gz")):
+        files.append((p, f"{REPO_SNAPSHOTS_DIR}/{HISTORY_DIR}/{p.name}"))
+    return files
+
+
 # ============================================================
 # HELPERS
 # ============================================================
@@ -127,6 +188,7 @@ def ensure_directories() -> None:
         RAW_DIR,
         RAW_RESULTS_DIR,
         STAGE_DIR,
+        STAGE_REPORTS_DIR,
         PROCESSED_DIR,
         PUBLIC_DIR,
         PUBLIC_LATEST_DIR,
@@ -252,6 +314,15 @@ def build_validation_report(
     return report
 
 
+class PublishAborted(RuntimeError):
+    """Interrompe uno staging di latest: la versione corrente resta pubblicata."""
+
+
+def get_publisher() -> LatestPublisher:
+    # latest -> .latest.versions/<version>: switch atomico, lock tra publisher concorrenti
+    return LatestPublisher(PUBLIC_LATEST_DIR)
+
+
 def find_latest_results_file() -> Optional[Path]:
     files = sorted(
         RAW_RESULTS_DIR.glob("*.csv"),
@@ -261,7 +332,18 @@ def find_latest_results_file() -> Optional[Path]:
     return files[0] if files else None
 
 
-def prepare_master_public_files(upload_to_github: bool = False) -> Tuple[bool, str, list[str]]:
+def prepare_master_public_files(
+    upload_to_github: bool = False,
+    on_file: Optional[Callable[[str, str], None]] = None,
+    target_dir: Optional[Path] = None,
+    file_stats: Optional[dict] = None,
+) -> Tuple[bool, str, list[str]]:
+    """
+    Scrive md_players.csv e team_rosters.csv in `target_dir` (staging di un publish).
+    Senza target_dir pubblica una nuova versione di latest partendo da quella corrente.
+    `file_stats` riceve righe/byte/sha256 dei file scritti (per il manifest).
+    """
+    file_stats = {} if file_stats is None else file_stats
     md = read_csv_safe(RAW_MD_PLAYERS)
     rosters = read_csv_safe(RAW_TEAM_ROSTERS)
 
@@ -287,15 +369,33 @@ def prepare_master_public_files(upload_to_github: bool = False) -> Tuple[bool, s
     md_public = md.copy()
     roster_public = rosters.copy()
 
-    md_public.to_csv(PUBLIC_LATEST_DIR / "md_players.csv", index=False, encoding="utf-8")
-    roster_public.to_csv(PUBLIC_LATEST_DIR / "team_rosters.csv", index=False, encoding="utf-8")
+    if target_dir is None:
+        version = now_ts()
+        with get_publisher().stage(version, copy_current=True) as staging:
+            file_stats["md_players.csv"] = write_csv_stats(md_public, staging / "md_players.csv")
+            file_stats["team_rosters.csv"] = write_csv_stats(roster_public, staging / "team_rosters.csv")
+            manifest_path = staging / "manifest.json"
+            manifest = {}
+            if manifest_path.exists():
+                with open(manifest_path, "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
+            manifest["version"] = version
+            manifest["updated_at"] = datetime.now().isoformat()
+            manifest.setdefault("files", {}).update(file_stats)
+            with open(manifest_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2, ensure_ascii=False)
+        src_dir = get_publisher().versions_dir / version
+    else:
+        file_stats["md_players.csv"] = write_csv_stats(md_public, target_dir / "md_players.csv")
+        file_stats["team_rosters.csv"] = write_csv_stats(roster_public, target_dir / "team_rosters.csv")
+        src_dir = target_dir
 
     github_msgs = []
     if upload_to_github:
         all_ok, github_msgs = github_upload_many([
-            (PUBLIC_LATEST_DIR / "md_players.csv", "data/public/latest/md_players.csv"),
-            (PUBLIC_LATEST_DIR / "team_rosters.csv", "data/public/latest/team_rosters.csv"),
-        ], prefix="Publish master data")
+            (src_dir / "md_players.csv", "data/public/latest/md_players.csv"),
+            (src_dir / "team_rosters.csv", "data/public/latest/team_rosters.csv"),
+        ], prefix="Publish master data", on_file=on_file)
         if not all_ok:
             return False, "Master data written locally, but GitHub upload failed.", github_msgs
 
@@ -303,185 +403,358 @@ def prepare_master_public_files(upload_to_github: bool = False) -> Tuple[bool, s
 
 
 def compute_from_results() -> Tuple[bool, str]:
-    md = read_csv_safe(RAW_MD_PLAYERS)
-    rosters = read_csv_safe(RAW_TEAM_ROSTERS)
-    results_path = find_latest_results_file()
-
-    if md is None or rosters is None:
-        return False, "Missing md_players.csv or team_rosters.csv in data/raw/"
-    if results_path is None:
-        return False, "No results file found in data/raw/results/"
+    metrics = RunMetrics("compute")
+    try:
+        return _compute_from_results(metrics)
+    finally:
+        metrics.write_report(STAGE_REPORTS_DIR)
 
-    results = read_csv_safe(results_path)
-    if results is None:
-        return False, "Unable to read latest results file."
 
-    md = normalize_columns(md)
-    rosters = normalize_columns(rosters)
-    results = normalize_columns(results)
+def _compute_from_results(metrics: RunMetrics) -> Tuple[bool, str]:
+    with metrics.stage("normalize") as m:
+        md = read_csv_safe(RAW_MD_PLAYERS)
+        rosters = read_csv_safe(RAW_TEAM_ROSTERS)
+        results_path = find_latest_results_file()
 
-    if "player" not in md.columns and "full_name" in md.columns:
-        md["player"] = md["full_name"]
-    if "full_name" not in md.columns and "player" in md.columns:
-        md["full_name"] = md["player"]
+        if md is None or rosters is None:
+            return False, m.fail("Missing md_players.csv or team_rosters.csv in data/raw/")
+        if results_path is None:
+            return False, m.fail("No results file found in data/raw/results/")
 
-    required_md = {"id_player", "player"}
-    required_rosters = {"team_id", "team_name", "id_player"}
-    required_results = {"date", "winner", "loser"}
+        results = read_csv_safe(results_path)
+        if results is None:
+            return False, m.fail("Unable to read latest results file.")
+        for p in (RAW_MD_PLAYERS, RAW_TEAM_ROSTERS, results_path):
+            m.add_read(p)
+        m.rows_in = int(len(results))
 
-    if not required_md <= set(md.columns):
-        return False, f"md_players.csv must contain at least: {sorted(required_md)}"
-    if not required_rosters <= set(rosters.columns):
-        return False, f"team_rosters.csv must contain at least: {sorted(required_rosters)}"
-    if not required_results <= set(results.columns):
-        return False, f"results file must contain at least: {sorted(required_results)}"
-
-    results["date"] = pd.to_datetime(results["date"], errors="coerce").dt.strftime("%Y-%m-%d")
-    results = results[results["date"].notna()].copy()
-
-    md["player_norm"] = md["player"].astype(str).str.strip().str.lower()
-    player_map = dict(zip(md["player_norm"], md["id_player"].astype(str)))
-
-    results["winner_norm"] = results["winner"].astype(str).str.strip().str.lower()
-    results["loser_norm"] = results["loser"].astype(str).str.strip().str.lower()
-    results["winner_id"] = results["winner_norm"].map(player_map)
-    results["loser_id"] = results["loser_norm"].map(player_map)
-
-    unmapped_w = results["winner_id"].isna().sum()
-    unmapped_l = results["loser_id"].isna().sum()
-    if unmapped_w or unmapped_l:
-        return False, (
-            f"Unmapped players in results. winner unmapped: {int(unmapped_w)}, "
-            f"loser unmapped: {int(unmapped_l)}. Check naming consistency with md_players.csv."
-        )
+        md = normalize_columns(md)
+        rosters = normalize_columns(rosters)
+        results = normalize_columns(results)
 
-    win_points = 10.0
-    loss_points = 0.0
+        if "player" not in md.columns and "full_name" in md.columns:
+            md["player"] = md["full_name"]
+        if "full_name" not in md.columns and "player" in md.columns:
+            md["full_name"] = md["player"]
 
-    winners = results[["date", "winner_id"]].copy()
-    winners["points"] = win_points
-    winners = winners.rename(columns={"winner_id": "id_player"})
+        required_md = {"id_player", "player"}
+        required_rosters = {"team_id", "team_name", "id_player"}
+        required_results = {"date", "winner", "loser"}
 
-    losers = results[["date", "loser_id"]].copy()
-    losers["points"] = loss_points
-    losers = losers.rename(columns={"loser_id": "id_player"})
+        if not required_md <= set(md.columns):
+            return False, m.fail(f"md_players.csv must contain at least: {sorted(required_md)}")
+        if not required_rosters <= set(rosters.columns):
+            return False, m.fail(f"team_rosters.csv must contain at least: {sorted(required_rosters)}")
+        if not required_results <= set(results.columns):
+            return False, m.fail(f"results file must contain at least: {sorted(required_results)}")
+
+        results, unmapped_w, unmapped_l = map_results_to_ids(results, md)
+        if unmapped_w or unmapped_l:
+            return False, m.fail(
+                f"Unmapped players in results. winner unmapped: {int(unmapped_w)}, "
+                f"loser unmapped: {int(unmapped_l)}. Check naming consistency with md_players.csv."
+            )
+        m.rows_out = int(len(results))
+
+    with metrics.stage("score", rows_in=int(len(results))) as m:
+        player_points = player_points_from_results(results)
+        m.rows_out = int(len(player_points))
+
+    with metrics.stage("marts", rows_in=int(len(player_points))) as m:
+        marts = results_marts(results, md, rosters, player_points=player_points)
+        team_points_out, standings, points_cube = marts["team_points"], marts["standings"], marts["points_cube"]
+
+        PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+        PUBLIC_LATEST_DIR.mkdir(parents=True, exist_ok=True)
+
+        player_points.to_csv(PROCESSED_PLAYER_POINTS, index=False, encoding="utf-8")
+        standings.to_csv(PROCESSED_STANDINGS, index=False, encoding="utf-8")
+        team_points_out.to_csv(PROCESSED_DIR / "team_points.csv", index=False, encoding="utf-8")
+        points_cube.to_csv(PROCESSED_POINTS_CUBE, index=False, encoding="utf-8")
+        for p in (PROCESSED_PLAYER_POINTS, PROCESSED_STANDINGS, PROCESSED_DIR / "team_points.csv", PROCESSED_POINTS_CUBE):
+            m.add_written(p)
+        m.rows_out = int(len(standings))
+
+    with metrics.stage("classic") as m:
+        # scoring classico: opzionale, solo se il repo ha già risultati di stagione
+        # (storico moltiplicatori scritto dall'app: righe con match_date punteggiate as-of)
+        classic_written = []
+        try:
+            classic = classic_marts(BASE_DIR)
+        except ValueError as e:
+            # es. moltiplicatori senza colonne bonus/malus: stage in errore, il resto prosegue
+            classic_error = m.fail(f"classic marts not built: {e}")
+            classic = {}
+        else:
+            classic_error = ""
+        if classic:
+            PROCESSED_MARTS_DIR.mkdir(parents=True, exist_ok=True)
+            for name, df in classic.items():
+                path = PROCESSED_MARTS_DIR / f"{name}.csv"
+                df.to_csv(path, index=False, encoding="utf-8")
+                m.add_written(path)
+                classic_written.append(f"processed/marts/{path.name}")
+            m.rows_out = len(classic_written)
 
-    player_points = pd.concat([winners, losers], ignore_index=True)
-    player_points = (
-        player_points
-        .groupby(["date", "id_player"], as_index=False)["points"]
-        .sum()
-        .sort_values(["date", "id_player"])
-    )
-    player_points["cumulative_points"] = (
-        player_points.groupby("id_player")["points"].cumsum()
+    return True, (
+        f"Compute completed from {results_path.name}. "
+        f"Generated processed/player_points.csv, processed/standings.csv and processed/points_cube.csv"
+        + (f", {', '.join(classic_written)}." if classic_written else ".")
+        + (f" Warning: {classic_error}" if classic_error else "")
     )
 
-    roster_map = rosters[["team_id", "team_name", "id_player"]].drop_duplicates().copy()
-    team_points = player_points.merge(roster_map, on="id_player", how="left")
-    team_points = team_points.dropna(subset=["team_id"]).copy()
 
-    standings = (
-        team_points
-        .groupby(["date", "team_id", "team_name"], as_index=False)["points"]
-        .sum()
-        .rename(columns={"points": "day_points"})
-        .sort_values(["date", "team_id"])
-    )
-    standings["total_points"] = standings.groupby("team_id")["day_points"].cumsum()
-    standings = standings.sort_values(
-        ["date", "total_points", "team_name"],
-        ascending=[True, False, True]
-    ).copy()
-    standings["rank"] = (
-        standings.groupby("date")["total_points"]
-        .rank(method="dense", ascending=False)
-        .astype(int)
-    )
-    standings = standings[["date", "team_id", "team_name", "rank", "total_points"]]
+def processed_public_files(target_dir: Path) -> list[tuple[Path, Path]]:
+    return [
+        (PROCESSED_STANDINGS, target_dir / "standings.csv"),
+        (PROCESSED_PLAYER_POINTS, target_dir / "player_points.csv"),
+        (PROCESSED_DIR / "team_points.csv", target_dir / "team_points.csv"),
+        (PROCESSED_POINTS_CUBE, target_dir / "points_cube.csv"),
+        (PROCESSED_LINEUP_HINDSIGHT, target_dir / "lineup_hindsight.csv"),
+    ]
 
-    PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
-    PUBLIC_LATEST_DIR.mkdir(parents=True, exist_ok=True)
 
-    player_points.to_csv(PROCESSED_PLAYER_POINTS, index=False, encoding="utf-8")
-    standings.to_csv(PROCESSED_STANDINGS, index=False, encoding="utf-8")
+def read_json_safe(path: Path) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
 
-    team_points_out = (
-        team_points.groupby(["date", "team_id", "team_name"], as_index=False)["points"]
-        .sum()
-        .rename(columns={"points": "points"})
-    )
-    team_points_out.to_csv(PROCESSED_DIR / "team_points.csv", index=False, encoding="utf-8")
 
-    return True, (
-        f"Compute completed from {results_path.name}. "
-        f"Generated processed/player_points.csv and processed/standings.csv."
-    )
+def preview_publish_changes() -> Tuple[bool, str, dict]:
+    """Cosa cambierebbe un publish adesso: stessi file del publish, in una directory temporanea."""
+    with tempfile.TemporaryDirectory(prefix="ft_preview_") as tmp:
+        target = Path(tmp)
+        ok, msg, _ = prepare_master_public_files(target_dir=target)
+        if not ok:
+            return False, msg, {}
+        for src, dst in processed_public_files(target):
+            if src.exists():
+                shutil.copy2(src, dst)
+        current = get_publisher().resolve()
+        diffs = diff_dirs(current if current.is_dir() else None, target)
+    version = read_json_safe(current / "manifest.json").get("version") or "—"
+    return True, f"Changes versus published version {version}", diffs
+
+
+def publish_snapshot(
+    upload_to_github: bool = False,
+    on_file: Optional[Callable[[str, str], None]] = None,
+) -> Tuple[bool, str, list[str]]:
+    metrics = RunMetrics("publish", run_id=now_ts())
+    try:
+        return _publish_snapshot(metrics, upload_to_github=upload_to_github, on_file=on_file)
+    finally:
+        metrics.write_report(STAGE_REPORTS_DIR)
 
 
-def publish_snapshot(upload_to_github: bool = False) -> Tuple[bool, str, list[str]]:
+def _publish_snapshot(
+    metrics: RunMetrics,
+    upload_to_github: bool = False,
+    on_file: Optional[Callable[[str, str], None]] = None,
+) -> Tuple[bool, str, list[str]]:
     ensure_directories()
 
-    ok, msg, github_msgs = prepare_master_public_files(upload_to_github=upload_to_github)
-    if not ok:
-        return False, msg, github_msgs
-
-    files_to_publish = [
-        (PROCESSED_STANDINGS, PUBLIC_LATEST_DIR / "standings.csv"),
-        (PROCESSED_PLAYER_POINTS, PUBLIC_LATEST_DIR / "player_points.csv"),
-        (PROCESSED_DIR / "team_points.csv", PUBLIC_LATEST_DIR / "team_points.csv"),
-    ]
-    for src, dst in files_to_publish:
-        if src.exists():
-            shutil.copy2(src, dst)
-
-    snapshot_id = now_ts()
+    # tutto si prepara in staging sotto lock; latest passa alla nuova versione solo a fine blocco
+    snapshot_id = metrics.run_id
     snapshot_dir = PUBLIC_SNAPSHOTS_DIR / snapshot_id
-    snapshot_dir.mkdir(parents=True, exist_ok=True)
-
-    published_files = {}
-    for p in PUBLIC_LATEST_DIR.glob("*"):
-        if p.is_file():
-            shutil.copy2(p, snapshot_dir / p.name)
-            if p.suffix.lower() == ".csv":
-                try:
-                    published_files[p.name] = int(len(pd.read_csv(p)))
-                except Exception:
-                    published_files[p.name] = None
-
-    manifest = {
-        "version": snapshot_id,
-        "updated_at": datetime.now().isoformat(),
-        "files": published_files,
-    }
-    with open(PUBLIC_MANIFEST, "w", encoding="utf-8") as f:
-        json.dump(manifest, f, indent=2, ensure_ascii=False)
-    with open(snapshot_dir / "manifest.json", "w", encoding="utf-8") as f:
-        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    github_msgs: list[str] = []
+    try:
+        with get_publisher().stage(snapshot_id) as staging:
+            with metrics.stage("publish") as m:
+                # l'upload dei master data avviene con gli altri file nello stage "upload"
+                # righe, byte e sha256 di ogni file nascono mentre lo si scrive/copia
+                published_files: dict = {}
+                ok, msg, github_msgs = prepare_master_public_files(target_dir=staging, file_stats=published_files)
+                if not ok:
+                    raise PublishAborted(msg)
+
+                for src, dst in processed_public_files(staging):
+                    if src.exists():
+                        published_files[dst.name] = copy_with_stats(src, dst)
+                        m.add_read(src)
+
+                # feed delle modifiche rispetto alla versione ancora pubblicata (siamo sotto lock)
+                changes = write_change_feed(staging, get_publisher().resolve(), snapshot_id)
+
+                for p in staging.glob("*"):
+                    if p.is_file():
+                        m.add_written(p)
+                m.rows_out = manifest_rows(published_files)
+
+            # stage metrics: ultima compute + questa publish (l'upload segue la scrittura del manifest)
+            stage_metrics = {"publish": metrics.summary()}
+            last_compute = latest_report(STAGE_REPORTS_DIR, "compute")
+            if last_compute is not None:
+                stage_metrics["compute"] = summarize_report(last_compute)
+
+            manifest = {
+                "version": snapshot_id,
+                "updated_at": datetime.now().isoformat(),
+                "files": published_files,
+                "changes": changes,
+                "stage_metrics": stage_metrics,
+            }
+            with open(staging / "manifest.json", "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+            if snapshot_dir.exists():
+                shutil.rmtree(snapshot_dir)
+            shutil.copytree(staging, snapshot_dir)
+    except PublishAborted as e:
+        return False, str(e), github_msgs
+    except TimeoutError:
+        return False, "Another publish is in progress: try again in a moment.", github_msgs
+
+    # DB analitico: carica solo questo snapshot (e quelli eventualmente mancanti)
+    with metrics.stage("analytics") as m:
+        try:
+            m.rows_out = sync_analytics(PUBLIC_SNAPSHOTS_DIR, PUBLIC_ANALYTICS_DB)
+            m.add_written(PUBLIC_ANALYTICS_DB)
+        except Exception as e:
+            m.status = "error"
+            github_msgs.append(f"Analytics DB not updated: {e}")
+
+    # dopo il sync: il DB ha già anche gli snapshot che stanno per essere compattati
+    with metrics.stage("retention") as m:
+        try:
+            report = compact_snapshots(PUBLIC_SNAPSHOTS_DIR, SNAPSHOT_RETENTION)
+            m.rows_out = len(report["folded"])
+            if report["folded"]:
+                github_msgs.append(
+                    f"Folded {len(report['folded'])} old snapshot(s) into snapshots/_history "
+                    f"({report['bytes_before']} -> {report['bytes_after']} bytes)."
+                )
+        except Exception as e:
+            m.status = "error"
+            github_msgs.append(f"Snapshot retention not applied: {e}")
 
     if upload_to_github:
-        repo_files = [
-            (PUBLIC_LATEST_DIR / "md_players.csv", "data/public/latest/md_players.csv"),
-            (PUBLIC_LATEST_DIR / "team_rosters.csv", "data/public/latest/team_rosters.csv"),
-            (PUBLIC_MANIFEST, "data/public/latest/manifest.json"),
-            (snapshot_dir / "manifest.json", f"data/public/snapshots/{snapshot_id}/manifest.json"),
-        ]
-        for maybe in ["standings.csv", "player_points.csv", "team_points.csv"]:
-            lp = PUBLIC_LATEST_DIR / maybe
-            if lp.exists():
-                repo_files.append((lp, f"data/public/latest/{maybe}"))
+        with metrics.stage("upload") as m:
+            # dalla copia snapshot (immutabile): latest potrebbe già puntare a un publish successivo
+            repo_files = [
+                (snapshot_dir / "md_players.csv", "data/public/latest/md_players.csv"),
+                (snapshot_dir / "team_rosters.csv", "data/public/latest/team_rosters.csv"),
+                (snapshot_dir / "manifest.json", "data/public/latest/manifest.json"),
+                (snapshot_dir / "manifest.json", f"data/public/snapshots/{snapshot_id}/manifest.json"),
+                (snapshot_dir / FEED_NAME, f"data/public/latest/{FEED_NAME}"),
+                (snapshot_dir / FEED_NAME, f"data/public/snapshots/{snapshot_id}/{FEED_NAME}"),
+            ]
+            for maybe in ["standings.csv", "player_points.csv", "team_points.csv", "points_cube.csv", "lineup_hindsight.csv"]:
+                lp = snapshot_dir / maybe
+                if lp.exists():
+                    repo_files.append((lp, f"data/public/latest/{maybe}"))
+                    repo_files.append((snapshot_dir / maybe, f"data/public/snapshots/{snapshot_id}/{maybe}"))
+            for maybe in ["md_players.csv", "team_rosters.csv"]:
                 repo_files.append((snapshot_dir / maybe, f"data/public/snapshots/{snapshot_id}/{maybe}"))
-        for maybe in ["md_players.csv", "team_rosters.csv"]:
-            repo_files.append((snapshot_dir / maybe, f"data/public/snapshots/{snapshot_id}/{maybe}"))
-
-        all_ok, more_msgs = github_upload_many(repo_files, prefix="Publish snapshot")
-        github_msgs.extend(more_msgs)
-        if not all_ok:
-            return False, "Publish completed locally, but GitHub upload failed.", github_msgs
+            # retention: indice e storico compresso insieme allo snapshot
+            repo_files.extend(retention_repo_files())
+
+            all_ok, more_msgs = github_upload_many(repo_files, prefix="Publish snapshot", on_file=on_file)
+            github_msgs.extend(more_msgs)
+            for local_path, _ in repo_files:
+                m.add_read(local_path)
+            m.rows_out = len(repo_files)
+            if not all_ok:
+                m.status = "error"
+                return False, "Publish completed locally, but GitHub upload failed.", github_msgs
+
+            # solo dopo storico e indice: via da GitHub le directory già piegate
+            pruned_ok, prune_msgs = github_prune_folded_snapshots(on_file=on_file)
+            github_msgs.extend(prune_msgs)
+            if not pruned_ok:
+                m.fail("GitHub snapshot retention failed")
+                return False, "Publish uploaded, but folded snapshots could not be removed from GitHub.", github_msgs
 
     return True, f"Publish completed. Snapshot created: {snapshot_dir}", github_msgs
 
 
+# ============================================================
+# BACKGROUND JOBS
+# ============================================================
+# compute riscrive data/processed/* mentre publish lo copia: mai insieme
+EXCLUSIVE_JOB_KINDS = ("compute", "publish")
+
+
+@st.cache_resource
+def get_job_runner() -> JobRunner:
+    # una sola istanza per processo, condivisa tra sessioni e rerun di Streamlit
+    return JobRunner(str(STAGE_JOBS_DIR), max_workers=2)
+
+
+def run_compute_job(ctx: JobContext) -> dict:
+    ctx.progress(0.05, "Compute running...")
+    ok, msg = compute_from_results()
+    return {"ok": ok, "message": msg}
+
+
+def run_publish_job(ctx: JobContext, upload_to_github: bool) -> dict:
+    def on_file(repo_path: str, status: str) -> None:
+        ctx.file_status(repo_path, status)
+        if status in ("ok", "error"):
+            # il totale include i pending annunciati prima dell'upload
+            done, total = ctx.file_counts()
+            ctx.progress(done / max(total, 1), f"Uploaded {done}/{total}: {repo_path}")
+
+    ctx.progress(0.05, "Publishing locally...")
+    ok, msg, github_msgs = publish_snapshot(upload_to_github=upload_to_github, on_file=on_file)
+    return {"ok": ok, "message": msg, "github_log": github_msgs}
+
+
+def submit_job(kind: str, fn: Callable, *args, **kwargs) -> None:
+    try:
+        job = get_job_runner().submit(kind, fn, *args, exclusive=True, conflicts=EXCLUSIVE_JOB_KINDS, **kwargs)
+        st.session_state[f"{kind}_job_id"] = job["id"]
+        st.info(f"{kind.title()} job queued: {job['id']}")
+    except JobConflictError as e:
+        st.warning(str(e))
+
+
+def current_job(kind: str) -> Optional[dict]:
+    """Job della sessione se presente, altrimenti l'ultimo dello stesso tipo (es. dopo un refresh)."""
+    runner = get_job_runner()
+    job_id = st.session_state.get(f"{kind}_job_id")
+    if job_id:
+        return runner.get(job_id)
+    for job in runner.list_jobs(limit=50):
+        if job.get("kind") == kind:
+            return job
+    return None
+
+
+def render_job(job: Optional[dict], key: str) -> None:
+    if not job:
+        return
+    status = job.get("status", "")
+    st.markdown(f"**Job** `{job['id']}` — {status}")
+    st.progress(float(job.get("progress") or 0.0), text=job.get("message") or status)
+    if status in ("queued", "running"):
+        st.button("Refresh job status", key=f"refresh_{key}")
+    elif status == "done":
+        st.success(job.get("message") or "Done.")
+    elif status == "interrupted":
+        st.warning("Job interrupted (the admin server restarted while it was running).")
+    else:
+        st.error(job.get("message") or "Job failed.")
+        if job.get("error"):
+            st.code(job["error"])
+
+    files = job.get("files") or {}
+    if files:
+        with st.expander("Per-file upload status", expanded=status in ("running", "failed")):
+            st.dataframe(
+                pd.DataFrame([{"path": k, "status": v} for k, v in files.items()]),
+                use_container_width=True,
+                hide_index=True,
+            )
+    result = job.get("result") or {}
+    if isinstance(result, dict) and result.get("github_log"):
+        with st.expander("GitHub upload log", expanded=status == "failed"):
+            for m in result["github_log"]:
+                st.write("-", m)
+
+
 def latest_preview(path: Path, n: int = 20) -> Optional[pd.DataFrame]:
     df = read_csv_safe(path)
     if df is None:
@@ -618,11 +891,8 @@ with tab_compute:
     st.subheader("Compute")
     st.write("This MVP compute uses a simple scoring model: winner = 10, loser = 0.")
     if st.button("Run compute", type="primary"):
-        ok, msg = compute_from_results()
-        if ok:
-            st.success(msg)
-        else:
-            st.error(msg)
+        submit_job("compute", run_compute_job)
+    render_job(current_job("compute"), key="compute")
 
     c1, c2 = st.columns(2)
     with c1:
@@ -644,17 +914,20 @@ with tab_publish:
     )
 
     push_publish = st.checkbox("Also upload published files and snapshots to GitHub", value=True, key="push_publish")
-    if st.button("Publish latest", type="primary"):
-        ok, msg, github_msgs = publish_snapshot(upload_to_github=push_publish)
-        if ok:
-            st.success(msg)
-        else:
+    if st.button("Preview changes"):
+        ok, msg, diffs = preview_publish_changes()
+        if not ok:
             st.error(msg)
-
-        if github_msgs:
-            with st.expander("GitHub upload log", expanded=not ok):
-                for m in github_msgs:
-                    st.write("-", m)
+        else:
+            st.caption(msg)
+            st.dataframe(diff_summary(diffs), use_container_width=True, hide_index=True)
+            for table, d in diffs.items():
+                if len(d):
+                    with st.expander(f"{table}: {len(d)} changed rows"):
+                        st.dataframe(d.drop(columns=["_occ"]).head(500), use_container_width=True, hide_index=True)
+    if st.button("Publish latest", type="primary"):
+        submit_job("publish", run_publish_job, upload_to_github=push_publish)
+    render_job(current_job("publish"), key="publish")
 
     c1, c2 = st.columns(2)
     with c1:
@@ -698,13 +971,76 @@ with tab_monitor:
     if status_rows:
         st.dataframe(pd.DataFrame(status_rows), use_container_width=True, hide_index=True)
 
-    snapshots = sorted(PUBLIC_SNAPSHOTS_DIR.glob("*"), reverse=True)
+    st.markdown("### Background jobs")
+    jobs = get_job_runner().list_jobs(limit=20)
+    if jobs:
+        st.dataframe(pd.DataFrame([
+            {k: j.get(k) for k in ["id", "kind", "status", "progress", "message", "created_at", "finished_at"]}
+            for j in jobs
+        ]), use_container_width=True, hide_index=True)
+    else:
+        st.info("No background jobs yet.")
+
+    st.markdown("### Stage reports")
+    report_rows = []
+    for p in sorted(STAGE_REPORTS_DIR.glob("*.json"), reverse=True)[:20]:
+        try:
+            with open(p, "r", encoding="utf-8") as f:
+                rep = json.load(f)
+        except Exception:
+            continue
+        for s in rep.get("stages", []):
+            report_rows.append({
+                "run_id": rep.get("run_id"),
+                "kind": rep.get("kind"),
+                "stage": s.get("stage"),
+                "status": s.get("status"),
+                "wall_s": s.get("wall_s"),
+                "cpu_s": s.get("cpu_s"),
+                "peak_rss_kb": s.get("peak_rss_kb"),
+                "rows_in": s.get("rows_in"),
+                "rows_out": s.get("rows_out"),
+                "bytes_read": s.get("bytes_read"),
+                "bytes_written": s.get("bytes_written"),
+            })
+    if report_rows:
+        st.dataframe(pd.DataFrame(report_rows), use_container_width=True, hide_index=True)
+    else:
+        st.info("No stage reports yet.")
+
     st.markdown("### Snapshots")
-    if snapshots:
-        snap_df = pd.DataFrame({
-            "snapshot": [p.name for p in snapshots],
-            "path": [str(p) for p in snapshots],
-        })
+    snap_index = read_index(PUBLIC_SNAPSHOTS_DIR)["snapshots"]
+    snap_rows = {p.name: {"location": "dir", "path": str(p)} for p in PUBLIC_SNAPSHOTS_DIR.glob("*") if p.is_dir() and not p.name.startswith("_")}
+    for sid, e in snap_index.items():
+        if e.get("location") == "history":
+            snap_rows[sid] = {"location": "history", "path": str(PUBLIC_SNAPSHOTS_DIR / "_history")}
+    if snap_rows:
+        snap_df = pd.DataFrame([{"snapshot": k, **v} for k, v in sorted(snap_rows.items(), reverse=True)])
         st.dataframe(snap_df, use_container_width=True, hide_index=True)
+        st.caption(
+            f"Retention: all snapshots from the last {SNAPSHOT_RETENTION.keep_all_days} days, daily up to "
+            f"{SNAPSHOT_RETENTION.daily_days} days, weekly after that (applied at every publish; "
+            f"with GitHub upload the folded snapshot folders are replaced by snapshots/_history there too)."
+        )
     else:
         st.info("No snapshots created yet.")
+
+    st.markdown("### Snapshot analytics (SQL)")
+    if PUBLIC_ANALYTICS_DB.exists():
+        db = SnapshotDB(PUBLIC_ANALYTICS_DB)
+        try:
+            st.caption("Tables: " + ", ".join(db.tables()) + " — every table has a snapshot_id column.")
+            sql = st.text_area(
+                "Query",
+                value="SELECT snapshot_id, team_id, MAX(total_points) AS points FROM standings GROUP BY 1, 2 ORDER BY 1, 3 DESC",
+                key="analytics_sql",
+            )
+            if st.button("Run query", key="analytics_run"):
+                try:
+                    st.dataframe(db.query(sql), use_container_width=True, hide_index=True)
+                except Exception as e:
+                    st.error(f"Query failed: {e}")
+        finally:
+            db.close()
+    else:
+        st.info("Analytics DB not built yet: it is created at the next publish.")
@@ -9,6 +9,8 @@ import pandas as pd
 import requests
 import streamlit as st
 
+from ft_backend.publish.integrity import copy_with_stats, file_stats
+
 BASE_DIR = Path(".")
 DATA_DIR = BASE_DIR / "data"
 RAW_DIR = DATA_DIR / "raw"
@@ -142,19 +144,19 @@ def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
 
 
 def file_rowcount(path: Path) -> Optional[int]:
+    # conteggio record in streaming (csv), senza parse pandas
     if not path.exists() or path.suffix.lower() != ".csv":
         return None
-    try:
-        return int(len(pd.read_csv(path)))
-    except Exception:
-        return None
+    stats = file_stats(path)
+    return None if stats is None else stats["rows"]
 
 
-def build_manifest_dict(version: str) -> dict:
-    files = {}
+def build_manifest_dict(version: str, files: Optional[dict] = None) -> dict:
+    """`files`: {nome: righe/byte/sha256} già calcolati in copia; altrimenti un passaggio per file."""
+    files = dict(files or {})
     for p in sorted(PUBLIC_LATEST_DIR.glob("*")):
-        if p.is_file():
-            files[p.name] = file_rowcount(p)
+        if p.is_file() and p.name not in files and p.name != PUBLIC_MANIFEST.name:
+            files[p.name] = file_stats(p)
     return {
         "version": version,
         "updated_at": datetime.now(timezone.utc).isoformat(),
@@ -162,8 +164,8 @@ def build_manifest_dict(version: str) -> dict:
     }
 
 
-def write_manifest(version: str, snapshot_dir: Optional[Path] = None) -> None:
-    manifest = build_manifest_dict(version)
+def write_manifest(version: str, snapshot_dir: Optional[Path] = None, files: Optional[dict] = None) -> None:
+    manifest = build_manifest_dict(version, files)
     with open(PUBLIC_MANIFEST, "w", encoding="utf-8") as f:
         json.dump(manifest, f, indent=2, ensure_ascii=False)
     if snapshot_dir is not None:
@@ -348,13 +350,14 @@ def publish_snapshot(upload_to_github: bool = False) -> Tuple[bool, str, List[st
     if not ok:
         return False, msg, []
 
+    copied = {}
     for src, dst in [
         (PROCESSED_STANDINGS, PUBLIC_LATEST_DIR / "standings.csv"),
         (PROCESSED_PLAYER_POINTS, PUBLIC_LATEST_DIR / "player_points.csv"),
         (PROCESSED_TEAM_POINTS, PUBLIC_LATEST_DIR / "team_points.csv"),
     ]:
         if src.exists():
-            shutil.copy2(src, dst)
+            copied[dst.name] = copy_with_stats(src, dst)
 
     version = now_ts()
     snapshot_dir = PUBLIC_SNAPSHOTS_DIR / version
@@ -364,7 +367,7 @@ def publish_snapshot(upload_to_github: bool = False) -> Tuple[bool, str, List[st
         if p.is_file():
             shutil.copy2(p, snapshot_dir / p.name)
 
-    write_manifest(version=version, snapshot_dir=snapshot_dir)
+    write_manifest(version=version, snapshot_dir=snapshot_dir, files=copied)
 
     github_msgs: List[str] = []
     if upload_to_github:
@@ -7,6 +7,12 @@ from typing import Optional, Tuple, List
 import pandas as pd
 import streamlit as st
 
+from ft_backend.compute.cube import dimension_values, query_cube
+from ft_backend.io.snapshot_db import SnapshotDB
+from ft_backend.publish.diff import FEED_NAME
+from ft_backend.publish.integrity import verify_file
+from ft_backend.publish.local import resolve_latest
+
 # ------------------------------------------------------------
 # FantaTennis — User App
 # Robust version with:
@@ -18,9 +24,14 @@ import streamlit as st
 st.set_page_config(page_title="FantaTennis", layout="wide")
 
 BASE_DIR = Path(".")
-PUBLIC_DIR = Path(os.getenv("FT_PUBLIC_DIR", "data/public/latest"))
+PUBLIC_LATEST = Path(os.getenv("FT_PUBLIC_DIR", "data/public/latest"))
+# latest è un symlink a una versione immutabile: risolto una volta per run, tutti i
+# file letti in questo run appartengono alla stessa pubblicazione (niente mix)
+PUBLIC_DIR = resolve_latest(PUBLIC_LATEST)
 RAW_DIR = Path(os.getenv("FT_RAW_DIR", "data/raw"))
 MANIFEST_NAME = os.getenv("FT_MANIFEST_NAME", "manifest.json")
+LIVE_PATH = Path(os.getenv("FT_LIVE_PATH", "data/public/live/live_standings.json"))
+ANALYTICS_DB = Path(os.getenv("FT_ANALYTICS_DB", "data/public/analytics.sqlite"))
 
 
 # ------------------------------------------------------------
@@ -45,7 +56,8 @@ def normalize_cols(df: pd.DataFrame) -> pd.DataFrame:
 
 
 @st.cache_data(ttl=60)
-def read_csv_safe(path_str: str) -> Optional[pd.DataFrame]:
+def read_csv_safe(path_str: str, version: str = "") -> Optional[pd.DataFrame]:
+    """`version` (dal manifest) fa parte della chiave di cache: nuova pubblicazione -> nuova lettura."""
     path = Path(path_str)
     if not path.exists():
         return None
@@ -63,6 +75,19 @@ def read_csv_safe(path_str: str) -> Optional[pd.DataFrame]:
     return None
 
 
+@st.cache_data(ttl=60)
+def read_change_feed(public_dir: str, version: str) -> dict:
+    """changes.json della versione pubblicata (diff riga per riga rispetto alla precedente)."""
+    path = Path(public_dir) / FEED_NAME
+    if not path.exists():
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
 @st.cache_data(ttl=60)
 def read_manifest(public_dir: str) -> dict:
     path = Path(public_dir) / MANIFEST_NAME
@@ -87,7 +112,7 @@ def candidate_paths(filename: str) -> List[Path]:
 
 def read_with_fallback(filename: str) -> Tuple[Optional[pd.DataFrame], Optional[Path]]:
     for p in candidate_paths(filename):
-        df = read_csv_safe(str(p))
+        df = read_csv_safe(str(p), version)
         if df is not None:
             return df, p
     return None, None
@@ -144,6 +169,8 @@ df_team_points, team_points_src = read_with_fallback("team_points.csv")
 df_team_rosters, team_rosters_src = read_with_fallback("team_rosters.csv")
 df_player_points, player_points_src = read_with_fallback("player_points.csv")
 df_md_players, md_players_src = read_with_fallback("md_players.csv")
+df_lineup, lineup_src = read_with_fallback("lineup_hindsight.csv")
+df_cube, cube_src = read_with_fallback("points_cube.csv")
 
 st.sidebar.title("FantaTennis")
 st.sidebar.caption("User App")
@@ -155,7 +182,7 @@ if version:
 
 page = st.sidebar.radio(
     "Navigate",
-    ["Home", "Standings", "Teams", "Players", "Diagnostics"],
+    ["Home", "Standings", "Live", "Teams", "Bench", "Explore", "History", "Players", "Diagnostics"],
     index=0
 )
 
@@ -179,9 +206,23 @@ if page == "Home":
         {"file": "team_rosters.csv", "source": str(team_rosters_src) if team_rosters_src else "missing"},
         {"file": "player_points.csv", "source": str(player_points_src) if player_points_src else "missing"},
         {"file": "md_players.csv", "source": str(md_players_src) if md_players_src else "missing"},
+        {"file": "lineup_hindsight.csv", "source": str(lineup_src) if lineup_src else "missing"},
+        {"file": "points_cube.csv", "source": str(cube_src) if cube_src else "missing"},
     ])
     st.dataframe(status, use_container_width=True, hide_index=True)
 
+    feed = read_change_feed(str(PUBLIC_DIR), version)
+    if feed.get("counts"):
+        st.subheader("Novità di questa pubblicazione")
+        st.caption(f"Rispetto alla versione {feed.get('from') or '—'}")
+        counts = pd.DataFrame([{"table": t, **c} for t, c in feed["counts"].items()])
+        st.dataframe(counts, use_container_width=True, hide_index=True)
+        changed_standings = feed["tables"].get("standings", {})
+        rows = changed_standings.get("insert", []) + changed_standings.get("update", [])
+        if rows:
+            with st.expander("Righe di classifica nuove o aggiornate"):
+                st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+
     if df_standings is not None and len(df_standings) > 0:
         st.subheader("Top standings")
         st.dataframe(df_standings.head(10), use_container_width=True, hide_index=True)
@@ -204,6 +245,35 @@ elif page == "Standings":
 
     st.dataframe(view, use_container_width=True, hide_index=True)
 
+elif page == "Live":
+    st.title("Live")
+    st.caption("Classifica live durante il torneo (aggiornata dal servizio ft_backend.live.service).")
+
+    def render_live() -> None:
+        # niente cache: il file è piccolo e scritto in modo atomico dal servizio
+        if not LIVE_PATH.exists():
+            st.info(f"Nessun feed live attivo ({LIVE_PATH}).")
+            return
+        try:
+            with open(LIVE_PATH, "r", encoding="utf-8") as f:
+                live = json.load(f)
+        except Exception as e:
+            st.warning(f"Feed live non leggibile: {e}")
+            return
+        st.write(f"**Update:** {fmt_dt(live.get('updated_at', ''))} — seq {live.get('seq', 0)}")
+        st.dataframe(pd.DataFrame(live.get("standings", [])), use_container_width=True, hide_index=True)
+        players = live.get("players", {})
+        if players:
+            st.subheader("Giocatori")
+            pl = pd.DataFrame([{"player": k, "live_points": v} for k, v in players.items()])
+            st.dataframe(pl.sort_values("live_points", ascending=False), use_container_width=True, hide_index=True)
+
+    if hasattr(st, "fragment"):
+        st.fragment(run_every=1)(render_live)()
+    else:
+        render_live()
+        st.button("Refresh")
+
 elif page == "Teams":
     st.title("Teams")
 
@@ -278,6 +348,110 @@ elif page == "Teams":
     if missing_names:
         st.warning(f"{missing_names} players in this roster did not match md_players by id_player.")
 
+elif page == "Bench":
+    st.title("Punti lasciati in panchina")
+    st.caption("Formazione ottimale col senno di poi (migliori N della rosa per torneo) vs titolari effettivi.")
+    require_df(df_lineup, "Missing lineup_hindsight.csv in data/public/latest/ (published by the admin compute when the repo has season results and teams.json)")
+
+    lineup = df_lineup.copy()
+    if "Season" in lineup.columns:
+        seasons = sorted(lineup["Season"].dropna().astype(str).unique().tolist())
+        if seasons:
+            sel_season = st.selectbox("Season", seasons, index=len(seasons) - 1)
+            lineup = lineup[lineup["Season"].astype(str) == sel_season]
+
+    value_cols = [c for c in ["Punti titolari", "Punti formazione ottimale", "Punti persi"] if c in lineup.columns]
+    if "Team" in lineup.columns and value_cols:
+        summary = (
+            lineup.groupby("Team", as_index=False)[value_cols].sum()
+            .sort_values(value_cols[-1], ascending=False)
+        )
+        st.subheader("Totale per squadra")
+        st.dataframe(summary, use_container_width=True, hide_index=True)
+
+    if "Team" in lineup.columns:
+        teams = sorted(lineup["Team"].dropna().astype(str).unique().tolist())
+        sel_team = st.selectbox("Team", ["(tutte)"] + teams)
+        if sel_team != "(tutte)":
+            lineup = lineup[lineup["Team"].astype(str) == sel_team]
+    st.subheader("Dettaglio per torneo")
+    st.dataframe(lineup, use_container_width=True, hide_index=True)
+
+elif page == "Explore":
+    st.title("Esplora punti")
+    st.caption("Slice dal cubo pre-aggregato pubblicato con lo snapshot (points_cube.csv).")
+    require_df(df_cube, "Missing points_cube.csv in data/public/latest/")
+
+    where = {}
+    seasons = dimension_values(df_cube, "season")
+    if seasons:
+        sel_season = st.selectbox("Season", seasons, index=len(seasons) - 1)
+        where["season"] = sel_season
+
+    st.subheader("Punti dei titolari per tipo torneo")
+    try:
+        starters = query_cube(df_cube, by=["team", "tournament_type"], where={**where, "starter": True})
+        st.dataframe(
+            starters.pivot_table(index="team", columns="tournament_type", values="points", aggfunc="sum", fill_value=0),
+            use_container_width=True,
+        )
+    except ValueError as e:
+        st.info(str(e))
+
+    st.subheader("Top giocatori del mese")
+    months = [m for m in dimension_values(df_cube, "month") if not seasons or m.startswith(str(where["season"])[:4])] \
+        or dimension_values(df_cube, "month")
+    if months:
+        sel_month = st.selectbox("Month", months, index=len(months) - 1)
+        top = query_cube(df_cube, by=["player"], where={"month": sel_month}, top=20)
+        st.dataframe(top, use_container_width=True, hide_index=True)
+    else:
+        st.info("Nessuna data nei risultati pubblicati.")
+
+    st.subheader("Squadra per torneo")
+    teams = dimension_values(df_cube, "team")
+    if teams:
+        sel_team = st.selectbox("Team", teams)
+        by_tournament = query_cube(df_cube, by=["tournament", "tournament_type", "starter"], where={**where, "team": sel_team})
+        by_tournament["starter"] = by_tournament["starter"].map({"1": "titolari", "0": "panchina"}).fillna(by_tournament["starter"])
+        st.dataframe(by_tournament, use_container_width=True, hide_index=True)
+    else:
+        st.info("Nessuna squadra nel cubo.")
+
+elif page == "History":
+    st.title("Storico snapshot")
+    st.caption("Query sul database analitico degli snapshot pubblicati (analytics.sqlite).")
+    if not ANALYTICS_DB.exists():
+        st.info(f"Database analitico non disponibile ({ANALYTICS_DB}).")
+        st.stop()
+
+    db = SnapshotDB(ANALYTICS_DB)
+    try:
+        snapshot_ids = db.snapshot_ids()
+        st.write(f"**Snapshot caricati:** {len(snapshot_ids)}")
+
+        st.subheader("Andamento classifica")
+        history = db.rank_history()
+        if history.empty:
+            st.info("Nessuna classifica negli snapshot.")
+        else:
+            wide = history.pivot_table(index="date", columns="team_name", values="rank", aggfunc="min")
+            st.line_chart(wide)
+            st.dataframe(history, use_container_width=True, hide_index=True)
+
+        if len(snapshot_ids) >= 2:
+            st.subheader("Correzioni punti tra versioni")
+            c1, c2 = st.columns(2)
+            old_id = c1.selectbox("Da", snapshot_ids, index=len(snapshot_ids) - 2)
+            new_id = c2.selectbox("A", snapshot_ids, index=len(snapshot_ids) - 1)
+            corrections = db.point_corrections(old_id, new_id)
+            if corrections.empty:
+                st.success("Nessuna differenza nei punti giocatore.")
+            else:
+                st.dataframe(corrections, use_container_width=True, hide_index=True)
+    finally:
+        db.close()
+
 elif page == "Players":
     st.title("Players")
     require_df(
@@ -330,15 +504,21 @@ elif page == "Players":
 else:
     st.title("Diagnostics")
 
+    # integrità: dimensione + sha256 contro il manifest (solo file pubblicati)
+    manifest_files = manifest.get("files") or {}
     rows = []
-    for fname in ["standings.csv", "team_points.csv", "team_rosters.csv", "player_points.csv", "md_players.csv", MANIFEST_NAME]:
+    for fname in ["standings.csv", "team_points.csv", "team_rosters.csv", "player_points.csv", "md_players.csv", "points_cube.csv", MANIFEST_NAME]:
         srcs = candidate_paths(fname) if fname != MANIFEST_NAME else [PUBLIC_DIR / MANIFEST_NAME]
         for p in srcs:
+            expected = manifest_files.get(fname) if p.parent == PUBLIC_DIR else None
+            verified = verify_file(p, expected) if p.exists() else None
             rows.append({
                 "file": fname,
                 "path": str(p),
                 "exists": p.exists(),
                 "size_bytes": int(p.stat().st_size) if p.exists() else 0,
+                "rows": expected.get("rows") if isinstance(expected, dict) else expected,
+                "verified": "" if verified is None else ("✅" if verified else "❌ mismatch"),
             })
 
     st.subheader("File presence")
@@ -0,0 +1,172 @@
+"""
+Benchmark della pipeline di scoring/classifiche su leghe sintetiche.
+
+Uso (dalla root del repo):
+    python -m benchmarks.run                         # tutte le scale
+    python -m benchmarks.run --scales small,medium --repeat 5
+    python -m benchmarks.run --compare benchmarks/results/<precedente>.json
+
+Ogni run scrive benchmarks/results/<timestamp>.json; con --compare stampa il
+rapporto median(nuovo) / median(precedente) per ogni (bench, scale).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import statistics
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from ft_backend.compute.build_marts import add_fantapoints, lineup_hindsight, team_standings_season
+from ft_backend.compute.match_points import map_results_to_ids, player_points_from_results, team_marts
+from ft_backend.io.stores import MemoryStore
+from ft_backend.normalize.results import normalize_results_upload
+from ft_backend.publish.snapshot import publish_snapshot
+
+from .synth import SynthLeague, generate_league
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+SCALES: Dict[str, Dict[str, int]] = {
+    "small": {"n_players": 200, "n_teams": 10, "n_seasons": 1},
+    "medium": {"n_players": 1000, "n_teams": 100, "n_seasons": 3},
+    "large": {"n_players": 2000, "n_teams": 500, "n_seasons": 10},
+}
+
+
+def _compute_core(league: SynthLeague) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    results, _, _ = map_results_to_ids(league.results_matches, league.md_players)
+    player_points = player_points_from_results(results)
+    team_points, standings = team_marts(player_points, league.team_rosters)
+    return player_points, team_points, standings
+
+
+def _benchmarks(league: SynthLeague) -> List[Tuple[str, int, Callable[[], Any]]]:
+    """(nome, righe in input, callable) per ogni benchmark della scala."""
+    scored = add_fantapoints(league.results_classic, league.multipliers)
+    player_points, team_points, standings = _compute_core(league)
+    datasets = {
+        "md_players": league.md_players,
+        "team_rosters": league.team_rosters,
+        "player_points": player_points,
+        "team_points": team_points,
+        "standings": standings,
+    }
+    return [
+        ("add_fantapoints", len(league.results_classic),
+         lambda: add_fantapoints(league.results_classic, league.multipliers)),
+        ("team_standings_season", len(scored),
+         lambda: team_standings_season(scored, league.teams)),
+        ("lineup_hindsight", len(scored),
+         lambda: lineup_hindsight(scored, league.teams)),
+        ("normalize_results_upload[stats]", len(league.results_stats),
+         lambda: normalize_results_upload(league.results_stats, 2020, "Synthetic", "Slam")),
+        ("normalize_results_upload[classic]", len(league.results_classic),
+         lambda: normalize_results_upload(league.results_classic, 2020, "Synthetic", "Slam")),
+        ("compute_from_results", len(league.results_matches),
+         lambda: _compute_core(league)),
+        ("publish_snapshot", sum(len(df) for df in datasets.values()),
+         lambda: publish_snapshot(
+             MemoryStore(), "data/public/snapshots/bench", "data/public/latest",
+             datasets, "data/public/latest.json",
+         )),
+    ]
+
+
+def _time(fn: Callable[[], Any], repeat: int) -> List[float]:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def run(scales: List[str], repeat: int, seed: int, only: Optional[List[str]] = None) -> Dict[str, Any]:
+    out: Dict[str, Any] = {
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "seed": seed,
+        "repeat": repeat,
+        "results": [],
+    }
+    for scale in scales:
+        params = SCALES[scale]
+        t0 = time.perf_counter()
+        league = generate_league(seed=seed, **params)
+        print(f"[{scale}] league generated in {time.perf_counter() - t0:.2f}s {params}")
+        for name, rows, fn in _benchmarks(league):
+            if only and not any(o in name for o in only):
+                continue
+            times = _time(fn, repeat)
+            rec = {
+                "bench": name,
+                "scale": scale,
+                "params": params,
+                "rows": int(rows),
+                "min_s": min(times),
+                "median_s": statistics.median(times),
+                "times_s": times,
+            }
+            out["results"].append(rec)
+            print(f"  {name:<36} rows={rows:>8}  median={rec['median_s']:.4f}s  min={rec['min_s']:.4f}s")
+    return out
+
+
+def compare(current: Dict[str, Any], previous: Dict[str, Any]) -> List[Dict[str, Any]]:
+    prev = {(r["bench"], r["scale"]): r for r in previous.get("results", [])}
+    rows = []
+    for r in current.get("results", []):
+        p = prev.get((r["bench"], r["scale"]))
+        if p is None or not p.get("median_s"):
+            continue
+        rows.append({
+            "bench": r["bench"],
+            "scale": r["scale"],
+            "prev_median_s": p["median_s"],
+            "median_s": r["median_s"],
+            "ratio": r["median_s"] / p["median_s"],
+        })
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="FantaTennis pipeline benchmarks")
+    ap.add_argument("--scales", default=",".join(SCALES), help=f"comma separated, among {list(SCALES)}")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--only", default="", help="comma separated substrings of bench names")
+    ap.add_argument("--out", default="", help="output JSON path (default benchmarks/results/<ts>.json)")
+    ap.add_argument("--compare", default="", help="previous results JSON to compare against")
+    args = ap.parse_args(argv)
+
+    scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+    unknown = [s for s in scales if s not in SCALES]
+    if unknown:
+        ap.error(f"unknown scales: {unknown}")
+    only = [s.strip() for s in args.only.split(",") if s.strip()] or None
+
+    result = run(scales, args.repeat, args.seed, only)
+
+    out_path = Path(args.out) if args.out else RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f"saved {out_path}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        for r in compare(result, previous):
+            print(f"  {r['bench']:<36} {r['scale']:<7} x{r['ratio']:.2f} "
+                  f"({r['prev_median_s']:.4f}s -> {r['median_s']:.4f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from ft_backend.compute.scoring import BONUS_FLAGS, MALUS_FLAGS
+
+# Calendario sintetico per stagione: 4 Slam + 9 Masters 1000 (tabellone da 128)
+SLAMS = ["Australian Open", "Roland Garros", "Wimbledon", "US Open"]
+MASTERS = [
+    "Indian Wells", "Miami", "Monte Carlo", "Madrid", "Roma",
+    "Canada", "Cincinnati", "Shanghai", "Paris",
+]
+ROUNDS_128 = ["R128", "R64", "R32", "R16", "QF", "SF", "Final"]
+
+# probabilità di ogni flag bonus/malus in una riga torneo
+FLAG_PROB = 0.05
+
+
+@dataclass(frozen=True)
+class SynthLeague:
+    md_players: pd.DataFrame        # id_player, player
+    multipliers: pd.DataFrame       # ranking, player, moltiplicatore bonus/malus, id_player, Squadra, Prezzo
+    players: pd.DataFrame           # Giocatore, Squadra, Prezzo (players.csv)
+    team_rosters: pd.DataFrame      # team_id, team_name, id_player
+    teams: List[Dict[str, Any]]     # teams.json
+    results_classic: pd.DataFrame   # formato classico app, una riga per giocatore/torneo
+    results_stats: pd.DataFrame     # formato stats (diretta.it), una riga per giocatore/partita
+    results_matches: pd.DataFrame   # formato admin: date, winner, loser
+
+
+def _player_ids(n: int) -> List[str]:
+    return [f"s{i:05d}" for i in range(n)]
+
+
+def _player_names(n: int) -> List[str]:
+    return [f"Player {i:05d}" for i in range(n)]
+
+
+def _simulate_draw(rng: np.random.Generator, strength: np.ndarray, draw_size: int) -> List[tuple]:
+    """Ritorna [(round, winner_idx, loser_idx), ...] per un tabellone a eliminazione diretta."""
+    entrants = rng.choice(len(strength), size=draw_size, replace=False)
+    matches = []
+    for rnd in ROUNDS_128[-int(np.log2(draw_size)):]:
+        a, b = entrants[0::2], entrants[1::2]
+        p_a = strength[a] / (strength[a] + strength[b])
+        a_wins = rng.random(len(a)) < p_a
+        winners = np.where(a_wins, a, b)
+        losers = np.where(a_wins, b, a)
+        matches.extend((rnd, int(w), int(l)) for w, l in zip(winners, losers))
+        entrants = winners
+    return matches
+
+
+def generate_league(
+    n_players: int,
+    n_teams: int,
+    n_seasons: int,
+    seed: int = 0,
+    roster_size: int = 10,
+    draw_size: int = 128,
+    first_season: int = 2020,
+) -> SynthLeague:
+    """
+    Lega sintetica deterministica (stesso seed -> stessi dati).
+    n_players deve essere >= draw_size e >= roster_size.
+    """
+    if n_players < max(draw_size, roster_size):
+        raise ValueError(f"n_players must be >= {max(draw_size, roster_size)}")
+
+    rng = np.random.default_rng(seed)
+    ids = _player_ids(n_players)
+    names = _player_names(n_players)
+    ranking = np.arange(1, n_players + 1)
+    strength = 1.0 / np.sqrt(ranking)
+
+    md_players = pd.DataFrame({"id_player": ids, "player": names})
+
+    prezzo = np.maximum(1, np.round(70 / np.sqrt(ranking) + rng.integers(0, 5, n_players))).astype(int)
+    clubs = np.array(["Milan", "Lazio", "Juve", "Toro", "Inter", "Roma", "Napoli", "Genoa"])
+    squadra = clubs[rng.integers(0, len(clubs), n_players)]
+    malus_mult = np.where(ranking <= 10, 1.9, np.where(ranking <= 50, 1.5, 1.0))
+    bonus_mult = np.where(ranking <= 50, 1.0, np.where(ranking <= 200, 1.2, 1.5))
+    multipliers = pd.DataFrame({
+        "ranking": ranking,
+        "player": names,
+        "moltiplicatore bonus": bonus_mult,
+        "moltiplicatore malus": malus_mult,
+        "id_player": ids,
+        "Squadra": squadra,
+        "Prezzo": prezzo,
+    })
+    players = pd.DataFrame({"Giocatore": names, "Squadra": squadra, "Prezzo": prezzo})
+
+    roster_rows = []
+    teams = []
+    for t in range(n_teams):
+        picks = rng.choice(n_players, size=roster_size, replace=False)
+        team_id = f"T{t + 1}"
+        team_name = f"Team {t + 1:04d}"
+        roster_rows.extend({"team_id": team_id, "team_name": team_name, "id_player": ids[i]} for i in picks)
+        teams.append({
+            "name": team_name,
+            "manager": f"Manager {t + 1:04d}",
+            "budget": 100,
+            "players": [names[i] for i in picks],
+        })
+    team_rosters = pd.DataFrame(roster_rows)
+
+    classic_parts = []
+    stats_parts = []
+    match_parts = []
+    flag_cols = list(BONUS_FLAGS.keys()) + list(MALUS_FLAGS.keys())
+    calendar = [(n, "Slam") for n in SLAMS] + [(n, "1000") for n in MASTERS]
+
+    for s in range(n_seasons):
+        season = first_season + s
+        start = pd.Timestamp(f"{season}-01-10")
+        for k, (t_name, t_type) in enumerate(calendar):
+            t_start = start + pd.Timedelta(days=25 * k)
+            matches = _simulate_draw(rng, strength, draw_size)
+            rnd = np.array([m[0] for m in matches])
+            w = np.array([m[1] for m in matches])
+            l = np.array([m[2] for m in matches])
+            day = np.array([ROUNDS_128.index(r) for r in rnd]) * 2
+            dates = (t_start + pd.to_timedelta(day, unit="D")).strftime("%Y-%m-%d")
+            n_m = len(matches)
+            tid = f"{season}_{t_name.replace(' ', '_')}"
+
+            match_parts.append(pd.DataFrame({
+                "date": dates,
+                "winner": np.array(names, dtype=object)[w],
+                "loser": np.array(names, dtype=object)[l],
+                "tournament": t_name,
+            }))
+
+            stats_parts.append(pd.DataFrame({
+                "match_id": np.repeat([f"{tid}_{i:03d}" for i in range(n_m)], 2),
+                "match_date": np.repeat(dates, 2),
+                "tournament_id": tid,
+                "event_type": "slam" if t_type == "Slam" else "1000",
+                "round": np.repeat(rnd, 2),
+                "player_name": np.array(names, dtype=object)[np.column_stack([w, l]).ravel()],
+                "result": np.tile(["W", "L"], n_m),
+                "aces": rng.poisson(6, 2 * n_m),
+                "double_faults": rng.poisson(3, 2 * n_m),
+                "season": season,
+            }))
+
+            # riga classica: vittorie/sconfitte e turno raggiunto per giocatore
+            entrants = np.unique(np.concatenate([w, l]))
+            won = pd.Series(w).value_counts().reindex(entrants, fill_value=0).to_numpy()
+            lost = pd.Series(l).value_counts().reindex(entrants, fill_value=0).to_numpy()
+            reached = pd.Series(rnd, index=l).reindex(entrants).fillna("Winner").to_numpy()
+            classic = pd.DataFrame({
+                "Season": season,
+                "Tournament": t_name,
+                "Tournament Type": t_type,
+                "Giocatore": np.array(names, dtype=object)[entrants],
+                "Round Reached": reached,
+                "Matches Won": won,
+                "Matches Lost": lost,
+                "Aces": rng.poisson(6 * np.maximum(won + lost, 1)),
+                "Double Faults": rng.poisson(3 * np.maximum(won + lost, 1)),
+            })
+            flags = (rng.random((len(entrants), len(flag_cols))) < FLAG_PROB).astype(int)
+            classic[flag_cols] = flags
+            classic_parts.append(classic)
+
+    return SynthLeague(
+        md_players=md_players,
+        multipliers=multipliers,
+        players=players,
+        team_rosters=team_rosters,
+        teams=teams,
+        results_classic=pd.concat(classic_parts, ignore_index=True),
+        results_stats=pd.concat(stats_parts, ignore_index=True),
+        results_matches=pd.concat(match_parts, ignore_index=True),
+    )
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .flag_stats import RuleWeights, component_columns, row_components, weight_vector
+from .scoring import BONUS_FLAGS, MALUS_FLAGS
+
+FLAG_NAMES = list(BONUS_FLAGS) + list(MALUS_FLAGS)
+BREAKDOWN_COLUMNS = [
+    "base", "round_bonus", "ace_pts", "df_pts", "flags_total", "total_before_mult",
+    "bonus_mult", "malus_mult", "pos_after_mult", "neg_after_mult",
+]
+
+
+class ComponentStore:
+    """
+    Componenti di punteggio per riga in forma colonnare (matrice float, una colonna per
+    componente di flag_stats) + vettore pesi. Lo scoring bulk è un prodotto matrice-vettore;
+    il breakdown (stesso contenuto del dict di compute_points_with_multipliers) si calcola
+    solo per le righe richieste, con una cache LRU per giocatore.
+    """
+
+    def __init__(self, results_norm: pd.DataFrame, weights: Optional[RuleWeights] = None, cache_size: int = 64):
+        self.results = results_norm.reset_index(drop=True)
+        self.columns = component_columns()
+        self._col = {c: i for i, c in enumerate(self.columns)}
+        self.matrix = row_components(self.results)[self.columns].to_numpy(dtype=float)
+        self.weights = weights or RuleWeights()
+        self.w = weight_vector(self.weights)
+        self.raw = self.matrix @ self.w
+
+        self.names = self.results["Giocatore"].astype(str).str.strip() if "Giocatore" in self.results.columns \
+            else pd.Series([""] * len(self.results))
+        self._key = self.names.str.lower()
+        self._rows = {k: np.asarray(v) for k, v in self._key.groupby(self._key).indices.items()}
+        self.bonus_mult = np.ones(len(self.raw))
+        self.malus_mult = np.ones(len(self.raw))
+
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+
+    # -------------------- scoring bulk --------------------
+    def set_multipliers(self, bonus: np.ndarray, malus: np.ndarray) -> None:
+        self.bonus_mult = np.asarray(bonus, dtype=float)
+        self.malus_mult = np.asarray(malus, dtype=float)
+        self._cache.clear()
+
+    def fantapoints(self) -> np.ndarray:
+        return np.maximum(self.raw, 0.0) * self.bonus_mult + np.minimum(self.raw, 0.0) * self.malus_mult
+
+    def scored_columns(self) -> pd.DataFrame:
+        """Le colonne di add_fantapoints, senza dict per riga."""
+        raw = self.raw
+        return pd.DataFrame({
+            "RawPoints": raw,
+            "BonusPoints": np.maximum(raw, 0.0),
+            "MalusPoints": np.minimum(raw, 0.0),
+            "BonusMultiplier": self.bonus_mult,
+            "MalusMultiplier": self.malus_mult,
+            "Fantapoints": self.fantapoints(),
+        })
+
+    # -------------------- breakdown on demand --------------------
+    def _part(self, rows: np.ndarray, cols: Sequence[str]) -> np.ndarray:
+        idx = [self._col[c] for c in cols]
+        return self.matrix[np.ix_(rows, idx)] @ self.w[idx]
+
+    def breakdown_rows(self, rows: Sequence[int]) -> pd.DataFrame:
+        """Breakdown per le righe indicate: componenti aggregate + punti di ogni flag attivo."""
+        rows = np.asarray(rows, dtype=int)
+        rr = [c for c in self.columns if c.startswith("rr__")]
+        out = pd.DataFrame(index=rows)
+        out["Giocatore"] = self.names.to_numpy()[rows]
+        for c in ("Season", "Tournament", "Tournament Type", "Round Reached"):
+            if c in self.results.columns:
+                out[c] = self.results[c].to_numpy()[rows]
+        out["base"] = self._part(rows, ["wins", "losses"])
+        out["round_bonus"] = self._part(rows, rr)
+        out["ace_pts"] = self._part(rows, ["aces"])
+        out["df_pts"] = self._part(rows, ["dfs"])
+        out["flags_total"] = self._part(rows, FLAG_NAMES)
+        out["total_before_mult"] = self.raw[rows]
+        out["bonus_mult"] = self.bonus_mult[rows]
+        out["malus_mult"] = self.malus_mult[rows]
+        out["pos_after_mult"] = np.maximum(self.raw[rows], 0.0) * self.bonus_mult[rows]
+        out["neg_after_mult"] = np.minimum(self.raw[rows], 0.0) * self.malus_mult[rows]
+        for f in FLAG_NAMES:
+            out[f] = self.matrix[rows, self._col[f]] * self.w[self._col[f]]
+        return out
+
+    def player_breakdown(self, player: str) -> pd.DataFrame:
+        """Breakdown di tutte le righe di un giocatore (LRU sugli ultimi giocatori consultati)."""
+        key = str(player).strip().lower()
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        rows = self._rows.get(key, np.array([], dtype=int))
+        df = self.breakdown_rows(rows)
+        self._cache[key] = df
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return df
+
+    def invalidate(self, player: Optional[str] = None) -> None:
+        if player is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(str(player).strip().lower(), None)
+
+    def row_breakdown(self, row: int) -> Dict[str, Any]:
+        """Stesso formato del breakdown di compute_points_with_multipliers per una riga."""
+        b = self.breakdown_rows([row]).iloc[0]
+        out: Dict[str, Any] = {c: float(b[c]) for c in BREAKDOWN_COLUMNS}
+        out["flags"] = {f: float(b[f]) for f in FLAG_NAMES if self.matrix[row, self._col[f]] == 1}
+        return out
+
+    def rows_of(self, player: str) -> np.ndarray:
+        return self._rows.get(str(player).strip().lower(), np.array([], dtype=int))
+
+    def cache_info(self) -> Tuple[int, int]:
+        return len(self._cache), self.cache_size
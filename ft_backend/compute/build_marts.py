@@ -1,45 +1,55 @@
 
 from __future__ import annotations
 
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+import numpy as np
 import pandas as pd
 
-from .multipliers import build_multiplier_dicts
-from .scoring import compute_points_with_multipliers
+from ..io.multipliers import load_multipliers
+from .breakdown import ComponentStore
+from .cube import build_points_cube
+from .flag_stats import build_flag_aggregates
+from .multipliers import MultiplierStore, apply_history, row_ids
+from .projections import fit_projections, player_tournament_points
 
+# Titolari per tipo torneo: primi N giocatori in lista nella rosa
+STARTERS_BY_TYPE = {"Slam": 8, "1000": 6}
 
-def add_fantapoints(results_norm: pd.DataFrame, multipliers_df: pd.DataFrame) -> pd.DataFrame:
-    """Aggiunge colonne RawPoints/BonusPoints/MalusPoints/*Multiplier/Fantapoints."""
+TOURNAMENT_KEYS = ["Season", "Tournament", "Tournament Type"]
+LINEUP_COLUMNS = [
+    "Team", "Manager", "Season", "Tournament", "Tournament Type", "Starters",
+    "Punti titolari", "Punti formazione ottimale", "Punti persi", "Efficienza %",
+    "Panchinari da schierare", "Titolari da togliere",
+]
+
+
+def add_fantapoints(
+    results_norm: pd.DataFrame,
+    multipliers_df: pd.DataFrame,
+    history: Optional[MultiplierStore] = None,
+    date_col: str = "match_date",
+) -> pd.DataFrame:
+    """
+    Aggiunge colonne RawPoints/BonusPoints/MalusPoints/*Multiplier/Fantapoints.
+    Scoring colonnare (ComponentStore): nessun breakdown per riga, che resta disponibile
+    su richiesta con ComponentStore.player_breakdown / row_breakdown.
+    Con `history` le righe che hanno la data del match usano i moltiplicatori validi a
+    quella data (id_player dalla colonna omonima o da Giocatore via ranking_multipliers);
+    le altre usano i moltiplicatori correnti.
+    """
     df = results_norm.copy()
-    bonus_dict, malus_dict = build_multiplier_dicts(multipliers_df)
-
-    def _row_to_dict(row: pd.Series) -> dict:
-        return row.to_dict()
-
-    out_cols = []
-    raws=[]
-    bonus=[]
-    malus=[]
-    bmul=[]
-    mmul=[]
-    fpts=[]
-    # vectorization is possible, but keep simple & robust
-    for _, r in df.iterrows():
-        pos_adj, neg_adj, breakdown = compute_points_with_multipliers(_row_to_dict(r), bonus_dict, malus_dict)
-        raw = breakdown["total_before_mult"]
-        raws.append(raw)
-        bonus.append(max(raw, 0.0))
-        malus.append(min(raw, 0.0))
-        bmul.append(breakdown["bonus_mult"])
-        mmul.append(breakdown["malus_mult"])
-        fpts.append(breakdown["pos_after_mult"] + breakdown["neg_after_mult"])
-
-    df["RawPoints"] = raws
-    df["BonusPoints"] = bonus
-    df["MalusPoints"] = malus
-    df["BonusMultiplier"] = bmul
-    df["MalusMultiplier"] = mmul
-    df["Fantapoints"] = fpts
+    store = ComponentStore(df)
+    bonus, malus = np.ones(len(df)), np.ones(len(df))
+    if multipliers_df is not None and not multipliers_df.empty:
+        table, _ = load_multipliers(multipliers_df)
+        bonus, malus = table.lookup_names(store.names)
+    if history is not None and date_col in store.results.columns:
+        ids = row_ids(store.results, store.names, multipliers_df)
+        bonus, malus, _ = apply_history(history, ids, store.results[date_col], bonus, malus)
+    store.set_multipliers(bonus, malus)
+    points = store.scored_columns()
+    for c in points.columns:
+        df[c] = points[c].to_numpy()
     return df
 
 
@@ -62,8 +72,8 @@ def team_standings_season(df_with_points: pd.DataFrame, teams: List[Dict[str, An
     rows=[]
     for team in teams or []:
         team_players = team.get("players", []) or []
-        starters_slam = team_players[:8]
-        starters_1000 = team_players[:6]
+        starters_slam = team_players[:STARTERS_BY_TYPE["Slam"]]
+        starters_1000 = team_players[:STARTERS_BY_TYPE["1000"]]
 
         df_team = df_with_points[df_with_points["Giocatore"].isin(team_players)].copy()
         if df_team.empty:
@@ -85,3 +95,144 @@ def team_standings_season(df_with_points: pd.DataFrame, teams: List[Dict[str, An
             "Totale punti stagione (solo titolari)": int(total_points),
         })
     return pd.DataFrame(rows).sort_values("Totale punti stagione (solo titolari)", ascending=False).reset_index(drop=True)
+
+
+def _roster_frame(teams: List[Dict[str, Any]]) -> pd.DataFrame:
+    rows = []
+    for team in teams or []:
+        for pos, p in enumerate(team.get("players", []) or []):
+            rows.append({"Team": team.get("name", ""), "Manager": team.get("manager", ""),
+                         "Giocatore": str(p).strip(), "pos": pos})
+    return pd.DataFrame(rows, columns=["Team", "Manager", "Giocatore", "pos"])
+
+
+def lineup_hindsight(df_with_points: pd.DataFrame, teams: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Formazione ottimale "col senno di poi" per ogni (squadra, torneo).
+
+    Per ciascun torneo i titolari effettivi sono i primi N della rosa (Slam=8, 1000=6,
+    come team_standings_season); l'ottimo sono gli N giocatori della rosa con più
+    Fantapoints in quel torneo. Un solo sort + cumcount per tutte le squadre e tutti
+    i tornei: niente loop per gruppo. Un giocatore senza righe nel torneo vale 0.
+    """
+    if df_with_points is None or df_with_points.empty or not teams:
+        return pd.DataFrame(columns=LINEUP_COLUMNS)
+
+    df = df_with_points
+    keys = pd.DataFrame({k: (df[k] if k in df.columns else "") for k in TOURNAMENT_KEYS})
+    keys["Giocatore"] = df["Giocatore"].astype(str).str.strip()
+    keys["Fantapoints"] = pd.to_numeric(df["Fantapoints"], errors="coerce").fillna(0.0)
+    keys = keys[keys["Tournament Type"].isin(list(STARTERS_BY_TYPE))]
+    pts = keys.groupby(TOURNAMENT_KEYS + ["Giocatore"], as_index=False, dropna=False)["Fantapoints"].sum()
+
+    tournaments = pts[TOURNAMENT_KEYS].drop_duplicates()
+    roster = _roster_frame(teams)
+    grid = roster.merge(tournaments, how="cross")
+    grid = grid.merge(pts, on=TOURNAMENT_KEYS + ["Giocatore"], how="left")
+    grid["Fantapoints"] = grid["Fantapoints"].fillna(0.0)
+    grid["k"] = grid["Tournament Type"].map(STARTERS_BY_TYPE).astype(int)
+
+    group = ["Team"] + TOURNAMENT_KEYS
+    grid["actual"] = grid["pos"] < grid["k"]
+    # top-k per gruppo: a parità di punti preferisce l'ordine di rosa (ottimo = attuale se equivalente)
+    grid = grid.sort_values(group + ["Fantapoints", "pos"], ascending=[True] * len(group) + [False, True])
+    grid["optimal"] = grid.groupby(group, sort=False, dropna=False).cumcount() < grid["k"]
+
+    grid["pts_actual"] = np.where(grid["actual"], grid["Fantapoints"], 0.0)
+    grid["pts_optimal"] = np.where(grid["optimal"], grid["Fantapoints"], 0.0)
+    grid["bench_in"] = np.where(grid["optimal"] & ~grid["actual"], grid["Giocatore"], "")
+    grid["starter_out"] = np.where(grid["actual"] & ~grid["optimal"], grid["Giocatore"], "")
+
+    def _names(s: pd.Series) -> str:
+        return ", ".join(x for x in s if x)
+
+    out = (
+        grid.groupby(group + ["Manager"], as_index=False, dropna=False, sort=False)
+        .agg(**{
+            "Starters": ("k", "first"),
+            "Punti titolari": ("pts_actual", "sum"),
+            "Punti formazione ottimale": ("pts_optimal", "sum"),
+            "Panchinari da schierare": ("bench_in", _names),
+            "Titolari da togliere": ("starter_out", _names),
+        })
+    )
+    out["Punti persi"] = out["Punti formazione ottimale"] - out["Punti titolari"]
+    out["Efficienza %"] = np.where(
+        out["Punti formazione ottimale"] > 0,
+        100.0 * out["Punti titolari"] / out["Punti formazione ottimale"].where(out["Punti formazione ottimale"] > 0, 1.0),
+        100.0,
+    ).round(1)
+    for c in ("Punti titolari", "Punti formazione ottimale", "Punti persi"):
+        out[c] = out[c].round(2)
+    return out[LINEUP_COLUMNS].sort_values(["Season", "Tournament", "Punti persi"], ascending=[True, True, False]).reset_index(drop=True)
+
+
+def lineup_hindsight_summary(lineup: pd.DataFrame) -> pd.DataFrame:
+    """Totale stagione per squadra: punti titolari, ottimali e persi in panchina."""
+    if lineup is None or lineup.empty:
+        return pd.DataFrame(columns=["Team", "Manager", "Season", "Punti titolari", "Punti formazione ottimale", "Punti persi"])
+    return (
+        lineup.groupby(["Team", "Manager", "Season"], as_index=False, dropna=False)
+        [["Punti titolari", "Punti formazione ottimale", "Punti persi"]].sum()
+        .sort_values(["Season", "Punti persi"], ascending=[True, False])
+        .reset_index(drop=True)
+    )
+
+
+def points_cube(df_with_points: pd.DataFrame, teams: Optional[List[Dict[str, Any]]] = None) -> pd.DataFrame:
+    """
+    Cubo dei Fantapoints (vedi compute.cube) dallo scoring classico: una riga per partita,
+    per squadra titolare = primi N della rosa per tipo torneo (come team_standings_season).
+    """
+    df = df_with_points
+    date_col = next((c for c in ("match_date", "date", "Date") if c in df.columns), None)
+    facts = pd.DataFrame({
+        "player": df["Giocatore"].astype(str).str.strip(),
+        "season": df["Season"] if "Season" in df.columns else "",
+        "tournament": df["Tournament"] if "Tournament" in df.columns else "",
+        "tournament_type": df["Tournament Type"].astype(str).str.strip().str.title() if "Tournament Type" in df.columns else "",
+        "date": pd.to_datetime(df[date_col], errors="coerce").dt.strftime("%Y-%m-%d") if date_col else "",
+        "points": pd.to_numeric(df["Fantapoints"], errors="coerce").fillna(0.0),
+        "matches": 1,
+    })
+    team_facts = None
+    if teams:
+        roster = _roster_frame(teams).rename(columns={"Team": "team", "Giocatore": "player"})
+        team_facts = facts.merge(roster[["team", "player", "pos"]], on="player", how="inner")
+        team_facts["starter"] = team_facts["pos"] < team_facts["tournament_type"].map(STARTERS_BY_TYPE).fillna(0)
+    return build_points_cube(facts, team_facts)
+
+
+SCORING_MARTS = ("player_points", "player_tournament_stats", "player_projections", "lineup_hindsight", "points_cube")
+
+
+def build_scoring_marts(
+    results_norm: pd.DataFrame,
+    multipliers_df: pd.DataFrame,
+    teams: Optional[List[Dict[str, Any]]] = None,
+    marts: Sequence[str] = SCORING_MARTS,
+    history: Optional[MultiplierStore] = None,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Marts dello scoring classico (solo quelli in `marts`):
+      - player_points: righe con fantapunti (add_fantapoints, as-of con `history`)
+      - player_tournament_stats: statistiche sufficienti per ri-pesare le regole (flag_stats)
+      - player_projections: fantapunti attesi per giocatore e tipo torneo (projections)
+      - lineup_hindsight: formazione ottimale vs titolari effettivi (solo se ci sono le squadre)
+      - points_cube: cubo pre-aggregato squadra × giocatore × torneo × data (compute.cube)
+    """
+    out: Dict[str, pd.DataFrame] = {}
+    if "player_tournament_stats" in marts:
+        out["player_tournament_stats"] = build_flag_aggregates(results_norm)
+    if not {"player_points", "player_projections", "lineup_hindsight", "points_cube"} & set(marts):
+        return out
+    player_points = add_fantapoints(results_norm, multipliers_df, history)
+    if "player_points" in marts:
+        out["player_points"] = player_points
+    if "player_projections" in marts:
+        out["player_projections"] = fit_projections(player_tournament_points(player_points), multipliers_df)
+    if "lineup_hindsight" in marts and teams:
+        out["lineup_hindsight"] = lineup_hindsight(player_points, teams)
+    if "points_cube" in marts:
+        out["points_cube"] = points_cube(player_points, teams)
+    return out
@@ -0,0 +1,213 @@
+"""
+Cubo OLAP pre-aggregato dei punti.
+
+Dimensioni: team, player, season, tournament, tournament_type, date (+ month, livello
+superiore di date), starter. Misure: points, matches.
+
+Il cubo è una tabella unica con una riga per cella di ogni cuboide (grouping set);
+la colonna `grouping` elenca le dimensioni del cuboide, quelle aggregate valgono ALL.
+I cuboidi con team/starter vengono dai fatti per squadra (un giocatore in più rose
+conta in ognuna), gli altri dai fatti per giocatore (nessun doppio conteggio).
+
+query_cube() risponde a una slice scegliendo il cuboide più piccolo che contiene le
+dimensioni richieste: le pagine utente non toccano mai le righe partita.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+import pandas as pd
+
+from .match_points import LOSS_POINTS, WIN_POINTS
+
+ALL = "*"
+CUBE_DIMENSIONS = ["team", "player", "season", "tournament", "tournament_type", "date", "month", "starter"]
+TEAM_DIMENSIONS = {"team", "starter"}
+CUBE_MEASURES = ["points", "matches"]
+CUBE_COLUMNS = ["grouping"] + CUBE_DIMENSIONS + CUBE_MEASURES
+
+# Rollup pubblicati oltre ai due cuboidi base (squadra e giocatore)
+ROLLUPS: List[tuple] = [
+    ("team", "season", "tournament", "tournament_type", "starter"),
+    ("team", "season", "tournament_type", "starter"),
+    ("team", "season", "month", "starter"),
+    ("team", "season", "starter"),
+    ("team", "starter"),
+    ("player", "season", "tournament", "tournament_type"),
+    ("player", "season", "tournament_type"),
+    ("player", "season", "month"),
+    ("player", "season"),
+    ("season", "tournament", "tournament_type"),
+]
+
+
+def _fact_frame(df: pd.DataFrame, team_level: bool) -> pd.DataFrame:
+    """Normalizza un frame di fatti: dimensioni stringa (mancanti -> ""), month da date, misure numeriche."""
+    dims = [d for d in CUBE_DIMENSIONS if team_level or d not in TEAM_DIMENSIONS]
+    out = pd.DataFrame(index=df.index)
+    for d in dims:
+        if d == "month":
+            continue
+        out[d] = df[d].fillna("").astype(str).str.strip() if d in df.columns else ""
+    if team_level:
+        out["starter"] = df["starter"].astype(bool).map({True: "1", False: "0"}) if "starter" in df.columns else "1"
+    out["month"] = out["date"].str.slice(0, 7)
+    if "season" in out.columns:
+        out["season"] = out["season"].where(out["season"] != "", out["date"].str.slice(0, 4))
+    out["points"] = pd.to_numeric(df.get("points", 0.0), errors="coerce").fillna(0.0)
+    out["matches"] = pd.to_numeric(df.get("matches", 1), errors="coerce").fillna(0).astype(int)
+    return out[dims + CUBE_MEASURES]
+
+
+def _cuboid(facts: pd.DataFrame, dims: Sequence[str]) -> pd.DataFrame:
+    dims = list(dims)
+    if facts.empty:
+        return pd.DataFrame(columns=CUBE_COLUMNS)
+    agg = facts.groupby(dims, as_index=False, sort=False)[CUBE_MEASURES].sum() if dims else facts[CUBE_MEASURES].sum().to_frame().T
+    agg["grouping"] = "|".join(dims)
+    for d in CUBE_DIMENSIONS:
+        if d not in dims:
+            agg[d] = ALL
+    return agg[CUBE_COLUMNS]
+
+
+def build_points_cube(player_facts: pd.DataFrame, team_facts: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    player_facts: una riga per (giocatore, partita o giorno) con player, date, points
+    e opzionalmente season/tournament/tournament_type/matches.
+    team_facts: le stesse righe per ogni squadra che ha il giocatore in rosa (+ team, starter).
+    """
+    pf = _fact_frame(player_facts, team_level=False)
+    tf = _fact_frame(team_facts, team_level=True) if team_facts is not None and not team_facts.empty else None
+
+    player_dims = [d for d in CUBE_DIMENSIONS if d not in TEAM_DIMENSIONS]
+    parts = [_cuboid(pf, player_dims)]
+    if tf is not None:
+        parts.append(_cuboid(tf, CUBE_DIMENSIONS))
+    for dims in ROLLUPS:
+        if TEAM_DIMENSIONS & set(dims):
+            if tf is not None:
+                parts.append(_cuboid(tf, dims))
+        else:
+            parts.append(_cuboid(pf, dims))
+    parts = [p for p in parts if not p.empty]
+    if not parts:
+        return pd.DataFrame(columns=CUBE_COLUMNS)
+    cube = pd.concat(parts, ignore_index=True)
+    cube["points"] = cube["points"].astype(float).round(4)
+    cube["matches"] = cube["matches"].astype(int)
+    return cube
+
+
+def cube_facts_from_results(
+    results: pd.DataFrame,
+    md: Optional[pd.DataFrame] = None,
+    rosters: Optional[pd.DataFrame] = None,
+) -> tuple:
+    """
+    Fatti per il modello MVP dell'admin: results(date, winner_id, loser_id) dopo
+    map_results_to_ids (+ season/tournament/tournament_type se presenti), vincitore
+    WIN_POINTS, sconfitto LOSS_POINTS. Nome giocatore da md(id_player, player).
+    Le squadre vengono da rosters(team_id, team_name, id_player); come in team_marts
+    tutti i giocatori in rosa contano, a meno di una colonna `starter` nelle rose.
+    Ritorna (player_facts, team_facts).
+    """
+    extra = [c for c in ("season", "tournament", "tournament_type") if c in results.columns]
+    sides = []
+    for id_col, pts in (("winner_id", WIN_POINTS), ("loser_id", LOSS_POINTS)):
+        side = results[["date", id_col] + extra].rename(columns={id_col: "id_player"})
+        side["points"] = pts
+        sides.append(side)
+    facts = pd.concat(sides, ignore_index=True)
+    facts["id_player"] = facts["id_player"].astype(str).str.strip()
+    facts["matches"] = 1
+
+    if md is not None and {"id_player", "player"} <= set(md.columns):
+        names = dict(zip(md["id_player"].astype(str).str.strip(), md["player"].astype(str).str.strip()))
+        facts["player"] = facts["id_player"].map(names).fillna(facts["id_player"])
+    else:
+        facts["player"] = facts["id_player"]
+
+    if rosters is None or rosters.empty:
+        return facts, None
+    cols = ["team_id", "team_name", "id_player"] + (["starter"] if "starter" in rosters.columns else [])
+    roster = rosters[cols].drop_duplicates(subset=["team_id", "id_player"]).copy()
+    roster["id_player"] = roster["id_player"].astype(str).str.strip()
+    roster["team"] = roster["team_name"].fillna(roster["team_id"]).astype(str)
+    if "starter" in roster.columns:
+        roster["starter"] = pd.to_numeric(roster["starter"], errors="coerce").fillna(0).astype(bool)
+    team_facts = facts.merge(roster.drop(columns=["team_id", "team_name"]), on="id_player", how="inner")
+    return facts, team_facts
+
+
+# ------------------------------------------------------------
+# Query
+# ------------------------------------------------------------
+def _groupings(cube: pd.DataFrame) -> Dict[str, set]:
+    return {g: set(g.split("|")) if g else set() for g in cube["grouping"].unique()}
+
+
+def _match(col: pd.Series, cond: Any) -> pd.Series:
+    if isinstance(cond, tuple) and len(cond) == 2:
+        lo, hi = cond
+        ok = pd.Series(True, index=col.index)
+        if lo is not None:
+            ok &= col >= str(lo)
+        if hi is not None:
+            ok &= col <= str(hi)
+        return ok
+    if isinstance(cond, (list, set, frozenset)):
+        return col.isin([str(c) for c in cond])
+    if isinstance(cond, bool) and col.name == "starter":
+        return col == ("1" if cond else "0")
+    return col == str(cond)
+
+
+def query_cube(
+    cube: pd.DataFrame,
+    by: Iterable[str] = (),
+    where: Optional[Mapping[str, Any]] = None,
+    top: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Slice del cubo: somma di points/matches per le dimensioni `by`, filtrate con `where`
+    ({dim: valore | lista | (min, max)}; per date/month il range è su stringhe ISO).
+    Usa il cuboide più piccolo che contiene by + where; per squadra se servono team/starter.
+    ValueError se nessun cuboide pubblicato copre la slice.
+    """
+    by = list(by)
+    where = dict(where or {})
+    unknown = (set(by) | set(where)) - set(CUBE_DIMENSIONS)
+    if unknown:
+        raise ValueError(f"unknown cube dimensions: {sorted(unknown)}")
+    needed = set(by) | set(where)
+    team_level = bool(needed & TEAM_DIMENSIONS)
+
+    candidates = [
+        g for g, dims in _groupings(cube).items()
+        if needed <= dims and bool(dims & TEAM_DIMENSIONS) == team_level
+    ]
+    if not candidates:
+        raise ValueError(f"no published cuboid covers dimensions {sorted(needed)}")
+    sizes = cube["grouping"].value_counts()
+    grouping = min(candidates, key=lambda g: sizes.get(g, 0))
+
+    sl = cube[cube["grouping"] == grouping]
+    # da CSV le dimensioni vuote tornano NaN e le numeriche (season) come int
+    sl = sl.assign(**{d: sl[d].fillna("").astype(str) for d in needed})
+    for dim, cond in where.items():
+        sl = sl[_match(sl[dim], cond)]
+    if by:
+        out = sl.groupby(by, as_index=False, sort=False)[CUBE_MEASURES].sum()
+    else:
+        out = sl[CUBE_MEASURES].sum().to_frame().T
+    out = out.sort_values("points", ascending=False).reset_index(drop=True)
+    return out.head(top) if top else out
+
+
+def dimension_values(cube: pd.DataFrame, dim: str) -> List[str]:
+    """Valori distinti (ordinati) di una dimensione, escluso ALL: per i filtri delle pagine."""
+    if cube is None or cube.empty or dim not in cube.columns:
+        return []
+    vals = cube[dim].dropna().astype(str)
+    return sorted(v for v in vals.unique() if v not in (ALL, ""))
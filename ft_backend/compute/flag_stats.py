@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .multipliers import build_multiplier_dicts
+from .scoring import ACE_POINT, BONUS_FLAGS, DF_POINT, MALUS_FLAGS, ROUND_BONUS
+
+GROUP_KEYS = ["Giocatore", "Season", "Tournament", "Tournament Type"]
+FLAG_COLUMNS = list(BONUS_FLAGS.keys()) + list(MALUS_FLAGS.keys())
+ALL_ROUNDS = ["Winner", "Final", "SF", "QF", "R16", "R32", "R64", "R128"]
+
+
+@dataclass(frozen=True)
+class RuleWeights:
+    """Vettore pesi delle regole di scoring (default = costanti di scoring.py)."""
+    win_point: float = 6.0
+    loss_point: float = 1.0
+    ace_point: float = ACE_POINT
+    df_point: float = DF_POINT      # sottratto per ogni doppio fallo, come in compute_points_with_multipliers
+    bonus_flags: Dict[str, float] = field(default_factory=lambda: dict(BONUS_FLAGS))
+    malus_flags: Dict[str, float] = field(default_factory=lambda: dict(MALUS_FLAGS))
+    round_bonus: Dict[str, Dict[str, float]] = field(default_factory=lambda: {t: dict(r) for t, r in ROUND_BONUS.items()})
+
+    def with_updates(self, **changes) -> "RuleWeights":
+        """Copia con pesi modificati; bonus_flags/malus_flags/round_bonus parziali vengono fusi."""
+        merged = {}
+        for k, v in changes.items():
+            if k in ("bonus_flags", "malus_flags"):
+                merged[k] = {**getattr(self, k), **v}
+            elif k == "round_bonus":
+                merged[k] = {t: {**self.round_bonus.get(t, {}), **v.get(t, {})}
+                             for t in set(self.round_bonus) | set(v)}
+            else:
+                merged[k] = v
+        return replace(self, **merged)
+
+    def is_sign_preserving(self) -> bool:
+        """
+        True se una riga senza flag malus e senza doppi falli non può avere totale < 0:
+        è la condizione che rende esatto il bucket aggregato 'nonneg' (vedi build_flag_aggregates).
+        """
+        return (
+            self.win_point >= 0 and self.loss_point >= 0 and self.ace_point >= 0
+            and all(v >= 0 for v in self.bonus_flags.values())
+            and all(v >= 0 for r in self.round_bonus.values() for v in r.values())
+        )
+
+
+def _round_col(t_type: str, rnd: str) -> str:
+    return f"rr__{t_type}__{rnd}"
+
+
+def row_components(results_norm: pd.DataFrame) -> pd.DataFrame:
+    """
+    Componenti per riga (vettorizzate) con la stessa semantica di compute_points_with_multipliers:
+    wins, losses, un contatore per flag (==1), aces, dfs e one-hot (tipo torneo, turno).
+    """
+    df = results_norm
+    n = len(df)
+
+    def _num(col: str) -> pd.Series:
+        if col not in df.columns:
+            return pd.Series(np.zeros(n), index=df.index)
+        return pd.to_numeric(df[col], errors="coerce").fillna(0)
+
+    out = pd.DataFrame(index=df.index)
+    out["wins"] = _num("Matches Won").astype(int)
+    out["losses"] = _num("Matches Lost").astype(int)
+    for k in FLAG_COLUMNS:
+        out[k] = (_num(k) == 1).astype(int)
+    out["aces"] = _num("Aces").astype(float)
+    out["dfs"] = _num("Double Faults").astype(float)
+
+    t_type = df.get("Tournament Type", pd.Series("", index=df.index)).astype(str)
+    rnd = df.get("Round Reached", pd.Series("", index=df.index)).astype(str)
+    for t in ROUND_BONUS:
+        for r in ALL_ROUNDS:
+            out[_round_col(t, r)] = ((t_type == t) & (rnd == r)).astype(int)
+    return out
+
+
+def component_columns() -> List[str]:
+    return (
+        ["wins", "losses"] + FLAG_COLUMNS + ["aces", "dfs"]
+        + [_round_col(t, r) for t in ROUND_BONUS for r in ALL_ROUNDS]
+    )
+
+
+def weight_vector(weights: RuleWeights) -> np.ndarray:
+    """Pesi allineati a component_columns(): RawPoints = components @ weight_vector."""
+    w = []
+    for c in component_columns():
+        if c == "wins":
+            w.append(weights.win_point)
+        elif c == "losses":
+            w.append(weights.loss_point)
+        elif c in BONUS_FLAGS:
+            w.append(weights.bonus_flags.get(c, 0.0))
+        elif c in MALUS_FLAGS:
+            w.append(weights.malus_flags.get(c, 0.0))
+        elif c == "aces":
+            w.append(weights.ace_point)
+        elif c == "dfs":
+            w.append(-weights.df_point)
+        else:
+            _, t, r = c.split("__")
+            w.append(weights.round_bonus.get(t, {}).get(r, 0.0))
+    return np.asarray(w, dtype=float)
+
+
+def build_flag_aggregates(results_norm: pd.DataFrame) -> pd.DataFrame:
+    """
+    Statistiche sufficienti per (giocatore, torneo): somme delle componenti di riga.
+
+    Il punteggio pre-moltiplicatore è lineare nelle componenti, quindi la somma è
+    esatta per qualunque vettore pesi. Lo split pos/neg del moltiplicatore invece
+    è per riga, quindi le righe sono divise in due bucket:
+      - 'nonneg': nessun flag malus e zero doppi falli -> totale >= 0 per ogni
+        RuleWeights sign-preserving, aggregate per gruppo;
+      - 'mixed': possono andare sotto zero -> restano una per riga (row_id).
+    """
+    if results_norm is None or results_norm.empty:
+        return pd.DataFrame(columns=GROUP_KEYS + ["bucket", "row_id", "n_rows"] + component_columns())
+
+    comps = row_components(results_norm)
+    keys = pd.DataFrame(index=results_norm.index)
+    for k in GROUP_KEYS:
+        keys[k] = results_norm[k] if k in results_norm.columns else ""
+    keys["Giocatore"] = keys["Giocatore"].astype(str).str.strip()
+
+    mixed = (comps[list(MALUS_FLAGS)].sum(axis=1) > 0) | (comps["dfs"] > 0)
+    keys["bucket"] = np.where(mixed, "mixed", "nonneg")
+    keys["row_id"] = np.where(mixed, np.arange(len(results_norm)), -1)
+
+    full = pd.concat([keys, comps], axis=1)
+    full["n_rows"] = 1
+    agg = (
+        full.groupby(GROUP_KEYS + ["bucket", "row_id"], as_index=False, dropna=False)[["n_rows"] + component_columns()]
+        .sum()
+    )
+    return agg
+
+
+def read_flag_aggregates(path) -> pd.DataFrame:
+    """player_tournament_stats.csv scritto dalla compute, riletto con i tipi di build_flag_aggregates."""
+    df = pd.read_csv(path, encoding="utf-8", dtype={"Giocatore": str, "Tournament": str, "Tournament Type": str, "bucket": str})
+    for c in ["n_rows"] + component_columns():
+        # componenti aggiunte dopo la scrittura del file: zero per tutti i gruppi
+        if c not in df.columns:
+            df[c] = 0
+    return df
+
+
+def score_aggregates(
+    aggs: pd.DataFrame,
+    weights: Optional[RuleWeights] = None,
+    multipliers_df: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
+    """
+    RawPoints e Fantapoints per gruppo con un prodotto scalare, senza toccare le righe.
+    Sommati per giocatore/torneo coincidono con add_fantapoints sugli stessi dati.
+    """
+    weights = weights or RuleWeights()
+    if not weights.is_sign_preserving():
+        raise ValueError(
+            "RuleWeights not sign-preserving: 'nonneg' aggregates may hide negative rows, "
+            "rescore row-level results instead"
+        )
+    out = aggs[GROUP_KEYS + ["bucket", "row_id", "n_rows"]].copy()
+    raw = aggs[component_columns()].to_numpy(dtype=float) @ weight_vector(weights)
+    out["RawPoints"] = raw
+
+    bonus_dict, malus_dict = build_multiplier_dicts(multipliers_df)
+    key = out["Giocatore"].astype(str).str.strip().str.lower()
+    bmul = key.map(bonus_dict).fillna(1.0).astype(float).to_numpy()
+    mmul = key.map(malus_dict).fillna(1.0).astype(float).to_numpy()
+    out["BonusMultiplier"] = bmul
+    out["MalusMultiplier"] = mmul
+    out["Fantapoints"] = np.maximum(raw, 0.0) * bmul + np.minimum(raw, 0.0) * mmul
+    return out
+
+
+def score_many(aggs: pd.DataFrame, candidates: Sequence[RuleWeights]) -> np.ndarray:
+    """Matrice RawPoints (gruppi x candidati) in un solo prodotto matriciale."""
+    W = np.column_stack([weight_vector(w) for w in candidates]) if candidates else np.zeros((len(component_columns()), 0))
+    return aggs[component_columns()].to_numpy(dtype=float) @ W
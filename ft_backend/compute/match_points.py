@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from typing import Dict, Tuple
+import pandas as pd
+
+# Modello MVP dell'admin: vincitore = 10, sconfitto = 0
+WIN_POINTS = 10.0
+LOSS_POINTS = 0.0
+
+
+def map_results_to_ids(results: pd.DataFrame, md: pd.DataFrame) -> Tuple[pd.DataFrame, int, int]:
+    """
+    Input (colonne già normalizzate): results(date, winner, loser), md(id_player, player).
+    Ritorna (results con winner_id/loser_id e date ISO, n. winner non mappati, n. loser non mappati).
+    """
+    results = results.copy()
+    results["date"] = pd.to_datetime(results["date"], errors="coerce").dt.strftime("%Y-%m-%d")
+    results = results[results["date"].notna()].copy()
+
+    player_norm = md["player"].astype(str).str.strip().str.lower()
+    player_map: Dict[str, str] = dict(zip(player_norm, md["id_player"].astype(str)))
+
+    results["winner_norm"] = results["winner"].astype(str).str.strip().str.lower()
+    results["loser_norm"] = results["loser"].astype(str).str.strip().str.lower()
+    results["winner_id"] = results["winner_norm"].map(player_map)
+    results["loser_id"] = results["loser_norm"].map(player_map)
+
+    unmapped_w = int(results["winner_id"].isna().sum())
+    unmapped_l = int(results["loser_id"].isna().sum())
+    return results, unmapped_w, unmapped_l
+
+
+def player_points_from_results(results: pd.DataFrame) -> pd.DataFrame:
+    """results(date, winner_id, loser_id) -> player_points(date, id_player, points, cumulative_points)."""
+    winners = results[["date", "winner_id"]].copy()
+    winners["points"] = WIN_POINTS
+    winners = winners.rename(columns={"winner_id": "id_player"})
+
+    losers = results[["date", "loser_id"]].copy()
+    losers["points"] = LOSS_POINTS
+    losers = losers.rename(columns={"loser_id": "id_player"})
+
+    return accumulate_player_points(pd.concat([winners, losers], ignore_index=True))
+
+
+def accumulate_player_points(points: pd.DataFrame) -> pd.DataFrame:
+    """(date, id_player, points) anche ripetuti -> somma per (date, id_player) + cumulative_points."""
+    player_points = (
+        points
+        .groupby(["date", "id_player"], as_index=False)["points"]
+        .sum()
+        .sort_values(["date", "id_player"])
+    )
+    player_points["cumulative_points"] = (
+        player_points.groupby("id_player")["points"].cumsum()
+    )
+    return player_points
+
+
+def team_marts(player_points: pd.DataFrame, rosters: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """player_points + rosters(team_id, team_name, id_player) -> (team_points, standings)."""
+    roster_map = rosters[["team_id", "team_name", "id_player"]].drop_duplicates().copy()
+    team_points = player_points.merge(roster_map, on="id_player", how="left")
+    team_points = team_points.dropna(subset=["team_id"]).copy()
+
+    standings = (
+        team_points
+        .groupby(["date", "team_id", "team_name"], as_index=False)["points"]
+        .sum()
+        .rename(columns={"points": "day_points"})
+        .sort_values(["date", "team_id"])
+    )
+    standings["total_points"] = standings.groupby("team_id")["day_points"].cumsum()
+    standings = standings.sort_values(
+        ["date", "total_points", "team_name"],
+        ascending=[True, False, True]
+    ).copy()
+    standings["rank"] = (
+        standings.groupby("date")["total_points"]
+        .rank(method="dense", ascending=False)
+        .astype(int)
+    )
+    standings = standings[["date", "team_id", "team_name", "rank", "total_points"]]
+
+    team_points_out = (
+        team_points.groupby(["date", "team_id", "team_name"], as_index=False)["points"]
+        .sum()
+    )
+    return team_points_out, standings
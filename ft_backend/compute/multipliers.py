@@ -1,32 +1,220 @@
-
 from __future__ import annotations
 
-from typing import Dict, Tuple
+import io
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
 import pandas as pd
 
+from ..io.multipliers import canonical_columns, load_multipliers
+from ..utils.fs import atomic_write_bytes
+
+STORE_COLUMNS = ["id_player", "effective_from", "effective_to", "ranking", "bonus_mult", "malus_mult"]
+
 
 def build_multiplier_dicts(multipliers_df: pd.DataFrame) -> Tuple[Dict[str, float], Dict[str, float]]:
     """
-    Input atteso: colonne (case-insensitive):
+    Input atteso: colonne (case-insensitive, con alias: vedi io.multipliers.COLUMN_ALIASES):
       - ranking
-      - player
+      - player / Giocatore
       - moltiplicatore bonus
       - moltiplicatore malus
     Output:
       - bonus_mult_dict[player_lower] -> float
       - malus_mult_dict[player_lower] -> float
+    Righe non valide vengono scartate e segnalate dal loader; colonne mancanti -> ValueError.
     """
     if multipliers_df is None or multipliers_df.empty:
         return {}, {}
+    table, _ = load_multipliers(multipliers_df)
+    return table.to_dicts()
 
-    df = multipliers_df.copy()
-    df.columns = [c.strip().lower().replace("\ufeff", "") for c in df.columns]
 
-    required = {"ranking", "player", "moltiplicatore bonus", "moltiplicatore malus"}
-    if not required.issubset(set(df.columns)):
-        return {}, {}
+@dataclass
+class MultiplierStore:
+    """
+    Moltiplicatori per id_player con validità temporale [effective_from, effective_to).
+
+    Ogni aggiornamento del ranking (add_version) chiude l'intervallo aperto dei
+    giocatori i cui valori cambiano o che non sono più nel file, e aggiunge le nuove
+    righe: lo storico non viene riscritto, quindi i punteggi delle settimane passate
+    restano validi.
+    lookup() risolve (id_player, data) con un merge_asof vettorizzato.
+    """
+    table: pd.DataFrame = field(default_factory=lambda: pd.DataFrame(columns=STORE_COLUMNS))
+
+    # -------------------- costruzione --------------------
+    @staticmethod
+    def _version_frame(multipliers_df: pd.DataFrame) -> pd.DataFrame:
+        cols = canonical_columns(multipliers_df)
+        required = {"id_player", "moltiplicatore bonus", "moltiplicatore malus"}
+        missing = required - set(cols)
+        if missing:
+            raise ValueError(f"ranking multipliers must contain: {sorted(missing)}")
+        out = pd.DataFrame({
+            "id_player": multipliers_df[cols["id_player"]].astype(str).str.strip(),
+            "ranking": pd.to_numeric(multipliers_df[cols["ranking"]], errors="coerce") if "ranking" in cols else np.nan,
+            "bonus_mult": pd.to_numeric(multipliers_df[cols["moltiplicatore bonus"]], errors="coerce"),
+            "malus_mult": pd.to_numeric(multipliers_df[cols["moltiplicatore malus"]], errors="coerce"),
+        })
+        out = out[(out["id_player"] != "") & (out["id_player"].str.lower() != "nan")]
+        return out.drop_duplicates(subset=["id_player"], keep="last").reset_index(drop=True)
+
+    def add_version(self, multipliers_df: pd.DataFrame, effective_from) -> int:
+        """
+        Registra un nuovo file ranking_multipliers valido da `effective_from`.
+        Ritorna quante righe sono cambiate: aggiunte (giocatori nuovi o con valori cambiati)
+        più intervalli chiusi di giocatori assenti dal nuovo file (da `effective_from` in poi
+        non hanno versione, come chi non è mai stato nel file).
+        """
+        start = pd.Timestamp(effective_from).normalize()
+        new = self._version_frame(multipliers_df)
+        table = self.table
+
+        open_rows = table[table["effective_to"].isna()] if not table.empty else table
+        if not open_rows.empty and (open_rows["effective_from"] > start).any():
+            raise ValueError(f"effective_from {start.date()} is earlier than the current open version")
+
+        cur = open_rows.set_index("id_player")[["ranking", "bonus_mult", "malus_mult"]] if not open_rows.empty else None
+        if cur is not None:
+            prev = cur.reindex(new["id_player"])
+            same = (
+                prev["bonus_mult"].to_numpy() == new["bonus_mult"].to_numpy()
+            ) & (
+                prev["malus_mult"].to_numpy() == new["malus_mult"].to_numpy()
+            ) & (
+                (prev["ranking"].to_numpy() == new["ranking"].to_numpy())
+                | (prev["ranking"].isna().to_numpy() & new["ranking"].isna().to_numpy())
+            )
+            changed = new[~same]
+            is_open = table["effective_to"].isna()
+            dropped = is_open & ~table["id_player"].isin(new["id_player"])
+            to_close = (is_open & table["id_player"].isin(changed["id_player"])) | dropped
+            table = table.copy()
+            table.loc[to_close, "effective_to"] = start
+            n_dropped = int(dropped.sum())
+        else:
+            changed, n_dropped = new, 0
+
+        if changed.empty:
+            self.table = table
+            return n_dropped
+        add = changed.assign(effective_from=start, effective_to=pd.NaT)[STORE_COLUMNS]
+        parts = [t for t in (table, add) if not t.empty]
+        self.table = (
+            pd.concat(parts, ignore_index=True)
+            .sort_values(["id_player", "effective_from"])
+            .reset_index(drop=True)
+        )
+        return int(len(add)) + n_dropped
+
+    # -------------------- persistenza --------------------
+    def to_bytes(self) -> bytes:
+        out = self.table.copy()
+        for c in ("effective_from", "effective_to"):
+            out[c] = pd.to_datetime(out[c]).dt.strftime("%Y-%m-%d")
+        return out.to_csv(index=False).encode("utf-8")
 
-    df["key"] = df["player"].astype(str).str.strip().str.lower()
-    bonus_dict = dict(zip(df["key"], df["moltiplicatore bonus"].astype(float)))
-    malus_dict = dict(zip(df["key"], df["moltiplicatore malus"].astype(float)))
-    return bonus_dict, malus_dict
+    @classmethod
+    def parse(cls, content: Optional[bytes]) -> "MultiplierStore":
+        """Da bytes del CSV (None = storico vuoto): usato con gli store dell'app."""
+        if not content:
+            return cls()
+        df = pd.read_csv(io.BytesIO(content), encoding="utf-8", dtype={"id_player": str})
+        for c in ("effective_from", "effective_to"):
+            df[c] = pd.to_datetime(df[c], errors="coerce")
+        return cls(df[STORE_COLUMNS].sort_values(["id_player", "effective_from"]).reset_index(drop=True))
+
+    def save(self, path: Union[str, Path]) -> None:
+        atomic_write_bytes(path, self.to_bytes())
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "MultiplierStore":
+        if not Path(path).exists():
+            return cls()
+        return cls.parse(Path(path).read_bytes())
+
+    def version(self) -> str:
+        """Impronta dello storico (per le cache che dipendono dai moltiplicatori)."""
+        if self.table.empty:
+            return "empty"
+        return str(pd.util.hash_pandas_object(self.table.astype(str), index=False).sum())
+
+    # -------------------- lookup --------------------
+    def lookup(
+        self, id_player: pd.Series, dates: Optional[pd.Series] = None, default: float = 1.0
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (bonus_mult, malus_mult) per riga, validi alla data della riga. Date mancanti
+        usano la versione corrente; id senza moltiplicatore valido -> `default`.
+        """
+        n = len(id_player)
+        bonus = np.full(n, default, dtype=float)
+        malus = np.full(n, default, dtype=float)
+        if n == 0 or self.table.empty:
+            return bonus, malus
+
+        when = pd.to_datetime(dates, errors="coerce") if dates is not None else pd.Series(pd.NaT, index=id_player.index)
+        left = pd.DataFrame({
+            "_pos": np.arange(n),
+            "id_player": id_player.astype(str).str.strip().to_numpy(),
+            "_date": pd.Series(when).fillna(pd.Timestamp.max.normalize()).to_numpy(dtype="datetime64[ns]"),
+        }).sort_values("_date")
+        right = self.table.dropna(subset=["effective_from"]).sort_values("effective_from")
+        right = right.assign(effective_from=right["effective_from"].astype("datetime64[ns]"))
+
+        hit = pd.merge_asof(left, right, left_on="_date", right_on="effective_from", by="id_player", direction="backward")
+        valid = hit["effective_from"].notna() & (hit["effective_to"].isna() | (hit["_date"] < hit["effective_to"]))
+        pos = hit.loc[valid, "_pos"].to_numpy()
+        bonus[pos] = hit.loc[valid, "bonus_mult"].fillna(1.0).to_numpy(dtype=float)
+        malus[pos] = hit.loc[valid, "malus_mult"].fillna(1.0).to_numpy(dtype=float)
+        return bonus, malus
+
+    def apply(self, raw_points: np.ndarray, id_player: pd.Series, dates: Optional[pd.Series] = None) -> pd.DataFrame:
+        """Fantapoints vettorizzati: parte positiva * bonus, negativa * malus (come compute_points_with_multipliers)."""
+        raw = np.asarray(raw_points, dtype=float)
+        bonus, malus = self.lookup(id_player, dates)
+        return pd.DataFrame({
+            "RawPoints": raw,
+            "BonusPoints": np.maximum(raw, 0.0),
+            "MalusPoints": np.minimum(raw, 0.0),
+            "BonusMultiplier": bonus,
+            "MalusMultiplier": malus,
+            "Fantapoints": np.maximum(raw, 0.0) * bonus + np.minimum(raw, 0.0) * malus,
+        }, index=id_player.index)
+
+
+def apply_history(
+    history: Optional[MultiplierStore],
+    ids: pd.Series,
+    dates: Optional[pd.Series],
+    bonus: np.ndarray,
+    malus: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Per le righe con data del match e una versione valida nello storico sostituisce i
+    moltiplicatori correnti (bonus/malus per riga) con quelli di quella data.
+    Ritorna (bonus, malus, righe risolte dallo storico).
+    """
+    pinned = np.zeros(len(bonus), dtype=bool)
+    if history is None or history.table.empty or dates is None:
+        return bonus, malus, pinned
+    when = pd.to_datetime(pd.Series(np.asarray(dates, dtype=object), index=ids.index), errors="coerce")
+    hb, hm = history.lookup(ids, when, default=np.nan)
+    pinned = when.notna().to_numpy() & ~np.isnan(hb)
+    return np.where(pinned, hb, bonus), np.where(pinned, hm, malus), pinned
+
+
+def row_ids(results: pd.DataFrame, names: pd.Series, multipliers_df: Optional[pd.DataFrame]) -> pd.Series:
+    """id_player per riga: colonna id_player dei risultati, altrimenti dal nome via ranking_multipliers."""
+    if "id_player" in results.columns:
+        return results["id_player"].fillna("").astype(str).str.strip()
+    if multipliers_df is None or multipliers_df.empty:
+        return pd.Series("", index=names.index, dtype=object)
+    try:
+        table, _ = load_multipliers(multipliers_df)
+    except ValueError:  # file non valido: nessuna riga risolta dallo storico
+        return pd.Series("", index=names.index, dtype=object)
+    return table.ids_for_names(names)
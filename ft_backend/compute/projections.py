@@ -0,0 +1,300 @@
+"""
+Proiezione fantapunti per giocatore e tipo torneo (Slam / 1000).
+
+Modello: media dei Fantapoints per torneo giocato, ristretta (shrinkage) verso un
+prior che dipende dal ranking:
+
+    prior(t, r)  = a_t + b_t * log(r)                      (minimi quadrati pesati sui giocatori con storico)
+    proj(p, t)   = (n * media(p, t) + k * prior(t, r_p)) / (n + k)
+
+con n = tornei giocati di quel tipo e k = forza del prior (in "tornei equivalenti").
+Un giocatore senza storico prende il prior del suo ranking; senza ranking la media del tipo.
+
+Il fit lavora su player_tournament_points (una riga per giocatore/torneo): ProjectionStore
+tiene questa tabella su disco, la aggiorna solo per i tornei nuovi o modificati
+(sync_results: punteggia solo quelli) e rifà il fit (economico) solo quando la versione cambia.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+import threading
+from typing import Any, Callable, Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from ..io.multipliers import canonical_columns
+from ..utils.fs import atomic_write_bytes, atomic_write_json
+
+TOURNAMENT_KEYS = ["Season", "Tournament", "Tournament Type"]
+PROJECTION_TYPES = ["Slam", "1000"]
+# Tornei per stagione per tipo, per la proiezione stagionale
+TOURNAMENTS_PER_SEASON = {"Slam": 4, "1000": 9}
+MODEL_VERSION = "proj-v1"
+
+
+@dataclass(frozen=True)
+class ProjectionParams:
+    prior_strength: float = 3.0
+    tournaments_per_season: Dict[str, int] = field(default_factory=lambda: dict(TOURNAMENTS_PER_SEASON))
+
+    def key(self) -> str:
+        return json.dumps({"k": self.prior_strength, "tps": self.tournaments_per_season}, sort_keys=True)
+
+
+def player_tournament_points(df_with_points: pd.DataFrame) -> pd.DataFrame:
+    """Righe con Fantapoints -> una riga per (Season, Tournament, Tournament Type, Giocatore)."""
+    cols = TOURNAMENT_KEYS + ["Giocatore", "Fantapoints"]
+    if df_with_points is None or df_with_points.empty:
+        return pd.DataFrame(columns=cols)
+    df = pd.DataFrame({k: (df_with_points[k] if k in df_with_points.columns else "") for k in TOURNAMENT_KEYS})
+    df["Tournament Type"] = df["Tournament Type"].astype(str).str.strip().str.title()
+    df["Giocatore"] = df_with_points["Giocatore"].astype(str).str.strip()
+    df["Fantapoints"] = pd.to_numeric(df_with_points["Fantapoints"], errors="coerce").fillna(0.0)
+    return df.groupby(TOURNAMENT_KEYS + ["Giocatore"], as_index=False, dropna=False)["Fantapoints"].sum()[cols]
+
+
+def ranking_lookup(multipliers_df: Optional[pd.DataFrame]) -> pd.Series:
+    """Giocatore (lower) -> ranking, da ranking_multipliers (colonna player o Giocatore)."""
+    if multipliers_df is None or multipliers_df.empty:
+        return pd.Series(dtype=float)
+    cols = canonical_columns(multipliers_df)
+    name_col = cols.get("player")
+    if not name_col or "ranking" not in cols:
+        return pd.Series(dtype=float)
+    rk = pd.to_numeric(multipliers_df[cols["ranking"]], errors="coerce")
+    names = multipliers_df[name_col].astype(str).str.strip().str.lower()
+    return pd.Series(rk.to_numpy(), index=names.to_numpy()).dropna().groupby(level=0).min()
+
+
+def _fit_prior(mean: np.ndarray, n: np.ndarray, log_rank: np.ndarray) -> tuple:
+    """(a, b) di mean ~ a + b*log(rank), pesato per n; b=0 se i dati non bastano."""
+    ok = np.isfinite(log_rank) & (n > 0)
+    if ok.sum() >= 3 and np.ptp(log_rank[ok]) > 0:
+        w = n[ok]
+        X = np.column_stack([np.ones(ok.sum()), log_rank[ok]])
+        sw = np.sqrt(w)
+        coef, *_ = np.linalg.lstsq(X * sw[:, None], mean[ok] * sw, rcond=None)
+        return float(coef[0]), float(coef[1])
+    if (n > 0).any():
+        return float(np.average(mean[n > 0], weights=n[n > 0])), 0.0
+    return 0.0, 0.0
+
+
+def fit_projections(
+    pt_points: pd.DataFrame,
+    multipliers_df: Optional[pd.DataFrame] = None,
+    players: Optional[pd.Series] = None,
+    params: ProjectionParams = ProjectionParams(),
+) -> pd.DataFrame:
+    """
+    pt_points = player_tournament_points(...). `players` aggiunge giocatori senza storico
+    (es. tutto players.csv) che ricevono solo il prior.
+    Ritorna una riga per (Giocatore, Tournament Type) con n_tournaments, mean_points,
+    prior_points, projected_points.
+    """
+    stats = (
+        pt_points[pt_points["Tournament Type"].isin(PROJECTION_TYPES)]
+        .groupby(["Giocatore", "Tournament Type"])["Fantapoints"]
+        .agg(n_tournaments="count", sum_points="sum")
+    )
+    names = set(pt_points["Giocatore"].astype(str))
+    if players is not None:
+        names |= set(players.dropna().astype(str).str.strip())
+    ranks = ranking_lookup(multipliers_df)
+
+    grid = pd.MultiIndex.from_product([sorted(names), PROJECTION_TYPES], names=["Giocatore", "Tournament Type"])
+    out = stats.reindex(grid, fill_value=0).reset_index()
+    out["n_tournaments"] = out["n_tournaments"].astype(int)
+    out["ranking"] = out["Giocatore"].str.lower().map(ranks)
+    out["mean_points"] = np.where(out["n_tournaments"] > 0, out["sum_points"] / out["n_tournaments"].clip(lower=1), np.nan)
+
+    k = float(params.prior_strength)
+    out["prior_points"] = 0.0
+    for t in PROJECTION_TYPES:
+        m = (out["Tournament Type"] == t).to_numpy()
+        n = out.loc[m, "n_tournaments"].to_numpy(dtype=float)
+        mean = out.loc[m, "mean_points"].fillna(0.0).to_numpy()
+        log_rank = np.log(out.loc[m, "ranking"].to_numpy(dtype=float))
+        a, b = _fit_prior(mean, n, log_rank)
+        type_mean = float(np.average(mean[n > 0], weights=n[n > 0])) if (n > 0).any() else a
+        prior = np.where(np.isfinite(log_rank), a + b * np.nan_to_num(log_rank), type_mean)
+        out.loc[m, "prior_points"] = prior
+
+    n = out["n_tournaments"].to_numpy(dtype=float)
+    if k > 0:
+        out["projected_points"] = (out["sum_points"].to_numpy(dtype=float) + k * out["prior_points"].to_numpy()) / (n + k)
+    else:
+        out["projected_points"] = np.where(n > 0, out["mean_points"].fillna(0.0), out["prior_points"])
+    for c in ("mean_points", "prior_points", "projected_points"):
+        out[c] = out[c].round(3)
+    return out[["Giocatore", "Tournament Type", "ranking", "n_tournaments", "mean_points", "prior_points", "projected_points"]]
+
+
+def season_projection(projections: pd.DataFrame, params: ProjectionParams = ProjectionParams()) -> pd.DataFrame:
+    """Proiezione stagionale per giocatore (colonna Proiezione, come usata dall'ottimizzatore rosa)."""
+    p = projections.copy()
+    p["season_points"] = p["projected_points"] * p["Tournament Type"].map(params.tournaments_per_season).fillna(0)
+    wide = p.pivot_table(index="Giocatore", columns="Tournament Type", values="projected_points", aggfunc="sum")
+    wide.columns = [f"Proiezione {c}" for c in wide.columns]
+    out = wide.join(p.groupby("Giocatore")["season_points"].sum().rename("Proiezione")).reset_index()
+    return out.sort_values("Proiezione", ascending=False).reset_index(drop=True)
+
+
+def _tournament_keys(df: pd.DataFrame) -> pd.Series:
+    """"Season|Tournament|Tipo" per riga (tipo normalizzato come in player_tournament_points)."""
+    if df.empty:
+        return pd.Series([], index=df.index, dtype=object)
+    keys = pd.DataFrame({k: (df[k] if k in df.columns else "") for k in TOURNAMENT_KEYS}, index=df.index).astype(str)
+    keys["Tournament Type"] = keys["Tournament Type"].str.strip().str.title()
+    return keys.agg("|".join, axis=1)
+
+
+def tournament_digests(results_norm: pd.DataFrame) -> Dict[str, str]:
+    """"Season|Tournament|Tipo" -> hash delle righe del torneo (indipendente dall'ordine)."""
+    if results_norm is None or results_norm.empty:
+        return {}
+    key = _tournament_keys(results_norm).to_numpy()
+    canon = results_norm[sorted(map(str, results_norm.columns))].astype(str)
+    h = pd.util.hash_pandas_object(canon, index=False).to_numpy()
+    return {
+        k: hashlib.sha256(np.sort(h[idx]).tobytes()).hexdigest()[:16]
+        for k, idx in pd.Series(key).groupby(key).indices.items()
+    }
+
+
+def _frame_digest(df: pd.DataFrame) -> str:
+    if df is None or df.empty:
+        return "empty"
+    h = pd.util.hash_pandas_object(df.reset_index(drop=True), index=False).to_numpy()
+    return hashlib.sha256(np.sort(h).tobytes()).hexdigest()[:16]
+
+
+class ProjectionStore:
+    """
+    Cache su disco (di default data/processed/marts):
+      - player_tournament_points.csv : input del fit, aggiornato per torneo (upsert)
+      - player_projections.csv       : mart versionato
+      - player_projections.json      : {version, model, ...}
+
+    version = hash(input, ranking, parametri, modello): se non cambia, projections()
+    legge il CSV senza rifare il fit.
+    """
+
+    def __init__(self, marts_dir: Union[str, Path], params: ProjectionParams = ProjectionParams()):
+        self.dir = Path(marts_dir)
+        self.params = params
+        self.points_path = self.dir / "player_tournament_points.csv"
+        self.mart_path = self.dir / "player_projections.csv"
+        self.meta_path = self.dir / "player_projections.json"
+        self.sync_path = self.dir / "player_tournament_points.json"
+        # un'istanza è condivisa tra le sessioni dell'app: sync e fit uno alla volta
+        self._lock = threading.RLock()
+
+    def _read(self, path: Path) -> Optional[pd.DataFrame]:
+        if not path.exists():
+            return None
+        return pd.read_csv(path, encoding="utf-8")
+
+    def meta(self) -> Dict[str, Any]:
+        if not self.meta_path.exists():
+            return {}
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def points(self) -> pd.DataFrame:
+        df = self._read(self.points_path)
+        if df is None:
+            return pd.DataFrame(columns=TOURNAMENT_KEYS + ["Giocatore", "Fantapoints"])
+        df["Season"] = df["Season"].astype(str)
+        return df
+
+    def append_results(self, df_with_points: pd.DataFrame) -> int:
+        """
+        Aggiunge righe punteggiate (nuovo torneo o torneo ricaricato): i tornei presenti
+        nel batch sostituiscono quelli già salvati, gli altri restano invariati.
+        Ritorna il numero di tornei toccati.
+        """
+        new = player_tournament_points(df_with_points)
+        if new.empty:
+            return 0
+        new["Season"] = new["Season"].astype(str)
+        old = self.points()
+        touched = new[TOURNAMENT_KEYS].drop_duplicates()
+        if not old.empty:
+            key_old = old[TOURNAMENT_KEYS].astype(str).agg("|".join, axis=1)
+            key_new = set(touched.astype(str).agg("|".join, axis=1))
+            old = old[~key_old.isin(key_new)]
+        merged = pd.concat([old, new], ignore_index=True) if not old.empty else new
+        atomic_write_bytes(self.points_path, merged.to_csv(index=False).encode("utf-8"))
+        return int(len(touched))
+
+    def sync_results(
+        self,
+        results_norm: pd.DataFrame,
+        score: Callable[[pd.DataFrame], pd.DataFrame],
+        scoring_key: str = "",
+    ) -> Dict[str, int]:
+        """
+        Allinea player_tournament_points ai risultati: `score` (righe -> righe con
+        Fantapoints) gira solo sui tornei nuovi o con righe cambiate, i tornei spariti
+        vengono tolti. Un `scoring_key` diverso dall'ultimo (es. versione moltiplicatori)
+        ripunteggia tutto. Ritorna {"scored": tornei ricalcolati, "removed": tornei tolti}.
+        """
+        with self._lock:
+            state = {}
+            if self.sync_path.exists():
+                with open(self.sync_path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+            known = state.get("tournaments", {}) if state.get("scoring_key") == scoring_key else {}
+            digests = tournament_digests(results_norm)
+            changed = {k for k, d in digests.items() if known.get(k) != d}
+            old = self.points()
+            old_keys = _tournament_keys(old)
+            gone = set(old_keys) - set(digests)
+
+            if gone:
+                atomic_write_bytes(self.points_path, old[~old_keys.isin(gone)].to_csv(index=False).encode("utf-8"))
+            if changed:
+                self.append_results(score(results_norm[_tournament_keys(results_norm).isin(changed).to_numpy()]))
+            if changed or gone or not self.sync_path.exists():
+                atomic_write_json(self.sync_path, {"scoring_key": scoring_key, "tournaments": digests})
+            return {"scored": len(changed), "removed": len(gone)}
+
+    def version(self, multipliers_df: Optional[pd.DataFrame] = None, players: Optional[pd.Series] = None) -> str:
+        ranks = ranking_lookup(multipliers_df)
+        parts = [
+            MODEL_VERSION,
+            self.params.key(),
+            _frame_digest(self.points()),
+            _frame_digest(ranks.rename("ranking").reset_index()),
+            _frame_digest(pd.DataFrame({"p": sorted(set(players.dropna().astype(str)))})) if players is not None else "-",
+        ]
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+    def projections(
+        self,
+        multipliers_df: Optional[pd.DataFrame] = None,
+        players: Optional[pd.Series] = None,
+        force: bool = False,
+    ) -> pd.DataFrame:
+        with self._lock:
+            version = self.version(multipliers_df, players)
+            if not force and self.meta().get("version") == version:
+                cached = self._read(self.mart_path)
+                if cached is not None:
+                    return cached
+
+            proj = fit_projections(self.points(), multipliers_df, players, self.params)
+            atomic_write_bytes(self.mart_path, proj.to_csv(index=False).encode("utf-8"))
+            atomic_write_json(self.meta_path, {
+                "version": version,
+                "model": MODEL_VERSION,
+                "prior_strength": self.params.prior_strength,
+                "players": int(proj["Giocatore"].nunique()),
+                "tournaments": int(len(self.points()[TOURNAMENT_KEYS].drop_duplicates())),
+            })
+            return proj
@@ -0,0 +1,191 @@
+"""
+What-if sulle regole: valuta molti vettori pesi (BONUS_FLAGS/MALUS_FLAGS/ROUND_BONUS...)
+in un solo prodotto matriciale sugli aggregati di flag_stats e restituisce la
+classifica squadre per ciascun candidato, con diagnostica sui cambi di rank
+rispetto alle regole attuali.
+
+Uso (sugli aggregati scritti dalla compute admin, data/processed/marts/player_tournament_stats.csv):
+    python -m ft_backend.compute.rule_tuner --teams data/teams.json \\
+        --multipliers data/ranking_multipliers.csv --candidates candidates.json --out tuner.json
+--results <csv> ricalcola gli aggregati dalle righe (formato classico) invece di leggerli.
+
+candidates.json: lista di {"name": ..., "bonus_flags": {...}, "malus_flags": {...},
+"round_bonus": {"Slam": {...}}, "ace_point": ..., "df_point": ...} (chiavi parziali,
+il resto resta ai valori attuali), oppure {"grid": {"bonus_flags.beat_num1": [6, 8, 10], ...}}.
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..io.multipliers import load_multipliers
+from .build_marts import STARTERS_BY_TYPE
+from ..config import RepoPaths
+from .flag_stats import RuleWeights, build_flag_aggregates, read_flag_aggregates, score_many
+from .multipliers import build_multiplier_dicts
+
+BASELINE = "baseline"
+
+
+def candidate_grid(grid: Dict[str, Sequence[float]], base: Optional[RuleWeights] = None) -> List[Tuple[str, RuleWeights]]:
+    """Prodotto cartesiano di valori: chiavi 'bonus_flags.beat_num1', 'round_bonus.Slam.Winner', 'ace_point'."""
+    base = base or RuleWeights()
+    keys = list(grid)
+    out = []
+    for values in itertools.product(*(grid[k] for k in keys)):
+        spec: Dict[str, Any] = {}
+        for k, v in zip(keys, values):
+            parts = k.split(".")
+            node = spec
+            for p in parts[:-1]:
+                node = node.setdefault(p, {})
+            node[parts[-1]] = v
+        name = ", ".join(f"{k}={v}" for k, v in zip(keys, values))
+        out.append((name, base.with_updates(**spec)))
+    return out
+
+
+def candidates_from_spec(spec: Any, base: Optional[RuleWeights] = None) -> List[Tuple[str, RuleWeights]]:
+    base = base or RuleWeights()
+    if isinstance(spec, dict) and "grid" in spec:
+        return candidate_grid(spec["grid"], base)
+    out = []
+    for i, c in enumerate(spec):
+        c = dict(c)
+        name = str(c.pop("name", f"candidate_{i + 1}"))
+        out.append((name, base.with_updates(**c)))
+    return out
+
+
+def _starter_pairs(aggs: pd.DataFrame, teams: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """(indice squadra, indice gruppo) per ogni gruppo che conta come titolare per quella squadra."""
+    team_names = [t.get("name", "") for t in teams]
+    players = aggs["Giocatore"].astype(str).to_numpy()
+    t_types = aggs["Tournament Type"].astype(str).to_numpy()
+    by_player: Dict[str, List[int]] = {}
+    for g, p in enumerate(players):
+        by_player.setdefault(p, []).append(g)
+
+    team_idx, group_idx = [], []
+    for ti, team in enumerate(teams):
+        for pos, p in enumerate(team.get("players", []) or []):
+            for g in by_player.get(p, []):
+                if pos < STARTERS_BY_TYPE.get(t_types[g], 0):
+                    team_idx.append(ti)
+                    group_idx.append(g)
+    return np.asarray(team_idx, dtype=int), np.asarray(group_idx, dtype=int), team_names
+
+
+def tune_rules(
+    results_norm: Optional[pd.DataFrame],
+    teams: List[Dict[str, Any]],
+    candidates: List[Tuple[str, RuleWeights]],
+    multipliers_df: Optional[pd.DataFrame] = None,
+    aggs: Optional[pd.DataFrame] = None,
+) -> Dict[str, Any]:
+    """
+    Ritorna:
+      - totals: DataFrame squadre x candidati (punti titolari, prima colonna = baseline)
+      - ranks: idem con il rank (1 = primo, method='min')
+      - diagnostics: DataFrame per candidato (squadre che cambiano rank, max spostamento,
+        Spearman vs baseline, leader)
+    """
+    candidates = [(BASELINE, RuleWeights())] + list(candidates)
+    for name, w in candidates:
+        if not w.is_sign_preserving():
+            raise ValueError(f"Candidate '{name}' is not sign-preserving (negative bonus/round weights)")
+
+    aggs = build_flag_aggregates(results_norm) if aggs is None else aggs
+    raw = score_many(aggs, [w for _, w in candidates])          # gruppi x candidati
+
+    bonus_dict, malus_dict = build_multiplier_dicts(multipliers_df)
+    key = aggs["Giocatore"].astype(str).str.strip().str.lower()
+    bmul = key.map(bonus_dict).fillna(1.0).astype(float).to_numpy()[:, None]
+    mmul = key.map(malus_dict).fillna(1.0).astype(float).to_numpy()[:, None]
+    fanta = np.maximum(raw, 0.0) * bmul + np.minimum(raw, 0.0) * mmul
+
+    team_idx, group_idx, team_names = _starter_pairs(aggs, teams)
+    names = [n for n, _ in candidates]
+    totals = (
+        pd.DataFrame(fanta[group_idx], columns=names)
+        .groupby(team_idx).sum()
+        .reindex(range(len(team_names)), fill_value=0.0)
+    )
+    totals.index = team_names
+    ranks = totals.rank(ascending=False, method="min").astype(int)
+
+    base_rank = ranks[BASELINE]
+    diag = []
+    for n in names[1:]:
+        delta = ranks[n] - base_rank
+        diag.append({
+            "candidate": n,
+            "teams_changed": int((delta != 0).sum()),
+            "max_rank_shift": int(delta.abs().max()) if len(delta) else 0,
+            # Spearman = Pearson sui rank (evita la dipendenza da scipy)
+            "spearman_vs_baseline": float(base_rank.rank().corr(ranks[n].rank())) if len(delta) > 1 else 1.0,
+            "leader": str(totals[n].idxmax()) if len(totals) else "",
+            "leader_changed": bool(len(totals) and totals[n].idxmax() != totals[BASELINE].idxmax()),
+        })
+    return {"totals": totals, "ranks": ranks, "diagnostics": pd.DataFrame(diag)}
+
+
+def standings_for(result: Dict[str, Any], candidate: str) -> pd.DataFrame:
+    """Classifica di un candidato nello stesso formato di team_standings_season."""
+    totals = result["totals"][candidate]
+    return (
+        pd.DataFrame({
+            "Team": totals.index,
+            "Totale punti stagione (solo titolari)": totals.to_numpy().astype(int),
+            "Rank": result["ranks"][candidate].to_numpy(),
+            "Rank baseline": result["ranks"][BASELINE].to_numpy(),
+        })
+        .sort_values("Totale punti stagione (solo titolari)", ascending=False)
+        .reset_index(drop=True)
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Score many candidate rule sets in one pass")
+    ap.add_argument("--stats", default=f"{RepoPaths().processed_marts_dir}/player_tournament_stats.csv",
+                    help="per-player flag aggregates written by the compute")
+    ap.add_argument("--results", default=None, help="season results CSV (classic format): rebuild the aggregates from rows")
+    ap.add_argument("--teams", required=True, help="teams.json")
+    ap.add_argument("--candidates", required=True, help="candidates JSON (list or {'grid': ...})")
+    ap.add_argument("--multipliers", default=None)
+    ap.add_argument("--out", default=None, help="write totals/ranks/diagnostics JSON here")
+    args = ap.parse_args(argv)
+
+    results, aggs = None, None
+    if args.results:
+        results = pd.read_csv(args.results, sep=None, engine="python")
+        results["Tournament Type"] = results["Tournament Type"].astype(str).str.strip().str.title()
+    elif Path(args.stats).exists():
+        aggs = read_flag_aggregates(args.stats)
+    else:
+        ap.error(f"{args.stats} not found: run the admin compute or pass --results")
+    with open(args.teams, "r", encoding="utf-8") as f:
+        teams = json.load(f)
+    with open(args.candidates, "r", encoding="utf-8") as f:
+        candidates = candidates_from_spec(json.load(f))
+    mult = load_multipliers(args.multipliers)[0].to_frame() if args.multipliers else None
+
+    res = tune_rules(results, teams, candidates, mult, aggs=aggs)
+    print(res["diagnostics"].to_string(index=False))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({
+                "totals": res["totals"].to_dict(),
+                "ranks": res["ranks"].to_dict(),
+                "diagnostics": res["diagnostics"].to_dict("records"),
+            }, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
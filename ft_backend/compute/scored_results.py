@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from .breakdown import ComponentStore
+from .build_marts import STARTERS_BY_TYPE
+from .flag_stats import RuleWeights
+from .multipliers import MultiplierStore, apply_history
+
+# oltre questo numero di giocatori cambiati sync_multipliers ricalcola tutto in blocco
+BULK_THRESHOLD = 50
+
+
+def results_fingerprint(results: pd.DataFrame) -> str:
+    """Hash del contenuto (righe + colonne) per capire se lo store va ricostruito."""
+    if results is None or results.empty:
+        return "empty"
+    h = pd.util.hash_pandas_object(results.astype(str), index=False).to_numpy()
+    cols = "|".join(map(str, results.columns)).encode("utf-8")
+    return hashlib.sha1(cols + h.tobytes()).hexdigest()
+
+
+class ScoredResults:
+    """
+    Risultati punteggiati che conservano, per riga, la parte positiva e negativa dei
+    punti prima dei moltiplicatori (BonusPoints / MalusPoints).
+
+    Un cambio di moltiplicatore di un giocatore tocca solo le sue righe:
+        Fantapoints[righe] = BonusPoints[righe] * bonus + MalusPoints[righe] * malus
+    e aggiorna per delta i totali giocatore e squadra (solo righe da titolare).
+    Il dettaglio punti (breakdown) non è materializzato: lo calcola su richiesta il
+    ComponentStore sottostante (vedi breakdown()).
+
+    Con `history` le righe datate (match_date) che trovano una versione nello storico
+    restano ai moltiplicatori di quella data: i cambi per nome toccano solo le altre.
+    """
+
+    def __init__(self, results_norm: pd.DataFrame, teams: Optional[List[Dict[str, Any]]] = None,
+                 weights: Optional[RuleWeights] = None, history: Optional[MultiplierStore] = None,
+                 ids: Optional[pd.Series] = None, date_col: str = "match_date"):
+        self.results = results_norm.reset_index(drop=True)
+        self.components = ComponentStore(self.results, weights or RuleWeights())
+        raw = self.components.raw
+        self._raw = raw
+        self._pos = np.maximum(raw, 0.0)
+        self._neg = np.minimum(raw, 0.0)
+        # stessi array del ComponentStore: i breakdown vedono i moltiplicatori correnti
+        self._bm = self.components.bonus_mult
+        self._mm = self.components.malus_mult
+
+        self._name = self.components.names
+        self._key = self._name.str.lower()
+        self._rows: Dict[str, np.ndarray] = self.components._rows
+
+        n = len(raw)
+        self._pinned = np.zeros(n, dtype=bool)
+        if history is not None and ids is not None and date_col in self.results.columns:
+            ids = pd.Series(np.asarray(ids, dtype=object), index=self.results.index)
+            pin_b, pin_m, self._pinned = apply_history(history, ids, self.results[date_col], np.ones(n), np.ones(n))
+            self._bm[:] = pin_b
+            self._mm[:] = pin_m
+        self._pin_b = self._bm.copy()
+        self._pin_m = self._mm.copy()
+        # righe che seguono i moltiplicatori correnti (per nome)
+        self._free_rows = {k: r[~self._pinned[r]] for k, r in self._rows.items()}
+        self._fp = self._pos * self._bm + self._neg * self._mm
+        self.bonus_mult: Dict[str, float] = {}
+        self.malus_mult: Dict[str, float] = {}
+
+        self.teams = teams or []
+        self._starter_rows = self._build_starter_rows()
+        self._recompute_totals()
+
+    def _recompute_totals(self) -> None:
+        self.player_totals = pd.Series(self._fp).groupby(self._name.to_numpy()).sum()
+        self.team_totals = pd.Series(
+            {name: float(sum(self._fp[rows].sum() for rows in per_player.values()))
+             for name, per_player in self._starter_rows.items()},
+            dtype=float,
+        )
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """Risultati con le colonne di add_fantapoints (materializzate su richiesta)."""
+        out = self.results.copy()
+        out["RawPoints"] = self._raw
+        out["BonusPoints"] = self._pos
+        out["MalusPoints"] = self._neg
+        out["BonusMultiplier"] = self._bm
+        out["MalusMultiplier"] = self._mm
+        out["Fantapoints"] = self._fp
+        return out
+
+    # -------------------- squadre --------------------
+    def _build_starter_rows(self) -> Dict[str, Dict[str, np.ndarray]]:
+        """team -> giocatore (lower) -> righe in cui è titolare (dipende dal tipo torneo)."""
+        res = self.results
+        t_type = res["Tournament Type"].astype(str).to_numpy() if "Tournament Type" in res.columns else np.array([""] * len(res))
+        out: Dict[str, Dict[str, np.ndarray]] = {}
+        for team in self.teams:
+            per_player: Dict[str, np.ndarray] = {}
+            for pos, p in enumerate(team.get("players", []) or []):
+                key = str(p).strip().lower()
+                rows = self._rows.get(key)
+                if rows is None:
+                    continue
+                limits = np.array([STARTERS_BY_TYPE.get(t, 0) for t in t_type[rows]])
+                starter = rows[pos < limits]
+                if len(starter):
+                    per_player[key] = starter
+            out[team.get("name", "")] = per_player
+        return out
+
+    # -------------------- moltiplicatori --------------------
+    def set_multiplier(self, player: str, bonus: float = 1.0, malus: float = 1.0) -> float:
+        """Riapplica i moltiplicatori alle sole righe del giocatore; ritorna il delta Fantapoints."""
+        key = str(player).strip().lower()
+        self.bonus_mult[key] = float(bonus)
+        self.malus_mult[key] = float(malus)
+        rows = self._free_rows.get(key)
+        if rows is None or not len(rows):
+            return 0.0
+
+        self.components.invalidate(key)
+        old = self._fp[rows].copy()
+        new = self._pos[rows] * bonus + self._neg[rows] * malus
+        self._fp[rows] = new
+        self._bm[rows] = bonus
+        self._mm[rows] = malus
+
+        row_delta = pd.Series(new - old, index=rows)
+        delta = float(row_delta.sum())
+        if delta:
+            name = self._name.iat[int(rows[0])]
+            self.player_totals[name] = self.player_totals.get(name, 0.0) + delta
+            for team, per_player in self._starter_rows.items():
+                starter = per_player.get(key)
+                if starter is not None:
+                    self.team_totals[team] += float(row_delta.reindex(starter, fill_value=0.0).sum())
+        return delta
+
+    def sync_multipliers(self, bonus_dict: Dict[str, float], malus_dict: Dict[str, float]) -> Set[str]:
+        """
+        Allinea lo store ai dict (chiave nome lower) ricalcolando solo i giocatori cambiati.
+        Se cambiano molti giocatori (es. primo caricamento) un unico passaggio vettorizzato
+        su tutte le righe costa meno dei delta.
+        """
+        changed: Set[str] = set()
+        for key in set(self._rows) | set(self.bonus_mult) | set(bonus_dict) | set(malus_dict):
+            b = float(bonus_dict.get(key, 1.0))
+            m = float(malus_dict.get(key, 1.0))
+            if self.bonus_mult.get(key, 1.0) != b or self.malus_mult.get(key, 1.0) != m:
+                changed.add(key)
+        if len(changed) > BULK_THRESHOLD:
+            self.bonus_mult = {k: float(v) for k, v in bonus_dict.items()}
+            self.malus_mult = {k: float(v) for k, v in malus_dict.items()}
+            self.components.set_multipliers(
+                np.where(self._pinned, self._pin_b, self._key.map(self.bonus_mult).fillna(1.0).to_numpy(dtype=float)),
+                np.where(self._pinned, self._pin_m, self._key.map(self.malus_mult).fillna(1.0).to_numpy(dtype=float)),
+            )
+            self._bm = self.components.bonus_mult
+            self._mm = self.components.malus_mult
+            self._fp = self._pos * self._bm + self._neg * self._mm
+            self._recompute_totals()
+        else:
+            for key in changed:
+                self.set_multiplier(key, bonus_dict.get(key, 1.0), malus_dict.get(key, 1.0))
+        return changed
+
+    # -------------------- viste --------------------
+    def breakdown(self, player: str) -> pd.DataFrame:
+        """Dettaglio punti per riga del giocatore (calcolato al primo accesso, poi in cache LRU)."""
+        return self.components.player_breakdown(player)
+
+    def player_standings(self) -> pd.DataFrame:
+        return (
+            self.player_totals.rename("Totale Fantapoints").rename_axis("Giocatore").reset_index()
+            .sort_values("Totale Fantapoints", ascending=False).reset_index(drop=True)
+        )
+
+    def team_standings(self) -> pd.DataFrame:
+        managers = {t.get("name", ""): t.get("manager", "") for t in self.teams}
+        rows = [{"Team": name, "Manager": managers.get(name, ""),
+                 "Totale punti stagione (solo titolari)": int(round(total, 6))}
+                for name, total in self.team_totals.items()]
+        if not rows:
+            return pd.DataFrame(columns=["Team", "Manager", "Totale punti stagione (solo titolari)"])
+        return pd.DataFrame(rows).sort_values("Totale punti stagione (solo titolari)", ascending=False).reset_index(drop=True)
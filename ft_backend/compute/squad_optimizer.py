@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+ROSTER_SIZE = 10
+NEG_INF = -np.inf
+
+
+@dataclass
+class SquadSolution:
+    players: List[str]                 # ordinati per valore decrescente (= priorità titolari)
+    total_value: float
+    total_cost: int
+    budget: int
+    by_club: Dict[str, int] = field(default_factory=dict)
+
+    def to_frame(self, pool: pd.DataFrame, name_col: str = "Giocatore") -> pd.DataFrame:
+        idx = pool.set_index(name_col)
+        return idx.loc[self.players].reset_index()
+
+
+def _integer_prices(prices: pd.Series) -> np.ndarray:
+    p = pd.to_numeric(prices, errors="coerce")
+    if p.isna().any():
+        raise ValueError("Prezzo mancante o non numerico per alcuni giocatori")
+    if (p < 0).any():
+        raise ValueError("Prezzo negativo per alcuni giocatori")
+    if not np.allclose(p, np.round(p)):
+        raise ValueError("Il solver esatto richiede prezzi interi (colonna Prezzo)")
+    return np.round(p.to_numpy()).astype(int)
+
+
+def _knapsack_table(values: np.ndarray, costs: np.ndarray, k_max: int, budget: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    dp[k, b] = valore massimo con esattamente k giocatori e costo esattamente b (-inf se impossibile).
+    take[i, k, b] = il giocatore i entra nell'ottimo di dp_i[k, b] (serve per ricostruire la rosa).
+    Un giocatore alla volta, aggiornamento vettorizzato su tutti i (k, b).
+    """
+    dp = np.full((k_max + 1, budget + 1), NEG_INF)
+    dp[0, 0] = 0.0
+    take = np.zeros((len(values), k_max + 1, budget + 1), dtype=bool)
+    for i, (v, c) in enumerate(zip(values, costs)):
+        if c > budget:
+            continue
+        cand = dp[:-1, : budget + 1 - c] + v
+        better = cand > dp[1:, c:]
+        if better.any():
+            dp[1:, c:] = np.where(better, cand, dp[1:, c:])
+            take[i, 1:, c:] = better
+    return dp, take
+
+
+def _backtrack(take: np.ndarray, costs: np.ndarray, k: int, b: int) -> List[int]:
+    picked = []
+    for i in range(take.shape[0] - 1, -1, -1):
+        if k == 0:
+            break
+        if take[i, k, b]:
+            picked.append(i)
+            k -= 1
+            b -= int(costs[i])
+    return picked
+
+
+def _pareto(row: np.ndarray) -> np.ndarray:
+    """Costi della riga dp utili nel merge: valore finito e strettamente migliore di ogni costo inferiore."""
+    finite = np.isfinite(row)
+    best_before = np.maximum.accumulate(np.where(finite, row, NEG_INF))
+    prev = np.concatenate([[NEG_INF], best_before[:-1]])
+    return np.flatnonzero(finite & (row > prev))
+
+
+def optimize_squad(
+    pool: pd.DataFrame,
+    budget: float,
+    value_col: str = "Proiezione",
+    size: int = ROSTER_SIZE,
+    max_per_club: Optional[int] = None,
+    locked: Iterable[str] = (),
+    excluded: Iterable[str] = (),
+    name_col: str = "Giocatore",
+    price_col: str = "Prezzo",
+    club_col: str = "Squadra",
+) -> Optional[SquadSolution]:
+    """
+    Rosa di `size` giocatori che massimizza la somma di `value_col` con costo <= budget.
+
+    Soluzione esatta con DP su (n. giocatori, costo) (prezzi interi); con max_per_club
+    il DP è per gruppi: per ogni club si calcola la tabella "j giocatori del club a costo c"
+    e si combinano le tabelle (knapsack a scelta multipla). `locked` sono giocatori già
+    in rosa (contano su budget, posti e limite club), `excluded` non vengono considerati.
+    Ritorna None se nessuna rosa rispetta i vincoli.
+    """
+    for c in (name_col, price_col, value_col):
+        if c not in pool.columns:
+            raise ValueError(f"Colonna mancante nel pool giocatori: {c}")
+    if max_per_club is not None and club_col not in pool.columns:
+        raise ValueError(f"Colonna mancante nel pool giocatori: {club_col}")
+
+    df = pool.copy()
+    df[name_col] = df[name_col].astype(str).str.strip()
+    df = df.drop_duplicates(subset=[name_col])
+    df["_cost"] = _integer_prices(df[price_col])
+    df["_value"] = pd.to_numeric(df[value_col], errors="coerce").fillna(0.0).astype(float)
+    df["_club"] = df[club_col].astype(str).str.strip().str.lower() if club_col in df.columns else ""
+
+    locked = [str(p).strip() for p in locked]
+    unknown = set(locked) - set(df[name_col])
+    if unknown:
+        raise ValueError(f"Giocatori bloccati non presenti nel pool: {sorted(unknown)}")
+    excluded_set = {str(p).strip() for p in excluded} - set(locked)
+
+    fixed = df[df[name_col].isin(locked)]
+    free = df[~df[name_col].isin(locked) & ~df[name_col].isin(excluded_set)].reset_index(drop=True)
+
+    budget_left = int(np.floor(budget)) - int(fixed["_cost"].sum())
+    k_left = size - len(fixed)
+    if budget_left < 0 or k_left < 0:
+        return None
+
+    fixed_clubs = fixed["_club"].value_counts().to_dict()
+    if max_per_club is not None and any(n > max_per_club for n in fixed_clubs.values()):
+        return None
+
+    costs = free["_cost"].to_numpy()
+    values = free["_value"].to_numpy()
+
+    if max_per_club is None:
+        dp, take = _knapsack_table(values, costs, k_left, budget_left)
+        row = dp[k_left]
+        if not np.isfinite(row).any():
+            return None
+        b = int(np.argmax(row))
+        picked = _backtrack(take, costs, k_left, b)
+    else:
+        picked = _solve_grouped(free, values, costs, k_left, budget_left, max_per_club, fixed_clubs)
+        if picked is None:
+            return None
+
+    chosen = pd.concat([fixed, free.iloc[picked]], ignore_index=True)
+    chosen = chosen.sort_values(["_value", "_cost"], ascending=[False, True])
+    by_club = chosen[club_col].astype(str).value_counts().to_dict() if club_col in chosen.columns else {}
+    return SquadSolution(
+        players=chosen[name_col].tolist(),
+        total_value=float(chosen["_value"].sum()),
+        total_cost=int(chosen["_cost"].sum()),
+        budget=int(np.floor(budget)),
+        by_club={str(k): int(v) for k, v in by_club.items()},
+    )
+
+
+def _solve_grouped(
+    free: pd.DataFrame,
+    values: np.ndarray,
+    costs: np.ndarray,
+    k_left: int,
+    budget_left: int,
+    max_per_club: int,
+    fixed_clubs: Dict[str, int],
+) -> Optional[List[int]]:
+    dp = np.full((k_left + 1, budget_left + 1), NEG_INF)
+    dp[0, 0] = 0.0
+    steps = []   # per club: (indici giocatori, take locale, j scelto[k,b], costo scelto[k,b])
+
+    for club, idx in free.groupby("_club", sort=False).indices.items():
+        cap = min(max_per_club - fixed_clubs.get(club, 0), k_left, len(idx))
+        if cap <= 0:
+            continue
+        club_dp, club_take = _knapsack_table(values[idx], costs[idx], cap, budget_left)
+
+        new = dp.copy()
+        pick_j = np.zeros(dp.shape, dtype=np.int16)
+        pick_c = np.zeros(dp.shape, dtype=np.int32)
+        for j in range(1, cap + 1):
+            for c in _pareto(club_dp[j]):
+                cand = dp[: k_left + 1 - j, : budget_left + 1 - c] + club_dp[j, c]
+                target = new[j:, c:]
+                better = cand > target
+                if better.any():
+                    new[j:, c:] = np.where(better, cand, target)
+                    pick_j[j:, c:][better] = j
+                    pick_c[j:, c:][better] = c
+        dp = new
+        steps.append((idx, club_take, pick_j, pick_c))
+
+    row = dp[k_left]
+    if not np.isfinite(row).any():
+        return None
+    k, b = k_left, int(np.argmax(row))
+    picked: List[int] = []
+    for idx, club_take, pick_j, pick_c in reversed(steps):
+        j, c = int(pick_j[k, b]), int(pick_c[k, b])
+        if j:
+            picked.extend(int(idx[i]) for i in _backtrack(club_take, costs[idx], j, c))
+            k -= j
+            b -= c
+    return picked
@@ -9,16 +9,22 @@ class RepoPaths:
     players_csv: str = "data/players.csv"
     teams_json: str = "data/teams.json"
     results_csv: str = "data/results.csv"
+    results_partitions_dir: str = "data/results"   # partizioni append-only + index.json
     multipliers_csv: str = "data/ranking_multipliers.csv"
 
     # pipeline paths (App1 backend)
+    raw_md_players_csv: str = "data/raw/md_players.csv"
+    raw_team_rosters_csv: str = "data/raw/team_rosters.csv"
     raw_results_dir: str = "data/raw/results"
     stage_results_dir: str = "data/stage/results_norm"
     stage_reports_dir: str = "data/stage/reports"
+    stage_ingest_state_json: str = "data/stage/ingest_state.json"
 
     processed_facts_dir: str = "data/processed/facts"
     processed_marts_dir: str = "data/processed/marts"
+    multiplier_history_csv: str = "data/processed/multiplier_history.csv"
 
     public_latest_dir: str = "data/public/latest"
     public_snapshots_dir: str = "data/public/snapshots"
     public_latest_json: str = "data/public/latest.json"
+    public_analytics_db: str = "data/public/analytics.sqlite"
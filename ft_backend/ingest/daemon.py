@@ -0,0 +1,318 @@
+"""
+Servizio locale di auto-ingest per data/raw/results/.
+
+Fa polling della directory (nessuna dipendenza extra, funziona anche su
+filesystem montati dove inotify non arriva). Quando compaiono file nuovi o
+modificati aspetta che la raffica di scritture si fermi (debounce), poi per
+ogni file: normalize -> score (facts per file), quindi una sola volta marts
+(incl. cubo e marts classici) -> publish locale di data/public/latest (con il feed
+changes.json) -> sync del DB analitico, con gli stessi passi del publish admin
+(publish.pipeline).
+
+Uso:
+    python -m ft_backend.ingest.daemon --root . --interval 1 --debounce 2
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from ..compute.match_points import accumulate_player_points, map_results_to_ids, player_points_from_results
+from ..config import RepoPaths
+from ..io.local_files import normalize_columns, prepare_md_players, read_csv_safe
+from ..publish.local import publish_local
+from ..publish.pipeline import PUBLIC_CLASSIC_MARTS, classic_marts, results_marts, sync_analytics
+from ..utils.fs import atomic_write_json
+from ..utils.instrumentation import RunMetrics
+
+log = logging.getLogger("ft_backend.ingest")
+
+Signature = Tuple[int, float]   # (size, mtime)
+
+
+class ResultsIngestDaemon:
+    def __init__(
+        self,
+        root: str = ".",
+        paths: RepoPaths = RepoPaths(),
+        poll_interval: float = 1.0,
+        debounce_s: float = 2.0,
+        retry_backoff_s: float = 30.0,
+        max_backoff_s: float = 900.0,
+    ):
+        self.root = Path(root)
+        self.paths = paths
+        self.poll_interval = poll_interval
+        self.debounce_s = debounce_s
+        self.retry_backoff_s = retry_backoff_s
+        self.max_backoff_s = max_backoff_s
+        self._pending: Dict[str, Signature] = {}
+        self._last_change: float = 0.0
+        # ultimo ingest fallito: (modifiche tentate, tentativi, prossimo retry)
+        self._failed: Optional[Tuple[Tuple[Any, ...], int, float]] = None
+        self.state = self._load_state()
+
+    def _p(self, rel: str) -> Path:
+        return self.root / rel
+
+    # -------------------- stato --------------------
+    def _load_state(self) -> Dict[str, Any]:
+        path = self._p(self.paths.stage_ingest_state_json)
+        if path.exists():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except Exception:
+                log.warning("Unreadable ingest state %s, starting from scratch", path)
+        return {"processed": {}}
+
+    def _save_state(self) -> None:
+        atomic_write_json(self._p(self.paths.stage_ingest_state_json), self.state)
+
+    # -------------------- polling --------------------
+    def scan(self) -> Dict[str, Signature]:
+        out = {}
+        for p in self._p(self.paths.raw_results_dir).glob("*.csv"):
+            st = p.stat()
+            out[p.name] = (int(st.st_size), float(st.st_mtime))
+        return out
+
+    def _master_signatures(self) -> Tuple[Optional[Signature], ...]:
+        out = []
+        for rel in (self.paths.raw_md_players_csv, self.paths.raw_team_rosters_csv):
+            p = self._p(rel)
+            out.append((int(p.stat().st_size), float(p.stat().st_mtime)) if p.exists() else None)
+        return tuple(out)
+
+    def pending_changes(self) -> Tuple[Dict[str, Signature], Dict[str, Signature], List[str]]:
+        """(file attuali, file nuovi/modificati rispetto allo stato, file spariti)."""
+        current = self.scan()
+        processed = self.state.get("processed", {})
+        changed = {
+            name: sig for name, sig in current.items()
+            if tuple(processed.get(name, {}).get("signature", ())) != sig
+        }
+        removed = sorted(set(processed) - set(current))
+        return current, changed, removed
+
+    def poll_once(self, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Un giro di polling; ritorna il risultato dell'ingest se è partito, altrimenti None."""
+        now = time.time() if now is None else now
+        current, changed, removed = self.pending_changes()
+
+        # debounce: ogni variazione (file nuovo o ancora in scrittura) fa ripartire il timer
+        if changed != self._pending:
+            self._pending = changed
+            self._last_change = now
+        if not changed and not removed:
+            return None
+        if changed and now - self._last_change < self.debounce_s:
+            return None
+        # un ingest fallito (master mancanti, lock del publish, ...) si ritenta subito se
+        # cambiano risultati o master, altrimenti con backoff esponenziale
+        attempt = (tuple(sorted(changed.items())), tuple(removed), self._master_signatures())
+        failures = 0
+        if self._failed is not None and self._failed[0] == attempt:
+            _, failures, retry_at = self._failed
+            if now < retry_at:
+                return None
+
+        try:
+            result = self.ingest(sorted(changed), removed, current)
+        except Exception:
+            failures += 1
+            backoff = min(self.retry_backoff_s * 2 ** (failures - 1), self.max_backoff_s)
+            self._failed = (attempt, failures, now + backoff)
+            raise
+        self._failed = None
+        self._pending = {}
+        return result
+
+    def run_forever(self) -> None:
+        log.info("Watching %s (interval=%ss, debounce=%ss)",
+                 self._p(self.paths.raw_results_dir), self.poll_interval, self.debounce_s)
+        self._p(self.paths.raw_results_dir).mkdir(parents=True, exist_ok=True)
+        try:
+            while True:
+                try:
+                    res = self.poll_once()
+                    if res and res.get("version"):
+                        log.info("Published %s (%s)", res.get("version"), res.get("files"))
+                except Exception:
+                    log.exception("Ingest failed; will retry on next change or after backoff")
+                time.sleep(self.poll_interval)
+        except KeyboardInterrupt:
+            log.info("Stopped.")
+
+    # -------------------- pipeline --------------------
+    def _facts_path(self, name: str) -> Path:
+        return self._p(self.paths.processed_facts_dir) / f"{Path(name).stem}.player_points.csv"
+
+    def ingest(self, names: List[str], removed: List[str], current: Dict[str, Signature]) -> Dict[str, Any]:
+        metrics = RunMetrics("ingest")
+        processed = self.state.setdefault("processed", {})
+        try:
+            md = read_csv_safe(self._p(self.paths.raw_md_players_csv))
+            rosters = read_csv_safe(self._p(self.paths.raw_team_rosters_csv))
+            if md is None or rosters is None:
+                raise RuntimeError("Missing md_players.csv or team_rosters.csv in data/raw/")
+            md = prepare_md_players(md)
+            rosters = normalize_columns(rosters)
+
+            for name in removed:
+                self._facts_path(name).unlink(missing_ok=True)
+                (self._p(self.paths.stage_results_dir) / name).unlink(missing_ok=True)
+                processed.pop(name, None)
+                log.info("Removed %s from facts", name)
+
+            for name in names:
+                src = self._p(self.paths.raw_results_dir) / name
+                entry: Dict[str, Any] = {"signature": list(current[name]), "ingested_at": pd.Timestamp.now().isoformat()}
+                with metrics.stage("normalize") as m:
+                    m.add_read(src)
+                    try:
+                        results = normalize_columns(read_csv_safe(src))
+                    except Exception as e:
+                        entry.update(status="error", error=str(e))
+                        processed[name] = entry
+                        m.fail(f"{name}: {e}")
+                        log.warning("Skipping %s: %s", name, e)
+                        continue
+                    m.rows_in = int(len(results))
+                    missing = sorted({"date", "winner", "loser"} - set(results.columns))
+                    if missing:
+                        entry.update(status="error", error=f"missing columns: {missing}")
+                        processed[name] = entry
+                        m.fail(f"{name}: {entry['error']}")
+                        log.warning("Skipping %s: %s", name, entry["error"])
+                        continue
+                    results, unmapped_w, unmapped_l = map_results_to_ids(results, md)
+                    if unmapped_w or unmapped_l:
+                        entry.update(status="error", error=f"unmapped players: winner {unmapped_w}, loser {unmapped_l}")
+                        processed[name] = entry
+                        m.fail(f"{name}: {entry['error']}")
+                        log.warning("Skipping %s: %s", name, entry["error"])
+                        continue
+                    stage_path = self._p(self.paths.stage_results_dir) / name
+                    stage_path.parent.mkdir(parents=True, exist_ok=True)
+                    results.to_csv(stage_path, index=False, encoding="utf-8")
+                    m.add_written(stage_path)
+                    m.rows_out = int(len(results))
+
+                with metrics.stage("score", rows_in=int(len(results))) as m:
+                    facts = player_points_from_results(results)[["date", "id_player", "points"]]
+                    fp = self._facts_path(name)
+                    fp.parent.mkdir(parents=True, exist_ok=True)
+                    facts.to_csv(fp, index=False, encoding="utf-8")
+                    m.add_written(fp)
+                    m.rows_out = int(len(facts))
+                entry.update(status="ok", facts=str(fp), rows=int(len(facts)))
+                processed[name] = entry
+
+            if removed == [] and not any(processed[n].get("status") == "ok" for n in names):
+                return {"version": None, "files": names, "removed": removed}
+
+            with metrics.stage("marts") as m:
+                parts, results_parts = [], []
+                for name, entry in processed.items():
+                    if entry.get("status") != "ok":
+                        continue
+                    fp = self._facts_path(name)
+                    if fp.exists():
+                        parts.append(pd.read_csv(fp, dtype={"id_player": str}))
+                        m.add_read(fp)
+                    # risultati normalizzati per il cubo (serve il dettaglio torneo, non solo i facts)
+                    sp = self._p(self.paths.stage_results_dir) / name
+                    if sp.exists():
+                        results_parts.append(pd.read_csv(sp, dtype={"winner_id": str, "loser_id": str}))
+                        m.add_read(sp)
+                facts_all = (
+                    pd.concat(parts, ignore_index=True) if parts
+                    else pd.DataFrame(columns=["date", "id_player", "points"])
+                )
+                results_all = (
+                    pd.concat(results_parts, ignore_index=True) if results_parts
+                    else pd.DataFrame(columns=["date", "winner_id", "loser_id"])
+                )
+                m.rows_in = int(len(facts_all))
+                marts = results_marts(results_all, md, rosters, player_points=accumulate_player_points(facts_all))
+                marts_dir = self._p(self.paths.processed_marts_dir)
+                marts_dir.mkdir(parents=True, exist_ok=True)
+                for fname, df in marts.items():
+                    df.to_csv(marts_dir / f"{fname}.csv", index=False, encoding="utf-8")
+                    m.add_written(marts_dir / f"{fname}.csv")
+                m.rows_out = int(len(marts["standings"]))
+
+            with metrics.stage("classic") as m:
+                # scoring classico del repo (se ci sono risultati di stagione), come nella compute admin
+                try:
+                    classic = classic_marts(self.root, self.paths)
+                except ValueError as e:
+                    # es. moltiplicatori senza colonne bonus/malus: si pubblica il resto
+                    m.fail(f"classic marts not built: {e}")
+                    log.warning("Classic marts not built: %s", e)
+                    classic = {}
+                for fname, df in classic.items():
+                    df.to_csv(marts_dir / f"{fname}.csv", index=False, encoding="utf-8")
+                    m.add_written(marts_dir / f"{fname}.csv")
+                m.rows_out = len(classic)
+
+            with metrics.stage("publish") as m:
+                datasets = {"md_players": md, "team_rosters": rosters, **marts}
+                datasets.update({name: classic[name] for name in PUBLIC_CLASSIC_MARTS if name in classic})
+                res = publish_local(
+                    datasets,
+                    self._p(self.paths.public_latest_dir),
+                    self._p(self.paths.public_snapshots_dir),
+                    version=metrics.run_id,
+                    extra_manifest={
+                        "source": "ingest_daemon",
+                        "stage_metrics": {"ingest": metrics.summary()},
+                    },
+                )
+                m.rows_out = sum(len(df) for df in datasets.values())
+
+            # DB analitico: carica il nuovo snapshot (e quelli eventualmente mancanti)
+            with metrics.stage("analytics") as m:
+                try:
+                    m.rows_out = sync_analytics(self._p(self.paths.public_snapshots_dir), self._p(self.paths.public_analytics_db))
+                    m.add_written(self._p(self.paths.public_analytics_db))
+                except Exception as e:
+                    m.fail(f"analytics DB not updated: {e}")
+                    log.warning("Analytics DB not updated: %s", e)
+        finally:
+            self._save_state()
+            metrics.write_report(self._p(self.paths.stage_reports_dir))
+
+        return {"version": res["version"], "files": names, "removed": removed}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Watch data/raw/results and publish data/public/latest")
+    ap.add_argument("--root", default=".", help="repository root")
+    ap.add_argument("--interval", type=float, default=1.0, help="polling interval in seconds")
+    ap.add_argument("--debounce", type=float, default=2.0, help="quiet period before ingesting a burst")
+    ap.add_argument("--once", action="store_true", help="ingest pending files once and exit")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    daemon = ResultsIngestDaemon(args.root, poll_interval=args.interval, debounce_s=args.debounce)
+    if args.once:
+        current, changed, removed = daemon.pending_changes()
+        if not changed and not removed:
+            log.info("Nothing to ingest.")
+            return
+        res = daemon.ingest(sorted(changed), removed, current)
+        log.info("Published %s (%s)", res["version"], res["files"])
+        return
+    daemon.run_forever()
+
+
+if __name__ == "__main__":
+    main()
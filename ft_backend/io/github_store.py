@@ -1,15 +1,21 @@
-
 from __future__ import annotations
 
 import base64
 import io
 import json
 from dataclasses import dataclass
-from typing import Any, Optional, Tuple
+from typing import BinaryIO, Iterator, List, Optional, Tuple, Union
 
-import pandas as pd
 import requests
 
+from .stores import StoreHelpers
+
+# Oltre questa soglia la contents API non include il contenuto (encoding "none"):
+# letture via blob raw in streaming, scritture via Git Data API (blob + tree + commit).
+LARGE_FILE_BYTES = 1_000_000
+CHUNK_BYTES = 1 << 20
+TIMEOUT_S = 60
+
 
 @dataclass(frozen=True)
 class GitHubConfig:
@@ -21,61 +27,171 @@ class GitHubConfig:
     def api_base(self) -> str:
         return f"https://api.github.com/repos/{self.repo}/contents"
 
+    @property
+    def git_base(self) -> str:
+        return f"https://api.github.com/repos/{self.repo}/git"
+
+
+def _b64_json_body(src: BinaryIO, chunk: int = CHUNK_BYTES) -> Iterator[bytes]:
+    """Corpo JSON {"encoding": "base64", "content": ...} generato a pezzi dal file sorgente."""
+    chunk -= chunk % 3  # multipli di 3 byte: nessun padding intermedio
+    yield b'{"encoding": "base64", "content": "'
+    while True:
+        block = src.read(chunk)
+        if not block:
+            break
+        yield base64.b64encode(block)
+    yield b'"}'
 
-class GitHubStore:
-    """Minimal GitHub contents API store (create/update/read)."""
+
+class GitHubStore(StoreHelpers):
+    """Minimal GitHub contents API store (create/update/read/list/delete); altri backend in io.stores."""
 
     def __init__(self, cfg: GitHubConfig):
         self.cfg = cfg
 
-    def _headers(self) -> dict:
+    def _headers(self, accept: str = "application/vnd.github+json") -> dict:
         return {
             "Authorization": f"token {self.cfg.token}",
-            "Accept": "application/vnd.github+json",
+            "Accept": accept,
         }
 
-    def read_bytes(self, path: str) -> Tuple[Optional[bytes], Optional[str]]:
+    def _check(self, resp: requests.Response, what: str, ok=(200, 201)) -> dict:
+        if resp.status_code not in ok:
+            raise RuntimeError(f"GitHub {what}: {resp.status_code} - {resp.text}")
+        return resp.json()
+
+    # -------------------- lettura --------------------
+    def stat(self, path: str) -> Optional[dict]:
+        """Metadati contents API (sha, size, content inline solo per file piccoli); None se assente."""
+        url = f"{self.cfg.api_base}/{path}"
+        resp = requests.get(url, headers=self._headers(), params={"ref": self.cfg.branch}, timeout=TIMEOUT_S)
+        if resp.status_code == 404:
+            return None
+        return self._check(resp, f"GET {path}", ok=(200,))
+
+    def list_dir(self, path: str) -> List[dict]:
+        """Voci contents API (name, path, type, sha, ...) di una directory; [] se assente."""
         url = f"{self.cfg.api_base}/{path}"
-        resp = requests.get(url, headers=self._headers())
-        if resp.status_code == 200:
-            data = resp.json()
-            content = base64.b64decode(data["content"])
-            return content, data["sha"]
+        resp = requests.get(url, headers=self._headers(), params={"ref": self.cfg.branch}, timeout=TIMEOUT_S)
         if resp.status_code == 404:
+            return []
+        data = self._check(resp, f"GET {path}", ok=(200,))
+        return data if isinstance(data, list) else []
+
+    def read_to(self, path: str, out: BinaryIO) -> Optional[str]:
+        """
+        Scrive il contenuto di `path` in `out` (file o buffer) e ritorna lo sha; None se assente.
+        File piccoli: base64 inline della contents API. File grandi: blob in formato raw,
+        scaricato in streaming a blocchi (niente JSON/base64 in memoria).
+        """
+        meta = self.stat(path)
+        if meta is None:
+            return None
+        if meta.get("encoding") == "base64" and meta.get("content"):
+            out.write(base64.b64decode(meta["content"]))
+            return meta["sha"]
+
+        url = f"{self.cfg.git_base}/blobs/{meta['sha']}"
+        with requests.get(url, headers=self._headers("application/vnd.github.raw"), stream=True, timeout=TIMEOUT_S) as resp:
+            if resp.status_code != 200:
+                raise RuntimeError(f"GitHub GET blob {path}: {resp.status_code} - {resp.text}")
+            for block in resp.iter_content(chunk_size=CHUNK_BYTES):
+                out.write(block)
+        return meta["sha"]
+
+    def read_bytes(self, path: str) -> Tuple[Optional[bytes], Optional[str]]:
+        buf = io.BytesIO()
+        sha = self.read_to(path, buf)
+        if sha is None:
             return None, None
-        raise RuntimeError(f"GitHub GET {path}: {resp.status_code} - {resp.text}")
+        return buf.getvalue(), sha
 
+    # -------------------- scrittura --------------------
     def write_bytes(self, path: str, content_bytes: bytes, message: str) -> None:
+        if len(content_bytes) > LARGE_FILE_BYTES:
+            self.write_from(path, io.BytesIO(content_bytes), message)
+            return
         url = f"{self.cfg.api_base}/{path}"
-        existing, sha = self.read_bytes(path)
+        meta = self.stat(path)
 
         payload = {
             "message": message,
             "content": base64.b64encode(content_bytes).decode("utf-8"),
             "branch": self.cfg.branch,
         }
-        if sha is not None:
-            payload["sha"] = sha
-
-        resp = requests.put(url, headers=self._headers(), data=json.dumps(payload))
-        if resp.status_code not in (200, 201):
-            raise RuntimeError(f"GitHub PUT {path}: {resp.status_code} - {resp.text}")
-
-    # Convenience helpers
-    def read_csv(self, path: str) -> pd.DataFrame:
-        b, _ = self.read_bytes(path)
-        if b is None:
-            return pd.DataFrame()
-        return pd.read_csv(io.StringIO(b.decode("utf-8")))
-
-    def write_csv(self, path: str, df: pd.DataFrame, message: str) -> None:
-        self.write_bytes(path, df.to_csv(index=False).encode("utf-8"), message)
-
-    def read_json(self, path: str, default: Any) -> Any:
-        b, _ = self.read_bytes(path)
-        if b is None:
-            return default
-        return json.loads(b.decode("utf-8"))
-
-    def write_json(self, path: str, obj: Any, message: str) -> None:
-        self.write_bytes(path, json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8"), message)
+        if meta is not None:
+            payload["sha"] = meta["sha"]
+
+        resp = requests.put(url, headers=self._headers(), data=json.dumps(payload), timeout=TIMEOUT_S)
+        self._check(resp, f"PUT {path}")
+
+    def delete(self, path: str, message: str, sha: Optional[str] = None) -> bool:
+        """Cancella `path` (sha dalla contents API se non passato); False se il file non c'era già."""
+        if sha is None:
+            meta = self.stat(path)
+            if meta is None:
+                return False
+            sha = meta["sha"]
+        url = f"{self.cfg.api_base}/{path}"
+        payload = {"message": message, "sha": sha, "branch": self.cfg.branch}
+        resp = requests.delete(url, headers=self._headers(), data=json.dumps(payload), timeout=TIMEOUT_S)
+        if resp.status_code == 404:
+            return False
+        self._check(resp, f"DELETE {path}", ok=(200,))
+        return True
+
+    def write_from(self, path: str, src: Union[BinaryIO, str], message: str) -> str:
+        """
+        Scrive un file di qualsiasi dimensione con la Git Data API:
+        blob (corpo base64 generato in streaming da `src`) -> tree -> commit -> update ref.
+        `src` è un file binario aperto o un path locale. Ritorna lo sha del commit.
+        """
+        if isinstance(src, str):
+            with open(src, "rb") as f:
+                return self.write_from(path, f, message)
+
+        blob = self._check(
+            requests.post(
+                f"{self.cfg.git_base}/blobs",
+                headers={**self._headers(), "Content-Type": "application/json"},
+                data=_b64_json_body(src),
+                timeout=TIMEOUT_S,
+            ),
+            f"POST blob {path}",
+        )
+
+        ref_url = f"{self.cfg.git_base}/refs/heads/{self.cfg.branch}"
+        head = self._check(requests.get(ref_url, headers=self._headers(), timeout=TIMEOUT_S), "GET ref", ok=(200,))
+        parent = head["object"]["sha"]
+        base_commit = self._check(
+            requests.get(f"{self.cfg.git_base}/commits/{parent}", headers=self._headers(), timeout=TIMEOUT_S),
+            "GET commit", ok=(200,),
+        )
+        tree = self._check(
+            requests.post(
+                f"{self.cfg.git_base}/trees",
+                headers=self._headers(),
+                data=json.dumps({
+                    "base_tree": base_commit["tree"]["sha"],
+                    "tree": [{"path": path, "mode": "100644", "type": "blob", "sha": blob["sha"]}],
+                }),
+                timeout=TIMEOUT_S,
+            ),
+            "POST tree",
+        )
+        commit = self._check(
+            requests.post(
+                f"{self.cfg.git_base}/commits",
+                headers=self._headers(),
+                data=json.dumps({"message": message, "tree": tree["sha"], "parents": [parent]}),
+                timeout=TIMEOUT_S,
+            ),
+            "POST commit",
+        )
+        # fast-forward: se il branch è avanzato nel frattempo GitHub risponde 422
+        self._check(
+            requests.patch(ref_url, headers=self._headers(), data=json.dumps({"sha": commit["sha"]}), timeout=TIMEOUT_S),
+            "PATCH ref", ok=(200,),
+        )
+        return commit["sha"]
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from ..config import RepoPaths
+from .multipliers import load_multipliers
+from .results_partitions import PartitionedResults
+from .stores import LocalStore
+
+
+def read_csv_safe(path: Optional[Union[str, Path]]) -> Optional[pd.DataFrame]:
+    """Come nelle app: prova encoding e separatori comuni, None se il file non esiste."""
+    if path is None or not Path(path).exists():
+        return None
+
+    encodings = ["utf-8", "utf-8-sig", "cp1252", "latin1"]
+    seps = [",", ";"]
+    last_error = None
+
+    for enc in encodings:
+        for sep in seps:
+            try:
+                df = pd.read_csv(path, encoding=enc, sep=sep)
+                if df.shape[1] > 1:
+                    return df
+            except Exception as e:
+                last_error = e
+
+    raise RuntimeError(f"Unable to read CSV: {path}. Last error: {last_error}")
+
+
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    out = df.copy()
+    out.columns = [
+        str(c).strip().lower().replace("\ufeff", "").replace(" ", "_").replace("-", "_")
+        for c in out.columns
+    ]
+    return out
+
+
+def prepare_md_players(md: pd.DataFrame) -> pd.DataFrame:
+    """Colonne normalizzate + player/full_name sempre presenti (se almeno uno dei due c'è)."""
+    md = normalize_columns(md)
+    if "player" not in md.columns and "full_name" in md.columns:
+        md["player"] = md["full_name"]
+    if "full_name" not in md.columns and "player" in md.columns:
+        md["full_name"] = md["player"]
+    return md
+
+
+def read_classic_inputs(
+    root: Union[str, Path] = ".", paths: Optional[RepoPaths] = None
+) -> Tuple[pd.DataFrame, List[Dict[str, Any]], Optional[pd.DataFrame]]:
+    """
+    Input dello scoring classico (app_1_2) dal checkout locale: risultati (partizioni,
+    o results.csv finché l'indice non esiste), teams.json e ranking_multipliers.csv.
+    File mancanti -> frame/lista vuoti; Tournament Type normalizzato come nell'app.
+    """
+    paths = paths or RepoPaths()
+    root = Path(root)
+    results = PartitionedResults(
+        LocalStore(root), root=paths.results_partitions_dir, legacy_path=paths.results_csv
+    ).load()
+    if "Tournament Type" in results.columns:
+        results["Tournament Type"] = results["Tournament Type"].astype(str).str.strip().str.title()
+
+    teams: List[Dict[str, Any]] = []
+    if (root / paths.teams_json).exists():
+        with open(root / paths.teams_json, "r", encoding="utf-8") as f:
+            teams = json.load(f)
+
+    mult_path = root / paths.multipliers_csv
+    multipliers = load_multipliers(mult_path)[0].to_frame() if mult_path.exists() else None
+    return results, teams, multipliers
@@ -0,0 +1,343 @@
+"""
+Loader tipizzato per ranking_multipliers.csv.
+
+Il file reale è tab-separato, cp1252, con colonne
+    ranking, Giocatore, moltiplicatore bonus, moltiplicatore malus, id_player, Squadra, Prezzo
+mentre lo scoring storico si aspettava 'player'. Qui:
+  - decodifica (utf-8 / cp1252 / latin1) e sniffing del separatore
+  - alias delle colonne verso nomi canonici (Giocatore/player/name -> player, ...)
+  - validazione di ranking e moltiplicatori (righe scartate finiscono nel report)
+  - lookup compatta su array (nome/id -> indice), costruita una volta per versione del file
+  - binding a md_players con report esplicito delle righe che non trovano il giocatore
+"""
+from __future__ import annotations
+
+import csv
+import hashlib
+import io
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+log = logging.getLogger("ft_backend.multipliers")
+
+# nome canonico -> alias accettati (confronto su lower/strip, spazi e '_' equivalenti)
+COLUMN_ALIASES: Dict[str, List[str]] = {
+    "ranking": ["ranking", "rank", "posizione"],
+    "player": ["player", "giocatore", "name", "full_name", "player_name"],
+    "id_player": ["id_player", "player_id", "id"],
+    "moltiplicatore bonus": ["moltiplicatore bonus", "bonus", "bonus_mult", "bonus multiplier"],
+    "moltiplicatore malus": ["moltiplicatore malus", "malus", "malus_mult", "malus multiplier"],
+    "Squadra": ["squadra", "club"],
+    "Prezzo": ["prezzo", "price", "costo"],
+}
+REQUIRED = ["moltiplicatore bonus", "moltiplicatore malus"]
+ENCODINGS = ["utf-8-sig", "cp1252", "latin1"]
+DELIMITERS = "\t;,|"
+MULT_RANGE = (0.0, 5.0)
+CACHE_SIZE = 8
+
+
+def _norm(c: Any) -> str:
+    return str(c).strip().lower().replace("\ufeff", "").replace("_", " ")
+
+
+def canonical_columns(df: pd.DataFrame) -> Dict[str, str]:
+    """nome canonico -> colonna reale del frame (primo alias trovato)."""
+    real = {_norm(c): c for c in df.columns}
+    out: Dict[str, str] = {}
+    for canon, aliases in COLUMN_ALIASES.items():
+        for a in aliases:
+            if _norm(a) in real:
+                out[canon] = real[_norm(a)]
+                break
+    return out
+
+
+def decode_bytes(data: bytes) -> Tuple[str, str]:
+    for enc in ENCODINGS:
+        try:
+            return data.decode(enc), enc
+        except UnicodeDecodeError:
+            continue
+    return data.decode("latin1", errors="replace"), "latin1"
+
+
+def sniff_delimiter(text: str) -> str:
+    head = "\n".join(text.splitlines()[:20])
+    try:
+        return csv.Sniffer().sniff(head, delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        first = text.splitlines()[0] if text else ""
+        counts = {d: first.count(d) for d in DELIMITERS}
+        return max(counts, key=counts.get) if any(counts.values()) else ","
+
+
+@dataclass
+class MultiplierLoadReport:
+    source: str = ""
+    version: str = ""
+    encoding: str = ""
+    delimiter: str = ""
+    rows: int = 0
+    loaded: int = 0
+    columns: Dict[str, str] = field(default_factory=dict)
+    invalid: List[Dict[str, Any]] = field(default_factory=list)      # righe scartate (motivo)
+    unbound: List[Dict[str, Any]] = field(default_factory=list)      # righe senza match in md_players
+    duplicates: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.loaded > 0 and not self.invalid and not self.unbound
+
+    def summary(self) -> str:
+        parts = [f"{self.loaded}/{self.rows} multiplier rows loaded from {self.source or 'frame'}"]
+        if self.invalid:
+            parts.append(f"{len(self.invalid)} invalid")
+        if self.unbound:
+            parts.append(f"{len(self.unbound)} not bound to md_players")
+        if self.duplicates:
+            parts.append(f"{len(self.duplicates)} duplicate keys")
+        return ", ".join(parts)
+
+
+@dataclass(frozen=True)
+class MultiplierTable:
+    """Moltiplicatori validati in array paralleli; lookup per nome (lower) o id_player."""
+    version: str
+    player: np.ndarray        # nomi originali
+    key: np.ndarray           # nomi lower/strip
+    id_player: np.ndarray     # stringhe ('' se assente)
+    ranking: np.ndarray       # float (nan se assente)
+    bonus: np.ndarray
+    malus: np.ndarray
+    extra: pd.DataFrame       # Squadra/Prezzo se presenti, stesso ordine
+    source_row: np.ndarray    # riga nel file (header = 1)
+    # indici di lookup su valori unici e non vuoti (ultima riga vince) -> riga della tabella
+    _by_key: pd.Index = field(repr=False, default=None)
+    _key_rows: np.ndarray = field(repr=False, default=None)
+    _by_id: pd.Index = field(repr=False, default=None)
+    _id_rows: np.ndarray = field(repr=False, default=None)
+
+    def __len__(self) -> int:
+        return len(self.bonus)
+
+    @staticmethod
+    def _rows(index: pd.Index, rows: np.ndarray, values: pd.Series) -> np.ndarray:
+        """Riga della tabella per ogni valore (-1 se assente o vuoto)."""
+        pos = index.get_indexer(values.to_numpy())
+        return np.where(pos >= 0, rows[np.maximum(pos, 0)] if len(rows) else -1, -1)
+
+    def _gather(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        hit = rows >= 0
+        bonus = np.ones(len(rows))
+        malus = np.ones(len(rows))
+        bonus[hit] = self.bonus[rows[hit]]
+        malus[hit] = self.malus[rows[hit]]
+        return bonus, malus
+
+    def lookup_names(self, names: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        """(bonus, malus) per nome giocatore; 1.0 se assente."""
+        return self._gather(self._rows(self._by_key, self._key_rows, names.astype(str).str.strip().str.lower()))
+
+    def lookup_ids(self, ids: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        """(bonus, malus) per id_player; 1.0 se assente."""
+        return self._gather(self._rows(self._by_id, self._id_rows, ids.astype(str).str.strip()))
+
+    def ids_for_names(self, names: pd.Series) -> pd.Series:
+        """id_player per nome giocatore ('' se il nome non c'è o non ha id)."""
+        rows = self._rows(self._by_key, self._key_rows, names.astype(str).str.strip().str.lower())
+        ids = np.where(rows >= 0, self.id_player[np.maximum(rows, 0)] if len(self.id_player) else "", "")
+        return pd.Series(ids, index=names.index, dtype=object)
+
+    def to_dicts(self) -> Tuple[Dict[str, float], Dict[str, float]]:
+        """Compatibilità con compute_points_with_multipliers (dict per nome lower)."""
+        return dict(zip(self.key, self.bonus.tolist())), dict(zip(self.key, self.malus.tolist()))
+
+    def to_frame(self) -> pd.DataFrame:
+        """Frame con colonne canoniche (ranking, player, moltiplicatore bonus/malus, id_player, ...)."""
+        out = pd.DataFrame({
+            "ranking": self.ranking,
+            "player": self.player,
+            "moltiplicatore bonus": self.bonus,
+            "moltiplicatore malus": self.malus,
+            "id_player": self.id_player,
+        })
+        for c in self.extra.columns:
+            out[c] = self.extra[c].to_numpy()
+        return out
+
+
+def _frame_version(df: pd.DataFrame) -> str:
+    h = pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()
+    cols = "|".join(map(str, df.columns)).encode("utf-8")
+    return hashlib.sha256(cols + h).hexdigest()[:16]
+
+
+def _unique_index(values: np.ndarray) -> Tuple[pd.Index, np.ndarray]:
+    """Indice sui valori non vuoti, una sola voce per valore (l'ultima riga) + righe corrispondenti."""
+    s = pd.Series(values, dtype=object)
+    mask = (s != "") & ~s.duplicated(keep="last")
+    return pd.Index(s[mask].to_numpy(dtype=object)), np.flatnonzero(mask.to_numpy())
+
+
+def _build_table(df: pd.DataFrame, version: str, report: MultiplierLoadReport,
+                 mult_range: Tuple[float, float]) -> MultiplierTable:
+    cols = canonical_columns(df)
+    report.columns = dict(cols)
+    report.rows = int(len(df))
+    missing = [c for c in REQUIRED if c not in cols]
+    if "player" not in cols and "id_player" not in cols:
+        missing.append("player|id_player")
+    if missing:
+        raise ValueError(
+            f"ranking multipliers: missing columns {missing}; found {list(df.columns)} "
+            f"(accepted aliases: { {k: COLUMN_ALIASES[k] for k in ('player', 'id_player') + tuple(REQUIRED)} })"
+        )
+
+    player = df[cols["player"]].astype(str).str.strip() if "player" in cols else pd.Series("", index=df.index)
+    ids = (
+        df[cols["id_player"]].astype(str).str.strip().replace({"nan": "", "None": ""})
+        if "id_player" in cols else pd.Series("", index=df.index)
+    )
+    ranking = pd.to_numeric(df[cols["ranking"]], errors="coerce") if "ranking" in cols else pd.Series(np.nan, index=df.index)
+    bonus = pd.to_numeric(df[cols["moltiplicatore bonus"]].astype(str).str.replace(",", ".", regex=False), errors="coerce")
+    malus = pd.to_numeric(df[cols["moltiplicatore malus"]].astype(str).str.replace(",", ".", regex=False), errors="coerce")
+
+    lo, hi = mult_range
+    reasons = pd.Series("", index=df.index, dtype=object)
+    reasons[(player == "") & (ids == "")] = "no player name or id"
+    reasons[bonus.isna() & (reasons == "")] = "moltiplicatore bonus not numeric"
+    reasons[malus.isna() & (reasons == "")] = "moltiplicatore malus not numeric"
+    reasons[((bonus < lo) | (bonus > hi)) & (reasons == "")] = f"moltiplicatore bonus outside [{lo}, {hi}]"
+    reasons[((malus < lo) | (malus > hi)) & (reasons == "")] = f"moltiplicatore malus outside [{lo}, {hi}]"
+    if "ranking" in cols:
+        reasons[(df[cols["ranking"]].notna() & (ranking.isna() | (ranking < 1))) & (reasons == "")] = "ranking not a positive number"
+    bad = reasons != ""
+    for i in np.flatnonzero(bad.to_numpy()):
+        report.invalid.append({"row": int(i) + 2, "player": player.iloc[i], "id_player": ids.iloc[i], "reason": reasons.iloc[i]})
+
+    keep = ~bad
+    key = player.str.lower()
+    dup_mask = keep & key.ne("") & key.duplicated(keep="last")
+    keep &= ~dup_mask
+    # id ripetuti su righe con nomi diversi: le righe restano, l'id punta all'ultima
+    id_dup = keep & ids.ne("") & ids[keep].duplicated(keep="last").reindex(ids.index, fill_value=False)
+    report.duplicates = sorted(set(key[dup_mask])) + sorted(f"id_player {i}" for i in set(ids[id_dup]))
+
+    extra_cols = [cols[c] for c in ("Squadra", "Prezzo") if c in cols]
+    extra = df.loc[keep, extra_cols].reset_index(drop=True)
+    extra.columns = [c for c in ("Squadra", "Prezzo") if c in cols]
+
+    table = MultiplierTable(
+        version=version,
+        player=player[keep].to_numpy(dtype=object),
+        key=key[keep].to_numpy(dtype=object),
+        id_player=ids[keep].to_numpy(dtype=object),
+        ranking=ranking[keep].to_numpy(dtype=float),
+        bonus=bonus[keep].to_numpy(dtype=float),
+        malus=malus[keep].to_numpy(dtype=float),
+        extra=extra,
+        source_row=np.flatnonzero(keep.to_numpy()) + 2,
+    )
+    by_key, key_rows = _unique_index(table.key)
+    by_id, id_rows = _unique_index(table.id_player)
+    for name, value in (("_by_key", by_key), ("_key_rows", key_rows), ("_by_id", by_id), ("_id_rows", id_rows)):
+        object.__setattr__(table, name, value)
+    report.loaded = len(table)
+    return table
+
+
+_CACHE: "OrderedDict[Tuple[str, Tuple[float, float]], Tuple[MultiplierTable, MultiplierLoadReport]]" = OrderedDict()
+
+
+def _cached(version: str, mult_range: Tuple[float, float], build) -> Tuple[MultiplierTable, MultiplierLoadReport]:
+    key = (version, tuple(mult_range))
+    if key in _CACHE:
+        _CACHE.move_to_end(key)
+        return _CACHE[key]
+    value = build()
+    _CACHE[key] = value
+    while len(_CACHE) > CACHE_SIZE:
+        _CACHE.popitem(last=False)
+    return value
+
+
+def read_multipliers_frame(data: bytes) -> Tuple[pd.DataFrame, str, str]:
+    """bytes del file -> (DataFrame grezzo, encoding, delimitatore). id_player resta stringa (zeri iniziali)."""
+    text, enc = decode_bytes(data)
+    sep = sniff_delimiter(text)
+    df = pd.read_csv(io.StringIO(text), sep=sep, dtype=str, keep_default_na=False)
+    return df, enc, sep
+
+
+def load_multipliers(
+    source: Union[str, Path, bytes, pd.DataFrame],
+    md_players: Optional[pd.DataFrame] = None,
+    mult_range: Tuple[float, float] = MULT_RANGE,
+) -> Tuple[MultiplierTable, MultiplierLoadReport]:
+    """
+    Carica e valida i moltiplicatori da path, bytes o DataFrame già letto.
+    La tabella è in cache per versione (sha256 del contenuto); il binding a md_players
+    viene rifatto ogni volta (è economico) e finisce nel report.
+    Solleva ValueError se mancano le colonne necessarie.
+    """
+    if isinstance(source, pd.DataFrame):
+        version = _frame_version(source)
+
+        def _build():
+            rep = MultiplierLoadReport(source="frame", version=version)
+            return _build_table(source, version, rep, mult_range), rep
+    else:
+        if isinstance(source, (str, Path)):
+            data = Path(source).read_bytes()
+            label = str(source)
+        else:
+            data = source
+            label = "bytes"
+        version = hashlib.sha256(data).hexdigest()[:16]
+
+        def _build():
+            df, enc, sep = read_multipliers_frame(data)
+            rep = MultiplierLoadReport(source=label, version=version, encoding=enc, delimiter=sep)
+            return _build_table(df, version, rep, mult_range), rep
+
+    table, base_report = _cached(version, mult_range, _build)
+    report = MultiplierLoadReport(**{**base_report.__dict__, "invalid": list(base_report.invalid),
+                                     "unbound": [], "duplicates": list(base_report.duplicates)})
+    if md_players is not None:
+        report.unbound = bind_to_md_players(table, md_players)
+
+    if report.invalid or report.unbound or report.duplicates:
+        log.warning("ranking multipliers: %s", report.summary())
+        for r in (report.invalid + report.unbound)[:20]:
+            log.warning("  row %s %s (%s): %s", r.get("row"), r.get("player"), r.get("id_player"), r.get("reason"))
+    return table, report
+
+
+def bind_to_md_players(table: MultiplierTable, md_players: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Righe che non trovano il giocatore in md_players (per id_player se presente, altrimenti per nome)."""
+    cols = canonical_columns(md_players)
+    md_ids = set(md_players[cols["id_player"]].astype(str).str.strip()) if "id_player" in cols else set()
+    md_names = set(md_players[cols["player"]].astype(str).str.strip().str.lower()) if "player" in cols else set()
+
+    unbound = []
+    for i in range(len(table)):
+        pid, key = table.id_player[i], table.key[i]
+        if pid and md_ids:
+            if pid in md_ids:
+                continue
+            reason = f"id_player {pid} not in md_players"
+        elif key and md_names:
+            if key in md_names:
+                continue
+            reason = "player name not in md_players"
+        else:
+            reason = "no id_player/name to bind"
+        unbound.append({"row": int(table.source_row[i]), "player": table.player[i], "id_player": pid, "reason": reason})
+    return unbound
@@ -0,0 +1,275 @@
+"""
+Risultati stagionali salvati come partizioni append-only + un indice piccolo.
+
+    <root>/index.json
+    <root>/<season>/<torneo>_<tipo>/<sha12>.csv
+
+Ogni partizione contiene righe di un solo (Season, Tournament, Tournament Type) ed è
+immutabile: il nome deriva dal contenuto, quindi riscriverla è idempotente.
+- righe nuove in un torneo già salvato -> partizione "append" con le sole righe nuove
+- righe modificate/cancellate          -> partizione "full" del torneo che sostituisce
+                                          (supersedes) le precedenti
+- torneo rimosso                       -> voce "full" con 0 righe (nessun file)
+L'indice si scrive per ultimo: chi legge vede solo partizioni complete.
+
+load(seasons) legge l'indice e, in parallelo, le sole partizioni attive delle stagioni
+richieste. Se l'indice non esiste ancora usa il vecchio results.csv (legacy_path):
+il primo commit lo migra in partizioni.
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import re
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from .stores import ParsedCache, Store, preload
+
+RESULT_KEYS = ["Season", "Tournament", "Tournament Type"]
+INDEX_VERSION = 1
+
+_SLUG_RE = re.compile(r"[^0-9A-Za-z]+")
+
+
+def _slug(v: Any) -> str:
+    return _SLUG_RE.sub("-", str(v)).strip("-") or "na"
+
+
+def _key_of(row: Tuple) -> Tuple[str, str, str]:
+    return tuple("" if pd.isna(v) else str(v) for v in row)  # type: ignore[return-value]
+
+
+def _groups(df: pd.DataFrame) -> Dict[Tuple[str, str, str], List[Any]]:
+    """Indici di riga per torneo; chiavi a stringa (2024 e "2024" sono la stessa stagione)."""
+    out: Dict[Tuple[str, str, str], List[Any]] = {}
+    for i, k in zip(df.index, df[RESULT_KEYS].itertuples(index=False, name=None)):
+        out.setdefault(_key_of(k), []).append(i)
+    return out
+
+
+def _parse_csv(content: Optional[bytes]) -> pd.DataFrame:
+    if content is None:
+        return pd.DataFrame()
+    return pd.read_csv(io.BytesIO(content))
+
+
+def _row_hashes(df: pd.DataFrame) -> pd.Series:
+    """
+    Hash per riga indipendente dall'ordine delle colonne e dal dtype (tutto a stringa).
+    Ogni torneo è hashato sulle sole colonne non vuote in quel torneo: una colonna nuova
+    (es. Aces, match_id) aggiunta per altri tornei non cambia le righe già salvate.
+    """
+    if df.empty:
+        return pd.Series([], dtype="uint64")
+    parts = []
+    for idx in _groups(df).values():
+        part = df.loc[idx].dropna(axis=1, how="all")
+        cols = sorted(part.columns, key=str)
+        # i nomi delle colonne entrano nella chiave: stessi valori su colonne diverse -> hash diversi
+        key = hashlib.md5("|".join(map(str, cols)).encode("utf-8")).hexdigest()[:16]
+        parts.append(pd.util.hash_pandas_object(part[cols].astype(str), index=False, hash_key=key))
+    return pd.concat(parts).reindex(df.index)
+
+
+class PartitionedResults:
+    def __init__(
+        self,
+        store: Store,
+        root: str = "data/results",
+        legacy_path: Optional[str] = "data/results.csv",
+        cache: Optional[ParsedCache] = None,
+    ):
+        self.store = store
+        self.root = root.rstrip("/")
+        self.index_path = f"{self.root}/index.json"
+        self.legacy_path = legacy_path
+        self.cache = cache or ParsedCache(max_entries=512)
+        self._index: Optional[Dict[str, Any]] = None
+        # righe salvate per torneo caricato/scritto: key -> Counter(hash riga)
+        self._saved: Dict[Tuple[str, str, str], Counter] = {}
+
+    # -------------------- indice --------------------
+    def read_index(self, refresh: bool = False) -> Dict[str, Any]:
+        if self._index is None or refresh:
+            b, _ = self.store.read_bytes(self.index_path)
+            fresh = json.loads(b.decode("utf-8")) if b else {"version": INDEX_VERSION, "partitions": []}
+            if self._index is not None:
+                # l'indice è append-only: le voci locali non ancora scritte restano
+                seen = {p["id"] for p in fresh["partitions"]}
+                fresh["partitions"] += [p for p in self._index["partitions"] if p["id"] not in seen]
+            self._index = fresh
+        return self._index
+
+    def active_partitions(self, seasons: Optional[Iterable[Any]] = None) -> List[Dict[str, Any]]:
+        parts = self.read_index()["partitions"]
+        superseded = {sid for p in parts for sid in p.get("supersedes", [])}
+        wanted = None if seasons is None else {str(s) for s in seasons}
+        return [
+            p for p in parts
+            if p["id"] not in superseded and p["rows"] > 0 and (wanted is None or str(p["season"]) in wanted)
+        ]
+
+    def seasons(self) -> List[str]:
+        if not self.read_index()["partitions"] and self.legacy_path:
+            legacy = self._load_legacy()
+            return sorted(legacy["Season"].dropna().astype(str).unique()) if "Season" in legacy.columns else []
+        return sorted({str(p["season"]) for p in self.active_partitions()})
+
+    # -------------------- lettura --------------------
+    def _load_legacy(self) -> pd.DataFrame:
+        b, sha = self.store.read_bytes(self.legacy_path) if self.legacy_path else (None, None)
+        return self.cache.get(self.legacy_path or "", b, sha, _parse_csv)
+
+    def load(self, seasons: Optional[Iterable[Any]] = None) -> pd.DataFrame:
+        """Concatena le partizioni attive (solo le stagioni richieste, None = tutte)."""
+        index = self.read_index(refresh=True)
+        if not index["partitions"] and self.legacy_path:
+            df = self._load_legacy()
+            if seasons is not None and "Season" in df.columns:
+                df = df[df["Season"].astype(str).isin({str(s) for s in seasons})].reset_index(drop=True)
+        else:
+            parts = self.active_partitions(seasons)
+            specs = {p["id"]: (p["path"], _parse_csv) for p in parts}
+            frames, errors = preload(self.store, specs, cache=self.cache)
+            if errors:
+                raise RuntimeError("unable to read result partitions: " + "; ".join(errors.values()))
+            chunks = [frames[p["id"]] for p in parts if not frames[p["id"]].empty]
+            df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+        # lo stato di confronto riguarda solo ciò che è stato caricato: i tornei fuori
+        # dal filtro non risultano "cancellati" al prossimo commit
+        self._saved = {}
+        self._remember(df)
+        return df
+
+    def _remember(self, df: pd.DataFrame) -> None:
+        if df.empty or not set(RESULT_KEYS) <= set(df.columns):
+            return
+        hashes = _row_hashes(df)
+        for key, idx in _groups(df).items():
+            self._saved[key] = Counter(hashes.loc[idx].tolist())
+
+    # -------------------- scrittura --------------------
+    def _entry(
+        self, key: Tuple[str, str, str], kind: str, df: pd.DataFrame, supersedes: List[str]
+    ) -> Tuple[Dict[str, Any], bytes]:
+        data = df.to_csv(index=False).encode("utf-8") if len(df) else b""
+        seq = len(self.read_index()["partitions"])
+        digest = hashlib.sha1(
+            "|".join([kind, str(seq), *key, *supersedes]).encode("utf-8") + data
+        ).hexdigest()[:12]
+        season, tournament, t_type = key
+        path = f"{self.root}/{_slug(season)}/{_slug(tournament)}_{_slug(t_type)}/{digest}.csv" if len(df) else ""
+        entry = {
+            "id": digest, "path": path, "season": season, "tournament": tournament, "tournament_type": t_type,
+            "kind": kind, "rows": int(len(df)), "supersedes": supersedes,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        return entry, data
+
+    def _active_by_key(self) -> Dict[Tuple[str, str, str], List[str]]:
+        by_key: Dict[Tuple[str, str, str], List[str]] = {}
+        for p in self.active_partitions():
+            by_key.setdefault((str(p["season"]), str(p["tournament"]), str(p["tournament_type"])), []).append(p["id"])
+        return by_key
+
+    def plan(self, df: pd.DataFrame) -> List[Tuple[Tuple[str, str, str], str, pd.DataFrame, Counter]]:
+        """
+        Cosa scrivere perché lo stato salvato diventi `df`, solo per i tornei toccati:
+        lista di (chiave torneo, "append" | "full", righe da scrivere, hash righe del torneo).
+        """
+        missing = set(RESULT_KEYS) - set(df.columns)
+        if missing:
+            raise ValueError(f"results must contain: {sorted(missing)}")
+        df = df.reset_index(drop=True)
+        by_key = self._active_by_key()
+        hashes = _row_hashes(df)
+        groups = _groups(df)
+
+        unseen = [k for k in groups if k not in self._saved and k in by_key]
+        if unseen:
+            # tornei salvati ma non caricati (filtro stagioni): li leggo per confrontare
+            self.load_keys(unseen)
+
+        out: List[Tuple[Tuple[str, str, str], str, pd.DataFrame, Counter]] = []
+        for key, idx in groups.items():
+            row_h = hashes.loc[idx].tolist()
+            now = Counter(row_h)
+            saved = self._saved.get(key, Counter())
+            if now == saved:
+                continue
+            if not saved - now:
+                # solo righe aggiunte: partizione append con le sole righe nuove
+                keep = now - saved
+                take = []
+                for i, h in zip(idx, row_h):
+                    if keep[h] > 0:
+                        take.append(i)
+                        keep[h] -= 1
+                out.append((key, "append", df.loc[take], now))
+            else:
+                out.append((key, "full", df.loc[idx], now))
+        for key in set(self._saved) - set(groups):
+            if key in by_key:
+                out.append((key, "full", df.iloc[0:0], Counter()))
+        return out
+
+    def load_keys(self, keys: Iterable[Tuple[str, str, str]]) -> None:
+        """Legge lo stato salvato di alcuni tornei (senza restituirlo) per il confronto in plan()."""
+        keys = set(keys)
+        parts = [p for p in self.active_partitions()
+                 if (str(p["season"]), str(p["tournament"]), str(p["tournament_type"])) in keys]
+        frames, errors = preload(self.store, {p["id"]: (p["path"], _parse_csv) for p in parts}, cache=self.cache)
+        if errors:
+            raise RuntimeError("unable to read result partitions: " + "; ".join(errors.values()))
+        chunks = [f for f in frames.values() if not f.empty]
+        if chunks:
+            self._remember(pd.concat(chunks, ignore_index=True))
+
+    def commit(self, df: pd.DataFrame, message: str = "Append results partition") -> bytes:
+        """
+        Scrive le partizioni necessarie e ritorna i bytes del nuovo indice, da scrivere
+        per ultimo (es. tramite la coda write-behind). Ogni partizione scritta aggiorna
+        subito lo stato salvato: se una scrittura fallisce, richiamare commit() riparte
+        da lì senza duplicare nulla.
+        L'indice si rilegge qui (non quello letto al load): nel frattempo altre sessioni
+        o processi possono averlo aggiornato, e le loro voci vanno conservate.
+        """
+        invalidate = getattr(self.store, "invalidate", None)
+        if invalidate is not None:
+            invalidate(self.index_path)   # niente copia in cache: serve l'indice corrente
+        index = self.read_index(refresh=True)
+        if not index["partitions"] and self.legacy_path:
+            # migrazione da results.csv: le stagioni non caricate vengono riportate così come sono
+            legacy = self._load_legacy()
+            if set(RESULT_KEYS) <= set(legacy.columns):
+                keys = set(self._saved) | {_key_of(k) for k in df[RESULT_KEYS].itertuples(index=False, name=None)}
+                lkeys = [_key_of(k) for k in legacy[RESULT_KEYS].itertuples(index=False, name=None)]
+                rest = legacy[[k not in keys for k in lkeys]]
+                if not rest.empty:
+                    df = pd.concat([df, rest], ignore_index=True)
+            self._saved = {}
+            self.legacy_path = None
+
+        by_key = self._active_by_key()
+        changes = self.plan(df)
+        for key, kind, rows, hashes in changes:
+            entry, data = self._entry(key, kind, rows, by_key.get(key, []) if kind == "full" else [])
+            if entry["path"]:
+                self.store.write_bytes(entry["path"], data, f"{message}: {entry['path']}")
+            index["partitions"].append(entry)
+            if hashes:
+                self._saved[key] = hashes
+            else:
+                self._saved.pop(key, None)
+        if changes:
+            index["updated_at"] = datetime.now().isoformat(timespec="seconds")
+        return json.dumps(index, ensure_ascii=False, indent=1).encode("utf-8")
+
+    def save(self, df: pd.DataFrame, message: str = "Append results partition") -> None:
+        """commit() + scrittura sincrona dell'indice."""
+        self.store.write_bytes(self.index_path, self.commit(df, message), f"{message}: index")
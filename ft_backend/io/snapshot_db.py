@@ -0,0 +1,215 @@
+"""
+Database analitico embedded (SQLite) sopra gli snapshot pubblicati.
+
+Ogni CSV di data/public/snapshots/<snapshot_id>/ diventa una tabella omonima
+(standings, player_points, ...) con in più la colonna snapshot_id; la tabella
+_snapshots registra gli snapshot già caricati, quindi sync() legge solo quelli nuovi.
+Indici: (date, team_id) e (id_player, date) dove le colonne esistono, più snapshot_id.
+
+Uso:
+    db = SnapshotDB("data/public/analytics.sqlite")
+    db.sync("data/public/snapshots")
+    db.query("SELECT snapshot_id, MAX(total_points) FROM standings GROUP BY 1")
+
+CLI: python -m ft_backend.io.snapshot_db --snapshots data/public/snapshots --db data/public/analytics.sqlite
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import pandas as pd
+
+SNAPSHOTS_TABLE = "_snapshots"
+# colonne sempre TEXT: id con zeri iniziali, date ISO
+TEXT_COLUMNS = {"snapshot_id", "date", "id_player", "team_id", "team_name", "player", "full_name"}
+INDEXES = [("date", "team_id"), ("id_player", "date")]
+
+_NAME_RE = re.compile(r"[^0-9a-zA-Z_]")
+
+
+def _ident(name: str) -> str:
+    """Nome tabella/colonna sicuro per SQL (solo [0-9a-zA-Z_], quotato)."""
+    clean = _NAME_RE.sub("_", str(name).strip().lower()) or "_"
+    return f'"{clean}"'
+
+
+def _affinity(col: str, s: pd.Series) -> str:
+    if col in TEXT_COLUMNS or col.endswith("_id"):
+        return "TEXT"
+    vals = s.dropna().astype(str)
+    if vals.empty or pd.to_numeric(vals, errors="coerce").isna().any():
+        return "TEXT"
+    return "INTEGER" if vals.str.fullmatch(r"-?\d+").all() else "REAL"
+
+
+class SnapshotDB:
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {SNAPSHOTS_TABLE} ("
+            "snapshot_id TEXT PRIMARY KEY, loaded_at TEXT, manifest TEXT, tables TEXT)"
+        )
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    # -------------------- schema --------------------
+    def _columns(self, table: str) -> List[str]:
+        return [r[1] for r in self.conn.execute(f"PRAGMA table_info({_ident(table)})")]
+
+    def _ensure_table(self, table: str, df: pd.DataFrame) -> None:
+        """Crea la tabella o aggiunge le colonne nuove (schema che cresce tra snapshot)."""
+        existing = self._columns(table)
+        if not existing:
+            cols = ", ".join(f"{_ident(c)} {_affinity(c, df[c])}" for c in df.columns)
+            self.conn.execute(f"CREATE TABLE {_ident(table)} ({cols})")
+            existing = list(df.columns)
+        else:
+            for c in df.columns:
+                if c not in existing:
+                    self.conn.execute(f"ALTER TABLE {_ident(table)} ADD COLUMN {_ident(c)} {_affinity(c, df[c])}")
+        cols = set(existing) | set(df.columns)
+        self.conn.execute(f"CREATE INDEX IF NOT EXISTS {_ident(f'ix_{table}_snapshot')} ON {_ident(table)} (snapshot_id)")
+        for idx in INDEXES:
+            if set(idx) <= cols:
+                name = _ident(f"ix_{table}_{'_'.join(idx)}")
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {_ident(table)} ({', '.join(_ident(c) for c in idx)})")
+
+    # -------------------- caricamento --------------------
+    def snapshot_ids(self) -> List[str]:
+        return [r[0] for r in self.conn.execute(f"SELECT snapshot_id FROM {SNAPSHOTS_TABLE} ORDER BY snapshot_id")]
+
+    def tables(self) -> List[str]:
+        rows = self.conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE '\\_%' ESCAPE '\\'")
+        return sorted(r[0] for r in rows)
+
+    def ingest_frames(self, snapshot_id: str, frames: Dict[str, pd.DataFrame], manifest: Optional[Dict[str, Any]] = None) -> int:
+        """Carica (o ricarica) uno snapshot in un'unica transazione; ritorna le righe inserite."""
+        snapshot_id = str(snapshot_id)
+        total = 0
+        with self.conn:
+            for table, df in frames.items():
+                table = _NAME_RE.sub("_", table.strip().lower())
+                df = df.copy()
+                df.columns = [_NAME_RE.sub("_", str(c).strip().lower()) for c in df.columns]
+                df.insert(0, "snapshot_id", snapshot_id)
+                self._ensure_table(table, df)
+                self.conn.execute(f"DELETE FROM {_ident(table)} WHERE snapshot_id = ?", (snapshot_id,))
+                cols = ", ".join(_ident(c) for c in df.columns)
+                marks = ", ".join("?" for _ in df.columns)
+                rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+                self.conn.executemany(f"INSERT INTO {_ident(table)} ({cols}) VALUES ({marks})", rows)
+                total += int(len(df))
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO {SNAPSHOTS_TABLE} VALUES (?, ?, ?, ?)",
+                (snapshot_id, datetime.now().isoformat(), json.dumps(manifest or {}, default=str), json.dumps(sorted(frames))),
+            )
+        return total
+
+    def ingest_snapshot(self, snapshot_dir: Union[str, Path], snapshot_id: Optional[str] = None) -> int:
+        """Legge i CSV di una directory snapshot (tutti come testo: la tipizzazione la fa SQLite)."""
+        snapshot_dir = Path(snapshot_dir)
+        snapshot_id = snapshot_id or snapshot_dir.name
+        frames = {}
+        for p in sorted(snapshot_dir.glob("*.csv")):
+            try:
+                frames[p.stem] = pd.read_csv(p, dtype=str, keep_default_na=False, na_values=[""], encoding="utf-8")
+            except (pd.errors.EmptyDataError, UnicodeDecodeError, pd.errors.ParserError):
+                continue
+        manifest = {}
+        mpath = snapshot_dir / "manifest.json"
+        if mpath.exists():
+            try:
+                with open(mpath, "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                manifest = {}
+        return self.ingest_frames(snapshot_id, frames, manifest)
+
+    def sync(self, snapshots_dir: Union[str, Path]) -> List[str]:
+        """
+        Carica gli snapshot non ancora presenti nel DB (incrementale); ritorna gli id caricati.
+        Include quelli già compattati nello storico (publish.retention).
+        """
+        from ..publish.retention import load_history, read_index
+
+        snapshots_dir = Path(snapshots_dir)
+        if not snapshots_dir.exists():
+            return []
+        done = set(self.snapshot_ids())
+        loaded = []
+        for d in sorted(p for p in snapshots_dir.iterdir() if p.is_dir()):
+            if d.name in done or not any(d.glob("*.csv")):
+                continue
+            self.ingest_snapshot(d)
+            loaded.append(d.name)
+        for sid, e in sorted(read_index(snapshots_dir)["snapshots"].items()):
+            if e.get("location") != "history" or sid in done or sid in loaded:
+                continue
+            frames = {t: load_history(snapshots_dir, t, [sid]).drop(columns=["snapshot_id"]) for t in e.get("tables", {})}
+            self.ingest_frames(sid, frames, e.get("manifest"))
+            loaded.append(sid)
+        return loaded
+
+    # -------------------- query --------------------
+    def query(self, sql: str, params: Sequence[Any] = ()) -> pd.DataFrame:
+        return pd.read_sql_query(sql, self.conn, params=list(params))
+
+    def rank_history(self, team_id: Optional[str] = None) -> pd.DataFrame:
+        """Rank e punti di ogni squadra per data, secondo l'ultimo snapshot caricato."""
+        ids = self.snapshot_ids()
+        if not ids or "standings" not in self.tables():
+            return pd.DataFrame(columns=["date", "team_id", "team_name", "rank", "total_points"])
+        sql = "SELECT date, team_id, team_name, rank, total_points FROM standings WHERE snapshot_id = ?"
+        params: List[Any] = [ids[-1]]
+        if team_id is not None:
+            sql += " AND team_id = ?"
+            params.append(str(team_id))
+        return self.query(sql + " ORDER BY date, rank", params)
+
+    def point_corrections(self, old_snapshot: str, new_snapshot: str) -> pd.DataFrame:
+        """Punti giocatore cambiati tra due snapshot, per (date, id_player); righe nuove/sparite incluse."""
+        sql = """
+        WITH o AS (SELECT date, id_player, points FROM player_points WHERE snapshot_id = ?),
+             n AS (SELECT date, id_player, points FROM player_points WHERE snapshot_id = ?)
+        SELECT n.date, n.id_player, o.points AS old_points, n.points AS new_points
+          FROM n LEFT JOIN o ON o.date = n.date AND o.id_player = n.id_player
+         WHERE o.points IS NULL OR o.points <> n.points
+        UNION ALL
+        SELECT o.date, o.id_player, o.points, NULL
+          FROM o LEFT JOIN n ON o.date = n.date AND o.id_player = n.id_player
+         WHERE n.id_player IS NULL
+        ORDER BY 1, 2
+        """
+        out = self.query(sql, [str(old_snapshot), str(new_snapshot)])
+        out["delta"] = out["new_points"].fillna(0.0) - out["old_points"].fillna(0.0)
+        return out
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Load published snapshots into the SQLite analytics DB")
+    ap.add_argument("--snapshots", default="data/public/snapshots")
+    ap.add_argument("--db", default="data/public/analytics.sqlite")
+    ap.add_argument("--sql", default=None, help="query to run after the sync")
+    args = ap.parse_args(argv)
+
+    db = SnapshotDB(args.db)
+    loaded = db.sync(args.snapshots)
+    print(f"loaded {len(loaded)} snapshot(s): {', '.join(loaded) or '-'}")
+    if args.sql:
+        print(db.query(args.sql).to_string(index=False))
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Backend di storage intercambiabili con la stessa interfaccia di GitHubStore.
+
+Un backend espone:
+    read_bytes(path)                  -> (bytes | None, sha | None)
+    write_bytes(path, bytes, message) -> None
+e, tramite StoreHelpers, read_csv / write_csv / read_json / write_json.
+
+- LocalStore:  directory locale (dev, mirror di produzione)
+- MemoryStore: dict in memoria (test, benchmark)
+- CachedStore: read-through sopra qualsiasi backend, con mirror locale opzionale
+
+Lo sha di LocalStore/MemoryStore è lo sha1 "blob" di git, lo stesso che restituisce
+GitHub per lo stesso contenuto: i backend sono confrontabili tra loro.
+"""
+from __future__ import annotations
+
+import copy
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Protocol, Tuple, Union
+
+import pandas as pd
+
+from ..utils.fs import atomic_write_bytes
+
+
+def git_blob_sha(content: bytes) -> str:
+    """sha1 di git per un blob: sha1(b"blob <len>\\0" + content)."""
+    h = hashlib.sha1(f"blob {len(content)}\0".encode("ascii"))
+    h.update(content)
+    return h.hexdigest()
+
+
+class Store(Protocol):
+    def read_bytes(self, path: str) -> Tuple[Optional[bytes], Optional[str]]: ...
+
+    def write_bytes(self, path: str, content_bytes: bytes, message: str) -> None: ...
+
+
+class StoreHelpers:
+    """Helper CSV/JSON comuni a tutti i backend (richiedono read_bytes/write_bytes)."""
+
+    def read_csv(self, path: str) -> pd.DataFrame:
+        b, _ = self.read_bytes(path)  # type: ignore[attr-defined]
+        if b is None:
+            return pd.DataFrame()
+        return pd.read_csv(io.StringIO(b.decode("utf-8")))
+
+    def write_csv(self, path: str, df: pd.DataFrame, message: str) -> None:
+        self.write_bytes(path, df.to_csv(index=False).encode("utf-8"), message)  # type: ignore[attr-defined]
+
+    def read_json(self, path: str, default: Any) -> Any:
+        b, _ = self.read_bytes(path)  # type: ignore[attr-defined]
+        if b is None:
+            return default
+        return json.loads(b.decode("utf-8"))
+
+    def write_json(self, path: str, obj: Any, message: str) -> None:
+        self.write_bytes(path, json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8"), message)  # type: ignore[attr-defined]
+
+
+class LocalStore(StoreHelpers):
+    """File sotto una directory radice; path relativi come nel repo GitHub."""
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+
+    def _path(self, path: str) -> Path:
+        p = (self.root / path).resolve()
+        if self.root.resolve() not in p.parents and p != self.root.resolve():
+            raise ValueError(f"path outside store root: {path}")
+        return p
+
+    def read_bytes(self, path: str) -> Tuple[Optional[bytes], Optional[str]]:
+        p = self._path(path)
+        if not p.is_file():
+            return None, None
+        b = p.read_bytes()
+        return b, git_blob_sha(b)
+
+    def write_bytes(self, path: str, content_bytes: bytes, message: str = "") -> None:
+        atomic_write_bytes(self._path(path), content_bytes)
+
+    def mtime(self, path: str) -> Optional[float]:
+        p = self._path(path)
+        return p.stat().st_mtime if p.is_file() else None
+
+
+class MemoryStore(StoreHelpers):
+    """Dict path -> bytes; `commits` conserva i messaggi di scrittura."""
+
+    def __init__(self, files: Optional[Dict[str, bytes]] = None):
+        self.files: Dict[str, bytes] = dict(files or {})
+        self.commits: list = []
+
+    def read_bytes(self, path: str) -> Tuple[Optional[bytes], Optional[str]]:
+        b = self.files.get(path)
+        if b is None:
+            return None, None
+        return b, git_blob_sha(b)
+
+    def write_bytes(self, path: str, content_bytes: bytes, message: str = "") -> None:
+        self.files[path] = bytes(content_bytes)
+        self.commits.append((path, message))
+
+
+class CachedStore(StoreHelpers):
+    """
+    Read-through cache sopra un backend qualsiasi.
+
+    Lettura: memoria -> mirror locale (se configurato) -> backend; quello che arriva dal
+    backend popola mirror e memoria. `ttl` (secondi) limita l'età delle copie in memoria
+    e nel mirror; None = valide finché non si chiama invalidate().
+    Scrittura: write-through sul backend, poi aggiorna memoria e mirror.
+    """
+
+    def __init__(self, backend: Store, mirror: Optional[LocalStore] = None, ttl: Optional[float] = None):
+        self.backend = backend
+        self.mirror = mirror
+        self.ttl = ttl
+        self._mem: Dict[str, Tuple[float, Optional[bytes], Optional[str]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self, stamp: Optional[float]) -> bool:
+        return bool(stamp) and (self.ttl is None or time.time() - stamp < self.ttl)
+
+    def read_bytes(self, path: str) -> Tuple[Optional[bytes], Optional[str]]:
+        with self._lock:
+            hit = self._mem.get(path)
+        if hit is not None and self._fresh(hit[0]):
+            self.hits += 1
+            return hit[1], hit[2]
+
+        if self.mirror is not None and self._fresh(self.mirror.mtime(path)):
+            b, sha = self.mirror.read_bytes(path)
+            if b is not None:
+                self.hits += 1
+                self._remember(path, b, sha)
+                return b, sha
+
+        self.misses += 1
+        b, sha = self.backend.read_bytes(path)
+        if b is not None and self.mirror is not None:
+            self.mirror.write_bytes(path, b)
+        self._remember(path, b, sha)
+        return b, sha
+
+    def write_bytes(self, path: str, content_bytes: bytes, message: str = "") -> None:
+        self.backend.write_bytes(path, content_bytes, message)
+        if self.mirror is not None:
+            self.mirror.write_bytes(path, content_bytes)
+        # sha ricalcolato come git: coincide con quello del backend GitHub
+        self._remember(path, content_bytes, git_blob_sha(content_bytes))
+
+    def _remember(self, path: str, b: Optional[bytes], sha: Optional[str]) -> None:
+        with self._lock:
+            self._mem[path] = (time.time(), b, sha)
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        """Scarta la copia in memoria (e nel mirror) di un path, o di tutto."""
+        with self._lock:
+            if path is None:
+                paths = list(self._mem)
+                self._mem.clear()
+            else:
+                paths = [path]
+                self._mem.pop(path, None)
+        if self.mirror is not None:
+            for p in paths:
+                mp = self.mirror._path(p)
+                if mp.is_file():
+                    os.utime(mp, (0, 0))  # mtime 0 -> non più fresco, riletto dal backend
+
+
+class ParsedCache:
+    """
+    Oggetti già parsati (DataFrame, liste...) per (path, sha), condivisi a livello di
+    processo: stesso blob -> nessun nuovo parse. get() restituisce sempre una copia,
+    così le sessioni possono modificare il proprio stato senza toccare la cache.
+    """
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, content: Optional[bytes], sha: Optional[str], parse: Callable[[Optional[bytes]], Any]) -> Any:
+        if sha is None:
+            return parse(content)
+        key = (path, sha)
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return _copy(self._items[key])
+        obj = parse(content)
+        with self._lock:
+            self._items[key] = obj
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+        return _copy(obj)
+
+
+def _copy(obj: Any) -> Any:
+    return obj.copy() if isinstance(obj, pd.DataFrame) else copy.deepcopy(obj)
+
+
+def preload(
+    store: Store,
+    specs: Dict[str, Union[Tuple[str, Callable[[Optional[bytes]], Any]], Callable[[], Any]]],
+    cache: Optional[ParsedCache] = None,
+    max_workers: int = 8,
+) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Legge in parallelo più file: specs = {chiave: (path, parse(content | None))}.
+    La latenza totale è quella della lettura più lenta, non la somma. Con `cache`
+    il parse è riusato se lo sha del blob non è cambiato.
+    Una spec può anche essere un loader senza argomenti (es. letture composte da più
+    file), eseguito nello stesso pool.
+    Ritorna (valori per chiave, errori per chiave); per una chiave in errore il
+    valore è parse(None), cioè il default del loader (None per i loader).
+    """
+    cache = cache or ParsedCache()
+
+    def _one(item: Tuple[str, Any]) -> Tuple[str, Any, Optional[str]]:
+        key, spec = item
+        if callable(spec):
+            try:
+                return key, spec(), None
+            except Exception as e:
+                return key, None, f"{key}: {e}"
+        path, parse = spec
+        try:
+            content, sha = store.read_bytes(path)
+        except Exception as e:  # errore di rete/HTTP: default, segnalato al chiamante
+            return key, parse(None), f"{path}: {e}"
+        return key, cache.get(path, content, sha, parse), None
+
+    values: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    items: List[Tuple[str, Any]] = list(specs.items())
+    if not items:
+        return values, errors
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        for key, value, err in pool.map(_one, items):
+            values[key] = value
+            if err:
+                errors[key] = err
+    return values, errors
+
+
+def open_store(spec: str, github_cfg: Optional[Any] = None, mirror: Optional[str] = None, ttl: Optional[float] = None):
+    """
+    Backend da una stringa di configurazione (es. variabile d'ambiente FT_STORE):
+      "github"        -> GitHubStore(github_cfg)
+      "local:<dir>"   -> LocalStore(<dir>)
+      "memory"        -> MemoryStore()
+    Con `mirror` (directory) il backend è avvolto in CachedStore con mirror locale;
+    con solo `ttl` in CachedStore solo in memoria.
+    """
+    spec = (spec or "github").strip()
+    if spec == "github":
+        if github_cfg is None:
+            raise ValueError("github store requires a GitHubConfig")
+        from .github_store import GitHubStore
+        backend: Store = GitHubStore(github_cfg)
+    elif spec.startswith("local:"):
+        backend = LocalStore(spec.split(":", 1)[1] or ".")
+    elif spec == "memory":
+        backend = MemoryStore()
+    else:
+        raise ValueError(f"unknown store spec: {spec!r} (use github, local:<dir> or memory)")
+    if mirror or ttl is not None:
+        return CachedStore(backend, LocalStore(mirror) if mirror else None, ttl)
+    return backend
@@ -0,0 +1,166 @@
+"""
+Coda write-behind per le scritture sullo store (GitHub di default).
+
+submit() ritorna subito: il contenuto (bytes o funzione che li produce) viene scritto
+da un thread in background dopo `delay` secondi dall'ultimo submit sullo stesso path.
+Più submit ravvicinati dello stesso path diventano un solo commit (vince l'ultimo);
+un contenuto identico all'ultimo scritto non produce commit. Gli errori vengono
+ritentati con backoff esponenziale fino a `max_retries`.
+Con `key` la coalescenza è per chiave invece che per path: scritture dello stesso
+path da sessioni diverse (es. l'indice dei risultati) restano tutte in coda.
+
+status() espone per chiave (di default il path): pending | writing | committed | failed,
+con seq e tentativi.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Union
+
+from .stores import Store, git_blob_sha
+
+Payload = Union[bytes, Callable[[], bytes]]
+
+
+@dataclass
+class WriteStatus:
+    path: str
+    state: str = "pending"            # pending | writing | committed | failed
+    seq: int = 0                      # ultimo submit ricevuto
+    committed_seq: int = 0            # ultimo submit scritto
+    coalesced: int = 0                # submit assorbiti da uno successivo
+    attempts: int = 0
+    error: Optional[str] = None
+    updated_at: str = ""
+    committed_at: Optional[str] = None
+    sha: Optional[str] = None
+
+
+@dataclass
+class _Pending:
+    path: str
+    seq: int
+    payload: Payload
+    message: str
+    due: float
+    attempts: int = 0
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+
+class WriteBehindQueue:
+    def __init__(self, store: Store, delay: float = 1.5, max_retries: int = 4, backoff: float = 2.0):
+        self.store = store
+        self.delay = delay
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._cond = threading.Condition()
+        self._pending: Dict[str, _Pending] = {}
+        self._status: Dict[str, WriteStatus] = {}
+        self._seq = 0
+        self._busy = 0
+        self._thread = threading.Thread(target=self._run, name="ft-write-behind", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now().isoformat(timespec="seconds")
+
+    # -------------------- API --------------------
+    def submit(self, path: str, payload: Payload, message: str, key: Optional[str] = None) -> int:
+        """Accoda una scrittura e ritorna subito il numero di sequenza assegnato."""
+        key = key or path
+        with self._cond:
+            self._seq += 1
+            st = self._status.setdefault(key, WriteStatus(path=path))
+            if key in self._pending:
+                st.coalesced += 1
+            self._pending[key] = _Pending(path, self._seq, payload, message, time.monotonic() + self.delay)
+            st.seq = self._seq
+            if st.state != "writing":
+                st.state = "pending"
+            st.error = None
+            st.updated_at = self._now()
+            self._cond.notify_all()
+            return self._seq
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        with self._cond:
+            return {p: asdict(s) for p, s in self._status.items()}
+
+    def is_committed(self, key: str, seq: int) -> bool:
+        with self._cond:
+            st = self._status.get(key)
+            return st is not None and st.committed_seq >= seq
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Scrive subito tutto ciò che è in coda e attende; False se scade il timeout."""
+        end = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            for p in self._pending.values():
+                p.due = min(p.due, time.monotonic())
+            self._cond.notify_all()
+            while self._pending or self._busy:
+                left = None if end is None else end - time.monotonic()
+                if left is not None and left <= 0:
+                    return False
+                self._cond.wait(left)
+        return True
+
+    # -------------------- worker --------------------
+    def _next_due(self) -> Optional[str]:
+        now = time.monotonic()
+        due = [(p.due, key) for key, p in self._pending.items() if p.due <= now]
+        return min(due)[1] if due else None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                key = self._next_due()
+                while key is None:
+                    wait = min((p.due for p in self._pending.values()), default=None)
+                    self._cond.wait(None if wait is None else max(0.0, wait - time.monotonic()))
+                    key = self._next_due()
+                job = self._pending.pop(key)
+                st = self._status[key]
+                st.state = "writing"
+                st.attempts = job.attempts + 1
+                st.updated_at = self._now()
+                self._busy += 1
+            try:
+                self._write(key, job, st)
+            finally:
+                with self._cond:
+                    self._busy -= 1
+                    self._cond.notify_all()
+
+    def _write(self, key: str, job: _Pending, st: WriteStatus) -> None:
+        try:
+            data = job.payload() if callable(job.payload) else job.payload
+            sha = git_blob_sha(data)
+            if sha != st.sha:
+                self.store.write_bytes(job.path, data, job.message)
+        except Exception as e:
+            with self._cond:
+                job.attempts += 1
+                st.error = f"{type(e).__name__}: {e}"
+                st.updated_at = self._now()
+                if key in self._pending:
+                    # nel frattempo è arrivato un contenuto più recente: questo è superato
+                    st.state = "pending"
+                elif job.attempts <= self.max_retries:
+                    job.due = time.monotonic() + self.backoff ** job.attempts
+                    self._pending[key] = job
+                    st.state = "pending"
+                else:
+                    st.state = "failed"
+            return
+        with self._cond:
+            st.sha = sha
+            st.committed_seq = max(st.committed_seq, job.seq)
+            st.committed_at = self._now()
+            st.updated_at = st.committed_at
+            st.error = None
+            st.state = "pending" if key in self._pending else "committed"
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import json
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..utils.fs import atomic_write_json
+
+ACTIVE_STATUSES = ("queued", "running")
+FINAL_FILE_STATUSES = ("ok", "error")
+
+
+class JobConflictError(RuntimeError):
+    """Esiste già un job in conflitto (stesso tipo o tipo incompatibile) in coda o in esecuzione."""
+
+
+@dataclass
+class JobRecord:
+    id: str
+    kind: str
+    status: str = "queued"          # queued | running | done | failed | interrupted
+    created_at: str = ""
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    progress: float = 0.0           # 0..1
+    message: str = ""
+    files: Dict[str, str] = field(default_factory=dict)   # path -> pending/uploading/ok/error
+    log: List[str] = field(default_factory=list)
+    result: Any = None
+    error: Optional[str] = None
+
+
+class JobContext:
+    """Passato come primo argomento alla funzione del job per riportare avanzamento e stato file."""
+
+    def __init__(self, runner: "JobRunner", job_id: str):
+        self._runner = runner
+        self.job_id = job_id
+
+    def progress(self, fraction: float, message: str = "") -> None:
+        def _upd(rec: JobRecord) -> None:
+            rec.progress = max(0.0, min(1.0, float(fraction)))
+            if message:
+                rec.message = message
+        self._runner._update(self.job_id, _upd)
+
+    def file_status(self, path: str, status: str) -> None:
+        self._runner._update(self.job_id, lambda rec: rec.files.__setitem__(path, status))
+
+    def file_counts(self) -> Tuple[int, int]:
+        """(file conclusi ok/error, file noti): i pending annunciati all'inizio contano nel totale."""
+        with self._runner._lock:
+            files = self._runner._records[self.job_id].files
+            done = sum(1 for v in files.values() if v in FINAL_FILE_STATUSES)
+            return done, len(files)
+
+    def log(self, line: str) -> None:
+        self._runner._update(self.job_id, lambda rec: rec.log.append(str(line)))
+
+
+class JobRunner:
+    """
+    Esegue stage della pipeline fuori dal thread della UI (ThreadPoolExecutor) e
+    mantiene una tabella job su disco: un <jobs_dir>/<job_id>.json per job, scritto
+    in modo atomico a ogni aggiornamento, così la pagina admin può fare polling
+    leggendo un file piccolo anche dopo un refresh del browser.
+
+    Convenzione sul risultato: se la funzione ritorna un dict con "ok": False il job
+    finisce in stato "failed"; un'eccezione produce "failed" con traceback in error.
+    """
+
+    def __init__(self, jobs_dir: str, max_workers: int = 2):
+        self.jobs_dir = Path(jobs_dir)
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ft-job")
+        self._lock = threading.Lock()
+        self._records: Dict[str, JobRecord] = {}
+        self._recover()
+
+    # -------------------- persistenza --------------------
+    def _path(self, job_id: str) -> Path:
+        return self.jobs_dir / f"{job_id}.json"
+
+    def _save(self, rec: JobRecord) -> None:
+        atomic_write_json(self._path(rec.id), asdict(rec))
+
+    def _load(self, path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def _recover(self) -> None:
+        """Job rimasti queued/running da un processo precedente non possono più finire: li marco interrupted."""
+        for p in self.jobs_dir.glob("*.json"):
+            data = self._load(p)
+            if data and data.get("status") in ACTIVE_STATUSES:
+                data["status"] = "interrupted"
+                data["finished_at"] = datetime.now().isoformat()
+                atomic_write_json(p, data)
+
+    def _update(self, job_id: str, fn: Callable[[JobRecord], None]) -> None:
+        with self._lock:
+            rec = self._records[job_id]
+            fn(rec)
+            self._save(rec)
+
+    # -------------------- API --------------------
+    def active(self, kind: str) -> Optional[Dict[str, Any]]:
+        """Job dello stesso tipo ancora queued/running (in questo processo), se presente."""
+        with self._lock:
+            for rec in self._records.values():
+                if rec.kind == kind and rec.status in ACTIVE_STATUSES:
+                    return asdict(rec)
+        return None
+
+    def submit(
+        self,
+        kind: str,
+        fn: Callable[..., Any],
+        *args,
+        exclusive: bool = False,
+        conflicts: Iterable[str] = (),
+        **kwargs,
+    ) -> Dict[str, Any]:
+        """
+        fn(ctx, *args, **kwargs) viene eseguita in background; ritorna subito il record del job.
+        exclusive: nessun altro job dello stesso tipo attivo; conflicts: tipi che non
+        possono girare insieme a questo (es. compute riscrive i file che publish copia).
+        """
+        blocking = ({kind} if exclusive else set()) | set(conflicts)
+        with self._lock:
+            for rec in self._records.values():
+                if rec.kind in blocking and rec.status in ACTIVE_STATUSES:
+                    raise JobConflictError(f"A '{rec.kind}' job is already {rec.status}: {rec.id}")
+            job_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{kind}_{uuid.uuid4().hex[:6]}"
+            rec = JobRecord(id=job_id, kind=kind, created_at=datetime.now().isoformat())
+            self._records[job_id] = rec
+            self._save(rec)
+        self._pool.submit(self._run, job_id, fn, args, kwargs)
+        return asdict(rec)
+
+    def _run(self, job_id: str, fn: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        def _start(rec: JobRecord) -> None:
+            rec.status = "running"
+            rec.started_at = datetime.now().isoformat()
+        self._update(job_id, _start)
+
+        try:
+            result = fn(JobContext(self, job_id), *args, **kwargs)
+        except Exception as e:
+            tb = traceback.format_exc()
+
+            def _fail(rec: JobRecord) -> None:
+                rec.status = "failed"
+                rec.error = f"{type(e).__name__}: {e}\n{tb}"
+                rec.finished_at = datetime.now().isoformat()
+            self._update(job_id, _fail)
+            return
+
+        def _done(rec: JobRecord) -> None:
+            rec.result = result
+            failed = isinstance(result, dict) and result.get("ok") is False
+            rec.status = "failed" if failed else "done"
+            if not failed:
+                rec.progress = 1.0
+            if isinstance(result, dict) and result.get("message"):
+                rec.message = str(result["message"])
+            rec.finished_at = datetime.now().isoformat()
+        self._update(job_id, _done)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            rec = self._records.get(job_id)
+            if rec is not None:
+                return asdict(rec)
+        return self._load(self._path(job_id))
+
+    def list_jobs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Ultimi job (più recenti prima): l'id inizia col timestamp, quindi basta ordinare i nomi file."""
+        out = []
+        for p in sorted(self.jobs_dir.glob("*.json"), reverse=True)[:limit]:
+            rec = self.get(p.stem)
+            if rec is not None:
+                out.append(rec)
+        return out
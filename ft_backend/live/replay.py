@@ -0,0 +1,145 @@
+"""
+Generatore/replay locale di eventi live per test.
+
+    # torneo sintetico (deterministico per seed) scritto su un file JSONL seguito dal service
+    python -m ft_backend.live.replay --players data/players_0.csv --out data/live/events.jsonl --interval 0.01
+    # replay di un file registrato verso il socket del service
+    python -m ft_backend.live.replay --from data/live/events.jsonl --to 127.0.0.1:8765
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import socket
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+ROUNDS = ["R128", "R64", "R32", "R16", "QF", "SF", "Final"]
+
+
+def _play_set(rng: random.Random, p_a: float) -> tuple:
+    ga = gb = 0
+    while True:
+        if rng.random() < p_a:
+            ga += 1
+        else:
+            gb += 1
+        if (ga >= 6 or gb >= 6) and abs(ga - gb) >= 2:
+            return ga, gb
+        if ga == 7 or gb == 7:
+            return ga, gb
+
+
+def synthetic_tournament(
+    players: List[str],
+    tournament: str = "Live Open",
+    tournament_type: str = "Slam",
+    seed: int = 0,
+) -> Iterator[Dict[str, Any]]:
+    """Eventi di un tabellone a eliminazione diretta (dimensione = potenza di 2 <= len(players))."""
+    rng = random.Random(seed)
+    size = 1
+    while size * 2 <= min(len(players), 128):
+        size *= 2
+    if size < 2:
+        raise ValueError("need at least 2 players")
+    entrants = rng.sample(players, size)
+    best_of = 5 if tournament_type == "Slam" else 3
+    rounds = ROUNDS[-(size.bit_length() - 1):]
+
+    for rnd in rounds:
+        winners = []
+        for i in range(0, len(entrants), 2):
+            a, b = entrants[i], entrants[i + 1]
+            mid = f"{tournament.replace(' ', '_')}_{rnd}_{i // 2:03d}"
+            yield {"type": "match_started", "match_id": mid, "tournament": tournament,
+                   "tournament_type": tournament_type, "round": rnd, "players": [a, b]}
+            p_a = rng.uniform(0.35, 0.65)
+            sets: List[tuple] = []
+            while max(sum(s[0] > s[1] for s in sets), sum(s[1] > s[0] for s in sets)) < best_of // 2 + 1:
+                for _ in range(rng.randint(0, 4)):
+                    yield {"type": "ace", "match_id": mid, "player": rng.choice([a, b])}
+                if rng.random() < 0.5:
+                    yield {"type": "double_fault", "match_id": mid, "player": rng.choice([a, b])}
+                sets.append(_play_set(rng, p_a))
+                yield {"type": "set_score", "match_id": mid, "sets": [list(s) for s in sets]}
+            a_sets = sum(s[0] > s[1] for s in sets)
+            winner = a if a_sets > len(sets) - a_sets else b
+            yield {"type": "match_finished", "match_id": mid, "winner": winner, "sets": [list(s) for s in sets]}
+            winners.append(winner)
+        entrants = winners
+
+
+def read_events(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def replay(events: Iterator[Dict[str, Any]], out: Optional[str] = None, to: Optional[str] = None,
+           interval: float = 0.0) -> int:
+    """Invia gli eventi su file JSONL (append + flush per riga) o socket TCP, con pausa fissa tra eventi."""
+    n = 0
+    sock = None
+    fh = None
+    if to:
+        host, _, port = to.rpartition(":")
+        sock = socket.create_connection((host or "127.0.0.1", int(port)))
+    if out:
+        Path(out).parent.mkdir(parents=True, exist_ok=True)
+        fh = open(out, "a", encoding="utf-8")
+    try:
+        for ev in events:
+            line = json.dumps(ev, ensure_ascii=False) + "\n"
+            if fh:
+                fh.write(line)
+                fh.flush()
+            if sock:
+                sock.sendall(line.encode("utf-8"))
+            n += 1
+            if interval:
+                time.sleep(interval)
+    finally:
+        if fh:
+            fh.close()
+        if sock:
+            sock.close()
+    return n
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Replay or generate live match events")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--from", dest="src", help="recorded JSONL events to replay")
+    src.add_argument("--players", help="CSV with a Giocatore/player column for a synthetic tournament")
+    ap.add_argument("--tournament", default="Live Open")
+    ap.add_argument("--type", default="Slam", choices=["Slam", "1000"])
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=None, help="append events to this JSONL file")
+    ap.add_argument("--to", default=None, help="host:port of the live service --listen socket")
+    ap.add_argument("--interval", type=float, default=0.0, help="seconds between events")
+    args = ap.parse_args(argv)
+    if not args.out and not args.to:
+        ap.error("one of --out or --to is required")
+
+    if args.src:
+        events = read_events(args.src)
+    else:
+        df = pd.read_csv(args.players, sep=None, engine="python")
+        cols = {c.strip().lower(): c for c in df.columns}
+        name_col = cols.get("giocatore") or cols.get("player") or cols.get("player_name")
+        if name_col is None:
+            ap.error(f"no Giocatore/player column in {args.players}")
+        names = df[name_col].dropna().astype(str).str.strip().tolist()
+        events = synthetic_tournament(names, args.tournament, args.type, args.seed)
+    n = replay(events, out=args.out, to=args.to, interval=args.interval)
+    print(f"sent {n} events")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from ..compute.build_marts import STARTERS_BY_TYPE
+from ..compute.multipliers import build_multiplier_dicts
+from ..compute.scoring import BONUS_FLAGS, MALUS_FLAGS, compute_points_with_multipliers
+
+EVENT_TYPES = {"match_started", "ace", "double_fault", "set_score", "match_finished"}
+
+
+@dataclass
+class MatchState:
+    match_id: str
+    tournament: str
+    tournament_type: str
+    round: str
+    players: Tuple[str, str]
+    aces: Dict[str, int] = field(default_factory=dict)
+    dfs: Dict[str, int] = field(default_factory=dict)
+    sets: List[Tuple[int, int]] = field(default_factory=list)   # game dal punto di vista di players[0]
+    winner: Optional[str] = None
+    extra_flags: Dict[str, Dict[str, int]] = field(default_factory=dict)
+
+
+class LiveScorer:
+    """
+    Stato incrementale del live scoring.
+
+    Ogni (match, giocatore) diventa una riga nel formato classico (come le righe
+    'stats' di normalize_results_upload) e viene valutata con
+    compute_points_with_multipliers: stesse regole del batch. Un evento ricalcola
+    solo le righe del match toccato e aggiorna totali giocatore/squadra per delta.
+
+    Eventi (dict, tipicamente JSON lines):
+      match_started : match_id, tournament, tournament_type (Slam/1000), round, players [a, b]
+      ace / double_fault : match_id, player
+      set_score     : match_id, sets [[g_a, g_b], ...]
+      match_finished: match_id, winner, sets (opz.), flags (opz.) {player: {flag: 1}}
+    """
+
+    def __init__(
+        self,
+        teams: List[Dict[str, Any]],
+        multipliers_df: Optional[pd.DataFrame] = None,
+        rankings: Optional[Dict[str, int]] = None,
+    ):
+        self.teams = teams or []
+        self.bonus_dict, self.malus_dict = build_multiplier_dicts(multipliers_df)
+        self.rankings = {str(k).strip().lower(): int(v) for k, v in (rankings or {}).items()}
+        self.matches: Dict[str, MatchState] = {}
+        self.row_points: Dict[Tuple[str, str], float] = {}
+        self.player_totals: Dict[str, float] = {}
+        self.team_totals: Dict[str, float] = {t.get("name", ""): 0.0 for t in self.teams}
+
+        # giocatore -> [(team, posizione in rosa)]
+        self._player_teams: Dict[str, List[Tuple[str, int]]] = {}
+        for t in self.teams:
+            for pos, p in enumerate(t.get("players", []) or []):
+                self._player_teams.setdefault(p, []).append((t.get("name", ""), pos))
+
+    # -------------------- righe --------------------
+    def _row(self, m: MatchState, player: str) -> Dict[str, Any]:
+        me = 0 if m.players[0] == player else 1
+        opp = m.players[1 - me]
+        finished = m.winner is not None
+        won = finished and m.winner == player
+        lost = finished and not won
+
+        my_sets = [(s[me], s[1 - me]) for s in m.sets]
+        sets_won = [a > b for a, b in my_sets]
+        games_lost = sum(b for _, b in my_sets)
+        slam = m.tournament_type == "Slam"
+
+        round_reached = "Winner" if (won and m.round == "Final") else m.round
+        row: Dict[str, Any] = {
+            "Tournament Type": m.tournament_type,
+            "Round Reached": round_reached,
+            "Giocatore": player,
+            "Matches Won": int(won),
+            "Matches Lost": int(lost),
+            "Aces": m.aces.get(player, 0),
+            "Double Faults": m.dfs.get(player, 0),
+        }
+        flags = {k: 0 for k in list(BONUS_FLAGS) + list(MALUS_FLAGS)}
+        flags["aces_15_plus"] = int(m.aces.get(player, 0) >= 15)
+        flags["df_10_plus"] = int(m.dfs.get(player, 0) >= 10)
+        if won:
+            opp_rank = self.rankings.get(opp.strip().lower())
+            if opp_rank is not None:
+                flags["beat_num1"] = int(opp_rank == 1)
+                flags["beat_top5"] = int(1 < opp_rank <= 5)
+                flags["beat_top10"] = int(5 < opp_rank <= 10)
+            if my_sets:
+                flags["win_straight_sets"] = int(all(sets_won))
+                flags["win_few_games"] = int(games_lost <= 4)
+            if slam and len(sets_won) >= 2 and not sets_won[0] and not sets_won[1]:
+                flags["comeback_0_2_slam"] = 1
+            if not slam and len(sets_won) >= 1 and not sets_won[0]:
+                flags["comeback_0_1_1000"] = 1
+            if slam and len(my_sets) == 5:
+                flags["win_in_fifth_slam"] = 1
+        if lost and slam and len(sets_won) >= 2 and sets_won[0] and sets_won[1]:
+            flags["lost_from_2_0_slam"] = 1
+        flags.update(m.extra_flags.get(player, {}))
+        row.update(flags)
+        return row
+
+    def _is_starter(self, pos: int, t_type: str) -> bool:
+        return pos < STARTERS_BY_TYPE.get(t_type, 0)
+
+    def _rescore(self, m: MatchState) -> Tuple[Set[str], Set[str]]:
+        changed_players: Set[str] = set()
+        changed_teams: Set[str] = set()
+        for p in m.players:
+            pos_adj, neg_adj, _ = compute_points_with_multipliers(self._row(m, p), self.bonus_dict, self.malus_dict)
+            new = pos_adj + neg_adj
+            key = (m.match_id, p)
+            delta = new - self.row_points.get(key, 0.0)
+            self.row_points[key] = new
+            if delta == 0:
+                continue
+            self.player_totals[p] = self.player_totals.get(p, 0.0) + delta
+            changed_players.add(p)
+            for team, pos in self._player_teams.get(p, []):
+                if self._is_starter(pos, m.tournament_type):
+                    self.team_totals[team] = self.team_totals.get(team, 0.0) + delta
+                    changed_teams.add(team)
+        return changed_players, changed_teams
+
+    # -------------------- eventi --------------------
+    def apply(self, ev: Dict[str, Any]) -> Tuple[Set[str], Set[str]]:
+        """Applica un evento; ritorna (giocatori cambiati, squadre cambiate)."""
+        etype = ev.get("type")
+        if etype not in EVENT_TYPES:
+            raise ValueError(f"Unknown event type: {etype!r}")
+        mid = str(ev["match_id"])
+
+        if etype == "match_started":
+            a, b = ev["players"]
+            self.matches[mid] = MatchState(
+                match_id=mid,
+                tournament=str(ev.get("tournament", "")),
+                tournament_type=str(ev.get("tournament_type", "")),
+                round=str(ev.get("round", "")),
+                players=(str(a), str(b)),
+            )
+            return set(), set()
+
+        m = self.matches.get(mid)
+        if m is None:
+            raise ValueError(f"Event for unknown match_id {mid!r} (missing match_started)")
+
+        if etype == "ace":
+            m.aces[ev["player"]] = m.aces.get(ev["player"], 0) + int(ev.get("count", 1))
+        elif etype == "double_fault":
+            m.dfs[ev["player"]] = m.dfs.get(ev["player"], 0) + int(ev.get("count", 1))
+        elif etype == "set_score":
+            m.sets = [tuple(s) for s in ev.get("sets", [])]
+        elif etype == "match_finished":
+            if ev.get("sets"):
+                m.sets = [tuple(s) for s in ev["sets"]]
+            m.winner = str(ev["winner"])
+            m.extra_flags = ev.get("flags", {}) or {}
+        return self._rescore(m)
+
+    def apply_many(self, events: Iterable[Dict[str, Any]]) -> Tuple[Set[str], Set[str]]:
+        players: Set[str] = set()
+        teams: Set[str] = set()
+        for ev in events:
+            p, t = self.apply(ev)
+            players |= p
+            teams |= t
+        return players, teams
+
+    def standings(self) -> List[Dict[str, Any]]:
+        rows = sorted(self.team_totals.items(), key=lambda kv: kv[1], reverse=True)
+        return [{"rank": i + 1, "team": name, "live_points": round(pts, 2)} for i, (name, pts) in enumerate(rows)]
@@ -0,0 +1,218 @@
+"""
+Live scoring asyncio: consuma eventi match (tail di un file JSONL o socket TCP
+locale), aggiorna i fantapunti con LiveScorer e spinge i totali squadra cambiati:
+  - su file JSON (scrittura atomica) letto dalla pagina Live di app_user.py
+  - a chi si iscrive sulla porta --publish (una riga JSON per aggiornamento)
+
+Uso:
+    python -m ft_backend.live.service --teams data/teams.json \\
+        --multipliers data/ranking_multipliers.csv --tail data/live/events.jsonl
+    python -m ft_backend.live.service --teams data/teams.json --listen 127.0.0.1:8765
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from ..io.multipliers import load_multipliers
+from ..utils.fs import atomic_write_json
+from .scorer import LiveScorer
+
+log = logging.getLogger("ft_backend.live")
+
+DEFAULT_OUT = "data/public/live/live_standings.json"
+
+
+class LiveScoringService:
+    def __init__(self, scorer: LiveScorer, out_path: str = DEFAULT_OUT, flush_interval: float = 0.1):
+        self.scorer = scorer
+        self.out_path = Path(out_path)
+        self.flush_interval = flush_interval
+        self.seq = 0
+        self._dirty_players: Set[str] = set()
+        self._dirty_teams: Set[str] = set()
+        self._subscribers: Set[asyncio.StreamWriter] = set()
+        self._changed = asyncio.Event()
+
+    # -------------------- ingest --------------------
+    def handle_event(self, ev: Dict[str, Any]) -> None:
+        try:
+            players, teams = self.scorer.apply(ev)
+        except (KeyError, ValueError) as e:
+            log.warning("Discarding event %s: %s", ev, e)
+            return
+        if players or teams:
+            self._dirty_players |= players
+            self._dirty_teams |= teams
+            self._changed.set()
+
+    async def consume(self, source: AsyncIterator[Dict[str, Any]]) -> None:
+        async for ev in source:
+            self.handle_event(ev)
+
+    # -------------------- push --------------------
+    def _snapshot(self) -> Dict[str, Any]:
+        return {
+            "seq": self.seq,
+            "updated_at": datetime.now().isoformat(),
+            "standings": self.scorer.standings(),
+            "players": {p: round(v, 2) for p, v in sorted(self.scorer.player_totals.items())},
+        }
+
+    async def flush_loop(self) -> None:
+        """Raggruppa gli eventi in finestre di flush_interval: una scrittura/broadcast per finestra."""
+        while True:
+            await self._changed.wait()
+            await asyncio.sleep(self.flush_interval)
+            self._changed.clear()
+            self.seq += 1
+            delta = {
+                "seq": self.seq,
+                "teams": {t: round(self.scorer.team_totals[t], 2) for t in sorted(self._dirty_teams)},
+                "players": {p: round(self.scorer.player_totals[p], 2) for p in sorted(self._dirty_players)},
+            }
+            self._dirty_players.clear()
+            self._dirty_teams.clear()
+            atomic_write_json(self.out_path, self._snapshot())
+            await self._broadcast(delta)
+
+    async def _broadcast(self, msg: Dict[str, Any]) -> None:
+        line = (json.dumps(msg, ensure_ascii=False) + "\n").encode("utf-8")
+        for w in list(self._subscribers):
+            try:
+                w.write(line)
+                await w.drain()
+            except (ConnectionError, RuntimeError):
+                self._subscribers.discard(w)
+
+    async def serve_subscribers(self, host: str, port: int) -> asyncio.AbstractServer:
+        async def _handler(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            writer.write((json.dumps(self._snapshot(), ensure_ascii=False) + "\n").encode("utf-8"))
+            await writer.drain()
+            self._subscribers.add(writer)
+            try:
+                await reader.read()   # finché il client non chiude
+            finally:
+                self._subscribers.discard(writer)
+                writer.close()
+        return await asyncio.start_server(_handler, host, port)
+
+
+# -------------------- sorgenti eventi --------------------
+def _parse(line: str) -> Optional[Dict[str, Any]]:
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        log.warning("Bad event line: %r", line[:200])
+        return None
+
+
+async def tail_file(path: str, poll: float = 0.05, from_start: bool = True) -> AsyncIterator[Dict[str, Any]]:
+    """Segue un file JSONL (come tail -f); il file può non esistere ancora."""
+    p = Path(path)
+    while not p.exists():
+        await asyncio.sleep(poll)
+    with open(p, "r", encoding="utf-8") as f:
+        if not from_start:
+            f.seek(0, 2)
+        buf = ""
+        while True:
+            chunk = f.readline()
+            if not chunk:
+                await asyncio.sleep(poll)
+                continue
+            buf += chunk
+            if not buf.endswith("\n"):
+                continue   # riga scritta a metà
+            ev = _parse(buf)
+            buf = ""
+            if ev is not None:
+                yield ev
+
+
+async def listen_socket(service: LiveScoringService, host: str, port: int) -> asyncio.AbstractServer:
+    """Accetta connessioni che inviano eventi JSONL."""
+    async def _handler(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                ev = _parse(raw.decode("utf-8"))
+                if ev is not None:
+                    service.handle_event(ev)
+        finally:
+            writer.close()
+    return await asyncio.start_server(_handler, host, port)
+
+
+def _hostport(s: str) -> tuple:
+    host, _, port = s.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def load_scorer(teams_path: str, multipliers_path: Optional[str] = None) -> LiveScorer:
+    with open(teams_path, "r", encoding="utf-8") as f:
+        teams: List[Dict[str, Any]] = json.load(f)
+    mult_df = None
+    rankings: Dict[str, int] = {}
+    if multipliers_path:
+        table, report = load_multipliers(multipliers_path)
+        log.info("%s", report.summary())
+        mult_df = table.to_frame()
+        ranked = mult_df["ranking"].notna()
+        rankings = dict(zip(mult_df.loc[ranked, "player"], mult_df.loc[ranked, "ranking"].astype(int)))
+    return LiveScorer(teams, mult_df, rankings=rankings)
+
+
+async def _amain(args: argparse.Namespace) -> None:
+    service = LiveScoringService(load_scorer(args.teams, args.multipliers), args.out, args.flush_interval)
+    tasks = [asyncio.create_task(service.flush_loop())]
+    servers = []
+    if args.publish:
+        servers.append(await service.serve_subscribers(*_hostport(args.publish)))
+        log.info("Publishing updates on %s", args.publish)
+    if args.listen:
+        servers.append(await listen_socket(service, *_hostport(args.listen)))
+        log.info("Listening for events on %s", args.listen)
+    if args.tail:
+        tasks.append(asyncio.create_task(service.consume(tail_file(args.tail, from_start=not args.from_end))))
+        log.info("Tailing %s", args.tail)
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for s in servers:
+            s.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="FantaTennis live scoring")
+    ap.add_argument("--teams", required=True, help="teams.json (name, manager, players)")
+    ap.add_argument("--multipliers", default=None, help="ranking_multipliers.csv")
+    ap.add_argument("--tail", default=None, help="JSONL events file to follow")
+    ap.add_argument("--from-end", action="store_true", help="with --tail, skip events already in the file")
+    ap.add_argument("--listen", default=None, help="host:port accepting JSONL events")
+    ap.add_argument("--publish", default=None, help="host:port streaming JSON updates to subscribers")
+    ap.add_argument("--out", default=DEFAULT_OUT, help="live standings JSON for the user app")
+    ap.add_argument("--flush-interval", type=float, default=0.1)
+    args = ap.parse_args(argv)
+    if not args.tail and not args.listen:
+        ap.error("one of --tail or --listen is required")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        asyncio.run(_amain(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Diff a livello di riga tra due snapshot pubblicati, per chiave naturale.
+
+    diffs = diff_dirs(old_dir, new_dir)          # {tabella: DataFrame op/chiave/valori}
+    feed = change_feed(diffs, "20260406_085508", "20260412_173127")
+    new_df = apply_changes(old_df, feed["tables"]["standings"])
+
+Ogni riga è ridotta a (chiave, hash dei valori): un merge sulle chiavi e un confronto
+degli hash danno inserted/updated/deleted in tempo lineare; i valori delle colonne
+si confrontano solo per le righe aggiornate (per sapere quali colonne sono cambiate).
+Chiavi ripetute sono distinte dall'ordine di comparsa (_occ). Tutto è confrontato
+come testo, come nei CSV pubblicati.
+
+Il feed (changes.json) è compatto: insert = riga intera, update = chiave + colonne
+cambiate, delete = sola chiave.
+"""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import pandas as pd
+
+from ..compute.cube import CUBE_DIMENSIONS
+
+NATURAL_KEYS: Dict[str, List[str]] = {
+    "player_points": ["date", "id_player"],
+    "standings": ["date", "team_id"],
+    "team_points": ["date", "team_id"],
+    "team_rosters": ["team_id", "id_player"],
+    "md_players": ["id_player"],
+    "points_cube": list(CUBE_DIMENSIONS),
+}
+OPS = ("insert", "update", "delete")
+FEED_NAME = "changes.json"
+_OCC = "_occ"
+_HASH = "_h"
+
+
+def _read(path: Path) -> pd.DataFrame:
+    return pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[""], encoding="utf-8")
+
+
+def _text(df: pd.DataFrame, cols: List[str]) -> pd.DataFrame:
+    out = df.reindex(columns=cols).astype(object)
+    return out.where(out.notna(), "").astype(str)
+
+
+def _prepare(df: pd.DataFrame, key: List[str], values: List[str]) -> pd.DataFrame:
+    out = _text(df, key + values)
+    out[_OCC] = out.groupby(key, sort=False).cumcount()
+    out[_HASH] = pd.util.hash_pandas_object(out[values], index=False).to_numpy() if values else 0
+    return out
+
+
+def table_key(table: str, df: pd.DataFrame) -> Optional[List[str]]:
+    """Chiave naturale della tabella limitata alle colonne presenti (None se nessuna)."""
+    key = [c for c in NATURAL_KEYS.get(table, []) if c in df.columns]
+    return key or None
+
+
+def diff_frames(old: pd.DataFrame, new: pd.DataFrame, key: List[str]) -> pd.DataFrame:
+    """
+    Righe cambiate tra old e new: colonne op, chiave, _occ, valori (nuovi; vecchi per
+    le delete) e `changed` (colonne modificate, solo per gli update).
+    """
+    values = [c for c in new.columns if c not in key]
+    values += [c for c in old.columns if c not in key and c not in values]
+    o = _prepare(old, key, values)
+    n = _prepare(new, key, values)
+    k = key + [_OCC]
+
+    m = o[k + [_HASH]].reset_index().merge(
+        n[k + [_HASH]].reset_index(), on=k, how="outer", suffixes=("_old", "_new"), indicator=True
+    )
+    ins = m[m["_merge"] == "right_only"]
+    dele = m[m["_merge"] == "left_only"]
+    both = m[m["_merge"] == "both"]
+    upd = both[both[f"{_HASH}_old"] != both[f"{_HASH}_new"]]
+
+    parts = []
+    if len(ins):
+        parts.append(n.loc[ins["index_new"].astype(int), k + values].assign(op="insert", changed=""))
+    if len(upd):
+        new_rows = n.loc[upd["index_new"].astype(int), k + values].reset_index(drop=True)
+        old_vals = o.loc[upd["index_old"].astype(int), values].reset_index(drop=True)
+        diff_mask = new_rows[values].ne(old_vals)
+        changed = diff_mask.apply(lambda r: ",".join(c for c, d in r.items() if d), axis=1)
+        parts.append(new_rows.assign(op="update", changed=changed.to_numpy()))
+    if len(dele):
+        parts.append(o.loc[dele["index_old"].astype(int), k + values].assign(op="delete", changed=""))
+    cols = ["op"] + k + values + ["changed"]
+    if not parts:
+        return pd.DataFrame(columns=cols)
+    return pd.concat(parts, ignore_index=True)[cols]
+
+
+def diff_tables(old: Dict[str, pd.DataFrame], new: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """Diff di tutte le tabelle con chiave naturale presenti in almeno uno dei due lati."""
+    out: Dict[str, pd.DataFrame] = {}
+    for table in sorted(set(old) | set(new)):
+        o = old.get(table, pd.DataFrame())
+        n = new.get(table, pd.DataFrame())
+        key = table_key(table, n if not n.empty else o)
+        if key is None or not set(key) <= set(o.columns) | set(n.columns):
+            continue
+        o, n = (df.reindex(columns=list(df.columns) + [c for c in key if c not in df.columns]) for df in (o, n))
+        out[table] = diff_frames(o, n, key)
+    return out
+
+
+def read_tables(directory: Optional[Union[str, Path]], tables: Optional[Iterable[str]] = None) -> Dict[str, pd.DataFrame]:
+    if directory is None or not Path(directory).is_dir():
+        return {}
+    wanted = set(tables) if tables is not None else set(NATURAL_KEYS)
+    out = {}
+    for p in sorted(Path(directory).glob("*.csv")):
+        if p.stem in wanted:
+            try:
+                out[p.stem] = _read(p)
+            except (pd.errors.EmptyDataError, UnicodeDecodeError, pd.errors.ParserError):
+                continue
+    return out
+
+
+def diff_dirs(old_dir: Optional[Union[str, Path]], new_dir: Union[str, Path]) -> Dict[str, pd.DataFrame]:
+    """Diff tra due directory di CSV pubblicati (old_dir None = tutto inserito)."""
+    return diff_tables(read_tables(old_dir), read_tables(new_dir))
+
+
+def diff_summary(diffs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    rows = []
+    for table, d in diffs.items():
+        counts = d["op"].value_counts() if len(d) else {}
+        rows.append({"table": table, **{op: int(counts.get(op, 0)) for op in OPS}})
+    return pd.DataFrame(rows, columns=["table", *OPS])
+
+
+# -------------------- feed --------------------
+def change_feed(diffs: Dict[str, pd.DataFrame], from_version: Optional[str], to_version: str) -> Dict[str, Any]:
+    """Feed JSON compatto: per tabella chiave, insert (righe), update (chiave + colonne cambiate), delete (chiavi)."""
+    tables: Dict[str, Any] = {}
+    for table, d in diffs.items():
+        key = [c for c in d.columns if c not in ("op", "changed")]
+        key = key[: key.index(_OCC)]
+        values = [c for c in d.columns if c not in key + ["op", "changed", _OCC]]
+        entry: Dict[str, Any] = {"key": key, "insert": [], "update": [], "delete": []}
+        for rec in d.to_dict(orient="records"):
+            ident = {c: rec[c] for c in key}
+            if int(rec[_OCC]):
+                ident[_OCC] = int(rec[_OCC])
+            if rec["op"] == "insert":
+                entry["insert"].append({**ident, **{c: rec[c] for c in values}})
+            elif rec["op"] == "update":
+                entry["update"].append({**ident, **{c: rec[c] for c in rec["changed"].split(",") if c}})
+            else:
+                entry["delete"].append(ident)
+        tables[table] = entry
+    return {
+        "from": from_version,
+        "to": to_version,
+        "counts": {t: {op: len(e[op]) for op in OPS} for t, e in tables.items()},
+        "tables": tables,
+    }
+
+
+def write_feed(feed: Dict[str, Any], path: Union[str, Path]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(feed, f, ensure_ascii=False, separators=(",", ":"))
+
+
+def apply_changes(df: pd.DataFrame, table_feed: Dict[str, Any]) -> pd.DataFrame:
+    """Applica il feed di una tabella a una copia del DataFrame della versione `from`."""
+    key = list(table_feed["key"])
+    cols = list(df.columns)
+    for rec in table_feed.get("insert", []):
+        cols += [c for c in rec if c not in cols and c != _OCC]
+    out = _text(df, cols)
+    out[_OCC] = out.groupby(key, sort=False).cumcount()
+    out = out.set_index(key + [_OCC])
+
+    def _ix(rec: Dict[str, Any]) -> tuple:
+        return tuple(str(rec[c]) for c in key) + (int(rec.get(_OCC, 0)),)
+
+    dels = [_ix(r) for r in table_feed.get("delete", [])]
+    if dels:
+        out = out.drop(index=[i for i in dels if i in out.index])
+    for rec in table_feed.get("update", []):
+        ix = _ix(rec)
+        for c, v in rec.items():
+            if c not in key and c != _OCC:
+                out.loc[ix, c] = v
+    ins = table_feed.get("insert", [])
+    if ins:
+        add = pd.DataFrame(ins).reindex(columns=key + [_OCC] + [c for c in cols if c not in key])
+        add[_OCC] = add[_OCC].fillna(0).astype(int)
+        add = _text(add.drop(columns=[_OCC]), cols).assign(**{_OCC: add[_OCC].to_numpy()}).set_index(key + [_OCC])
+        out = pd.concat([out, add])
+    return out.reset_index().drop(columns=[_OCC])[cols]
@@ -0,0 +1,162 @@
+"""
+Metadati di integrità dei file pubblicati (righe, byte, sha256) calcolati mentre
+i file vengono scritti o copiati: nessuna rilettura con pandas.
+
+    stats = write_csv_stats(df, path)        # {"rows": ..., "bytes": ..., "sha256": ...}
+    stats = copy_with_stats(src, dst)        # copia in streaming + conteggio record CSV
+    ok = verify_file(path, stats)            # lato lettore: dimensione, poi sha256
+
+Le righe sono quelle che vedrebbe pd.read_csv: record CSV (campi quotati su più
+linee inclusi) meno l'intestazione, righe vuote escluse.
+"""
+from __future__ import annotations
+
+import csv
+import hashlib
+import io
+import os
+import shutil
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Optional, Union
+
+import pandas as pd
+
+CHUNK_BYTES = 1 << 20
+
+
+class _HashingWriter(io.RawIOBase):
+    """File binario in scrittura che aggiorna sha256 e conteggio byte."""
+
+    def __init__(self, out: BinaryIO):
+        self.out = out
+        self.sha = hashlib.sha256()
+        self.bytes = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self.sha.update(b)
+        self.bytes += len(b)
+        self.out.write(b)
+        return len(b)
+
+
+class _TeeReader(io.RawIOBase):
+    """File binario in lettura che copia quanto letto su `out` aggiornando sha256 e byte."""
+
+    def __init__(self, src: BinaryIO, out: Optional[BinaryIO] = None):
+        self.src = src
+        self.out = out
+        self.sha = hashlib.sha256()
+        self.bytes = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buf) -> int:
+        data = self.src.read(len(buf))
+        n = len(data)
+        buf[:n] = data
+        if n:
+            self.sha.update(data)
+            self.bytes += n
+            if self.out is not None:
+                self.out.write(data)
+        return n
+
+
+def _stats(rows: Optional[int], nbytes: int, sha: "hashlib._Hash") -> Dict[str, Any]:
+    return {"rows": rows, "bytes": int(nbytes), "sha256": sha.hexdigest()}
+
+
+def _count_records(tee: _TeeReader) -> Optional[int]:
+    text = io.TextIOWrapper(io.BufferedReader(tee, buffer_size=CHUNK_BYTES), encoding="utf-8", errors="replace", newline="")
+    try:
+        records = sum(1 for row in csv.reader(text) if row)
+    except csv.Error:
+        records = None
+    # il reader può fermarsi prima della fine (errore): consumo il resto per hash e copia
+    while tee.readinto(bytearray(CHUNK_BYTES)):
+        pass
+    text.detach()
+    return None if records is None else max(records - 1, 0)
+
+
+def write_csv_stats(df: pd.DataFrame, path: Union[str, Path], **to_csv_kwargs: Any) -> Dict[str, Any]:
+    """df.to_csv(path) che ritorna righe, byte e sha256 del file scritto."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    to_csv_kwargs.setdefault("index", False)
+    with open(path, "wb") as f:
+        w = _HashingWriter(f)
+        text = io.TextIOWrapper(w, encoding="utf-8", newline="", write_through=True)
+        df.to_csv(text, **to_csv_kwargs)
+        text.flush()
+        text.detach()
+    return _stats(int(len(df)), w.bytes, w.sha)
+
+
+def copy_with_stats(src: Union[str, Path], dst: Optional[Union[str, Path]] = None) -> Dict[str, Any]:
+    """
+    Copia src -> dst in streaming (dst None: solo statistiche) calcolando sha256, byte
+    e, per i CSV, il numero di righe nello stesso passaggio.
+    """
+    src = Path(src)
+    out = None
+    if dst is not None:
+        Path(dst).parent.mkdir(parents=True, exist_ok=True)
+        out = open(dst, "wb")
+    try:
+        with open(src, "rb") as f:
+            tee = _TeeReader(f, out)
+            if src.suffix.lower() == ".csv":
+                rows = _count_records(tee)
+            else:
+                rows = None
+                while tee.readinto(bytearray(CHUNK_BYTES)):
+                    pass
+    finally:
+        if out is not None:
+            out.close()
+    if dst is not None:
+        shutil.copystat(src, dst)
+    return _stats(rows, tee.bytes, tee.sha)
+
+
+def file_stats(path: Union[str, Path]) -> Optional[Dict[str, Any]]:
+    """Statistiche di un file esistente (None se manca)."""
+    path = Path(path)
+    if not path.is_file():
+        return None
+    return copy_with_stats(path)
+
+
+def verify_file(path: Union[str, Path], expected: Any) -> Optional[bool]:
+    """
+    Confronta un file con la voce del manifest: prima la dimensione (gratis), poi
+    sha256 in streaming. None se il manifest non ha metadati di integrità (formato
+    vecchio, solo righe).
+    """
+    if not isinstance(expected, dict) or "sha256" not in expected:
+        return None
+    path = Path(path)
+    if not path.is_file():
+        return False
+    if "bytes" in expected and os.path.getsize(path) != int(expected["bytes"]):
+        return False
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_BYTES), b""):
+            h.update(block)
+    return h.hexdigest() == expected["sha256"]
+
+
+def manifest_rows(files: Dict[str, Any]) -> int:
+    """Totale righe da manifest["files"], sia nel formato {nome: stats} sia {nome: righe}."""
+    total = 0
+    for v in files.values():
+        rows = v.get("rows") if isinstance(v, dict) else v
+        total += int(rows or 0)
+    return total
+
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import os
+import shutil
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+import pandas as pd
+
+from ..utils.fs import atomic_write_json, file_lock
+from .integrity import write_csv_stats
+
+
+class LatestPublisher:
+    """
+    data/public/latest come puntatore (symlink) a una versione immutabile:
+
+        data/public/.latest.versions/<version>/   file completi di una pubblicazione
+        data/public/latest -> .latest.versions/<version>
+
+    Ogni versione si prepara in una directory di staging; lo switch è un solo
+    os.replace del symlink, quindi un lettore vede sempre la versione vecchia o
+    quella nuova, mai un misto. Chi legge più file risolve il puntatore una volta
+    (resolve()) e legge tutto da lì: le ultime `keep` versioni restano su disco.
+    Un file lock serializza i publisher concorrenti (thread, job, daemon).
+
+    Dove i symlink non sono disponibili si ripiega su due rename (breve finestra
+    senza latest). Una latest che è ancora una directory vera viene migrata
+    alla prima pubblicazione.
+    """
+
+    def __init__(self, latest_dir: Union[str, Path], keep: int = 3, lock_timeout: Optional[float] = 120.0):
+        self.latest_dir = Path(latest_dir)
+        self.versions_dir = self.latest_dir.parent / f".{self.latest_dir.name}.versions"
+        self.lock_path = self.latest_dir.parent / f".{self.latest_dir.name}.lock"
+        self.keep = max(1, keep)
+        self.lock_timeout = lock_timeout
+
+    # -------------------- lettori --------------------
+    def resolve(self) -> Path:
+        """Directory reale della versione corrente (latest_dir se non è un symlink)."""
+        return resolve_latest(self.latest_dir)
+
+    def versions(self) -> List[str]:
+        if not self.versions_dir.exists():
+            return []
+        return sorted(p.name for p in self.versions_dir.iterdir() if p.is_dir() and ".staging" not in p.name)
+
+    # -------------------- publisher --------------------
+    @contextmanager
+    def stage(self, version: str, copy_current: bool = False) -> Iterator[Path]:
+        """
+        Lock + directory di staging per `version`; all'uscita senza eccezioni la
+        versione diventa latest. Con copy_current lo staging parte dai file correnti
+        (pubblicazioni parziali, es. solo master data).
+        """
+        with file_lock(self.lock_path, timeout=self.lock_timeout):
+            self.versions_dir.mkdir(parents=True, exist_ok=True)
+            staging = self.versions_dir / f"{version}.staging-{os.getpid()}"
+            if staging.exists():
+                shutil.rmtree(staging)
+            current = self.resolve()
+            if copy_current and current.is_dir():
+                shutil.copytree(current, staging)
+            else:
+                staging.mkdir(parents=True)
+            try:
+                yield staging
+            except BaseException:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+            target = self.versions_dir / version
+            if target.exists():
+                # stessa versione ripubblicata: la vecchia copia esce di scena dopo lo switch
+                old = self.versions_dir / f"{version}.staging-old-{os.getpid()}"
+                os.rename(target, old)
+                os.rename(staging, target)
+                self._switch(target)
+                shutil.rmtree(old, ignore_errors=True)
+            else:
+                os.rename(staging, target)
+                self._switch(target)
+            self._prune(keep_also=target.name)
+
+    def _switch(self, target: Path) -> None:
+        link = self.latest_dir
+        if link.exists() and not link.is_symlink():
+            # migrazione una tantum: la vecchia latest reale diventa una versione
+            legacy = self.versions_dir / "00000000_legacy"  # ordinata come la più vecchia
+            shutil.rmtree(legacy, ignore_errors=True)
+            os.rename(link, legacy)
+        tmp = link.parent / f".{link.name}.tmp-{os.getpid()}"
+        try:
+            if tmp.is_symlink() or tmp.exists():
+                tmp.unlink()
+            os.symlink(os.path.relpath(target, link.parent), tmp, target_is_directory=True)
+        except (OSError, NotImplementedError):
+            # niente symlink (es. Windows senza privilegi): copia + due rename
+            staging = link.parent / f".{link.name}.staging-{os.getpid()}"
+            shutil.rmtree(staging, ignore_errors=True)
+            shutil.copytree(target, staging)
+            old = link.parent / f".{link.name}.old-{os.getpid()}"
+            if link.exists():
+                os.rename(link, old)
+            os.rename(staging, link)
+            shutil.rmtree(old, ignore_errors=True)
+            return
+        os.replace(tmp, link)
+
+    def _prune(self, keep_also: str) -> None:
+        current = self.resolve().name
+        names = self.versions()
+        for name in names[:-self.keep]:
+            if name not in (current, keep_also):
+                shutil.rmtree(self.versions_dir / name, ignore_errors=True)
+        for p in self.versions_dir.glob("*.staging-*"):
+            # staging abbandonati da publisher morti (il lock è nostro: nessuno li sta usando)
+            shutil.rmtree(p, ignore_errors=True)
+
+
+def resolve_latest(latest_dir: Union[str, Path]) -> Path:
+    """Risolve il symlink latest (se lo è) alla directory della versione corrente."""
+    latest_dir = Path(latest_dir)
+    return latest_dir.resolve() if latest_dir.is_symlink() else latest_dir
+
+
+def publish_local(
+    datasets: Dict[str, pd.DataFrame],
+    latest_dir: Union[str, Path],
+    snapshots_dir: Union[str, Path],
+    version: Optional[str] = None,
+    extra_manifest: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Pubblica in locale:
+      - <snapshots_dir>/<version>/*.csv + changes.json + manifest.json
+      - <latest_dir> -> la stessa versione, switch atomico (vedi LatestPublisher)
+    Il feed changes.json è calcolato rispetto alla latest precedente, come nel publish admin.
+    """
+    from .pipeline import write_change_feed
+
+    snapshots_dir = Path(snapshots_dir)
+    version = version or datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    publisher = LatestPublisher(latest_dir)
+    with publisher.stage(version) as staging:
+        files: Dict[str, Dict[str, Any]] = {}
+        for name, df in datasets.items():
+            fname = f"{name}.csv"
+            files[fname] = write_csv_stats(df, staging / fname)
+        changes = write_change_feed(staging, publisher.resolve(), version)
+
+        manifest: Dict[str, Any] = {
+            "version": version,
+            "updated_at": datetime.now().isoformat(),
+            "files": files,
+            "changes": changes,
+        }
+        if extra_manifest:
+            manifest.update(extra_manifest)
+        atomic_write_json(staging / "manifest.json", manifest)
+
+        snapshot_dir = snapshots_dir / version
+        if snapshot_dir.exists():
+            shutil.rmtree(snapshot_dir)
+        shutil.copytree(staging, snapshot_dir)
+
+    return {"version": version, "snapshot_dir": str(snapshot_dir), "manifest": manifest}
@@ -0,0 +1,93 @@
+"""
+Passi comuni a compute/publish dell'admin e al daemon di ingest: entrambe le strade
+devono produrre la stessa data/public/latest.
+
+    marts = results_marts(results, md, rosters)          # player/team/standings + cubo
+    marts.update(classic_marts(root))                    # scoring classico (se ci sono risultati)
+    ... scrittura dei file nello staging di LatestPublisher ...
+    changes = write_change_feed(staging, publisher.resolve(), version)
+    sync_analytics(snapshots_dir, analytics_db)          # dopo la copia in snapshots/
+"""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+import pandas as pd
+
+from ..compute.build_marts import build_scoring_marts
+from ..compute.cube import build_points_cube, cube_facts_from_results
+from ..compute.match_points import player_points_from_results, team_marts
+from ..compute.multipliers import MultiplierStore
+from ..config import RepoPaths
+from ..io.local_files import read_classic_inputs
+from ..io.snapshot_db import SnapshotDB
+from .diff import FEED_NAME, change_feed, diff_dirs, write_feed
+
+# marts dello scoring classico scritti in processed/marts; quelli pubblici vanno anche in latest
+CLASSIC_MARTS = ("player_tournament_stats", "lineup_hindsight")
+PUBLIC_CLASSIC_MARTS = ("lineup_hindsight",)
+
+
+def results_marts(
+    results: pd.DataFrame,
+    md: pd.DataFrame,
+    rosters: pd.DataFrame,
+    player_points: Optional[pd.DataFrame] = None,
+) -> Dict[str, pd.DataFrame]:
+    """
+    results(date, winner_id, loser_id) già mappati -> player_points, team_points,
+    standings, points_cube. `player_points` si passa se già calcolato (il daemon lo
+    accumula dai facts per file).
+    """
+    if player_points is None:
+        player_points = player_points_from_results(results)
+    team_points, standings = team_marts(player_points, rosters)
+    return {
+        "player_points": player_points,
+        "team_points": team_points,
+        "standings": standings,
+        "points_cube": build_points_cube(*cube_facts_from_results(results, md, rosters)),
+    }
+
+
+def classic_marts(root: Union[str, Path] = ".", paths: RepoPaths = RepoPaths()) -> Dict[str, pd.DataFrame]:
+    """
+    Marts CLASSIC_MARTS dai risultati di stagione del repo (partizioni o results.csv),
+    con lo storico moltiplicatori per le righe datate; {} se non ci sono risultati.
+    """
+    results, teams, multipliers = read_classic_inputs(root, paths)
+    if results.empty:
+        return {}
+    history = MultiplierStore.load(Path(root) / paths.multiplier_history_csv)
+    return build_scoring_marts(results, multipliers, teams, marts=CLASSIC_MARTS, history=history)
+
+
+def write_change_feed(staging: Path, previous: Optional[Path], version: str) -> Dict[str, Any]:
+    """
+    changes.json della versione in staging rispetto a `previous` (la latest ancora
+    pubblicata: va chiamata sotto il lock del publisher). Ritorna la voce "changes"
+    del manifest.
+    """
+    previous = previous if previous is not None and previous.is_dir() else None
+    previous_version = None
+    if previous is not None and (previous / "manifest.json").exists():
+        try:
+            with open(previous / "manifest.json", "r", encoding="utf-8") as f:
+                previous_version = json.load(f).get("version")
+        except (OSError, json.JSONDecodeError):
+            previous_version = None
+    feed = change_feed(diff_dirs(previous, staging), previous_version, version)
+    write_feed(feed, Path(staging) / FEED_NAME)
+    return {"from": feed["from"], "file": FEED_NAME, "counts": feed["counts"]}
+
+
+def sync_analytics(snapshots_dir: Union[str, Path], db_path: Union[str, Path]) -> int:
+    """Carica nel DB analitico gli snapshot che ancora mancano; ritorna quanti."""
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    db = SnapshotDB(db_path)
+    try:
+        return len(db.sync(snapshots_dir))
+    finally:
+        db.close()
@@ -0,0 +1,273 @@
+"""
+Retention e compattazione di data/public/snapshots.
+
+Politica (RetentionPolicy), per età rispetto a `now`:
+  - ultimi keep_all_days giorni:        tutti gli snapshot restano directory
+  - fino a daily_days giorni:           l'ultimo snapshot di ogni giorno
+  - fino a weekly_days giorni (o oltre): l'ultimo di ogni settimana ISO
+  - più vecchi di weekly_days:          nessuno resta directory
+Lo snapshot più recente non viene mai compattato.
+
+Gli altri vengono "piegati" nello storico compresso:
+    snapshots/_history/<tabella>.csv.gz     righe di tutti gli snapshot + colonna snapshot_id
+Una tabella identica (stesso sha256) a quella di uno snapshot già nello storico non
+viene ricopiata: l'indice registra solo `same_as` (es. md_players, uguale da settimane).
+
+snapshots/index.json elenca ogni snapshot con la sua posizione ("dir" o "history"),
+i file e il manifest. load_snapshot()/load_history() leggono in modo trasparente da
+directory o storico; SnapshotDB.sync carica anche gli snapshot presenti solo nello storico.
+
+CLI: python -m ft_backend.publish.retention --snapshots data/public/snapshots --keep-all-days 7 --dry-run
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import re
+import shutil
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import pandas as pd
+
+from ..utils.fs import atomic_write_bytes, atomic_write_json
+
+HISTORY_DIR = "_history"
+INDEX_NAME = "index.json"
+SNAPSHOT_ID_FORMAT = "%Y%m%d_%H%M%S"
+
+_ID_RE = re.compile(r"^\d{8}_\d{6}$")
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    keep_all_days: int = 7
+    daily_days: int = 30
+    weekly_days: Optional[int] = None  # None = settimanali per sempre
+
+
+def snapshot_time(snapshot_id: str) -> datetime:
+    return datetime.strptime(snapshot_id, SNAPSHOT_ID_FORMAT)
+
+
+def plan_retention(snapshot_ids: Iterable[str], policy: RetentionPolicy, now: Optional[datetime] = None) -> Dict[str, str]:
+    """snapshot_id -> "all" | "daily" | "weekly" (restano directory) oppure "fold"."""
+    now = now or datetime.now()
+    ids = sorted(s for s in snapshot_ids if _ID_RE.match(s))
+    out: Dict[str, str] = {}
+    last_of: Dict[Any, str] = {}
+    for sid in ids:
+        age = now - snapshot_time(sid)
+        if age <= timedelta(days=policy.keep_all_days):
+            out[sid] = "all"
+            continue
+        out[sid] = "fold"
+        ts = snapshot_time(sid)
+        if age <= timedelta(days=policy.daily_days):
+            bucket = ("daily", ts.date())
+        elif policy.weekly_days is None or age <= timedelta(days=policy.weekly_days):
+            bucket = ("weekly",) + tuple(ts.isocalendar()[:2])
+        else:
+            continue
+        last_of[bucket] = sid  # ids ordinati: resta l'ultimo del giorno/settimana
+    for bucket, sid in last_of.items():
+        out[sid] = bucket[0]
+    if ids and out[ids[-1]] == "fold":
+        out[ids[-1]] = "latest"
+    return out
+
+
+# -------------------- indice e storico --------------------
+def read_index(snapshots_dir: Union[str, Path]) -> Dict[str, Any]:
+    path = Path(snapshots_dir) / INDEX_NAME
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"snapshots": {}}
+
+
+def _history_path(snapshots_dir: Path, table: str) -> Path:
+    return snapshots_dir / HISTORY_DIR / f"{table}.csv.gz"
+
+
+def _read_table(path: Path) -> pd.DataFrame:
+    return pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[""], encoding="utf-8")
+
+
+def _read_history(snapshots_dir: Path, table: str) -> pd.DataFrame:
+    path = _history_path(snapshots_dir, table)
+    if not path.exists():
+        return pd.DataFrame(columns=["snapshot_id"])
+    return pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[""], compression="gzip")
+
+
+def _write_history(snapshots_dir: Path, table: str, df: pd.DataFrame) -> None:
+    buf = io.BytesIO()
+    # mtime=0: stesso contenuto -> stessi byte (diff/commit puliti)
+    with gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=9, mtime=0) as gz:
+        gz.write(df.to_csv(index=False).encode("utf-8"))
+    atomic_write_bytes(_history_path(snapshots_dir, table), buf.getvalue())
+
+
+def _read_manifest(snapshot_dir: Path) -> Dict[str, Any]:
+    mpath = snapshot_dir / "manifest.json"
+    if not mpath.exists():
+        return {}
+    try:
+        with open(mpath, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _dir_size(p: Path) -> int:
+    return sum(f.stat().st_size for f in p.rglob("*") if f.is_file())
+
+
+def load_history(
+    snapshots_dir: Union[str, Path], table: str, snapshot_ids: Optional[Iterable[str]] = None
+) -> pd.DataFrame:
+    """Righe di `table` per gli snapshot compattati (tutti o quelli richiesti), con snapshot_id."""
+    snapshots_dir = Path(snapshots_dir)
+    entries = read_index(snapshots_dir)["snapshots"]
+    wanted = set(snapshot_ids) if snapshot_ids is not None else None
+    # snapshot richiesto -> snapshot che contiene davvero le righe
+    source: Dict[str, str] = {}
+    for sid, e in entries.items():
+        if e.get("location") != "history" or (wanted is not None and sid not in wanted):
+            continue
+        t = e.get("tables", {}).get(table)
+        if t is not None:
+            source[sid] = t.get("same_as") or sid
+    if not source:
+        return pd.DataFrame(columns=["snapshot_id"])
+    hist = _read_history(snapshots_dir, table)
+    hist = hist[hist["snapshot_id"].isin(set(source.values()))]
+    parts = []
+    for sid, src in sorted(source.items()):
+        rows = hist[hist["snapshot_id"] == src]
+        parts.append(rows.assign(snapshot_id=sid))
+    return pd.concat(parts, ignore_index=True)
+
+
+def load_snapshot(snapshots_dir: Union[str, Path], snapshot_id: str, table: str) -> Optional[pd.DataFrame]:
+    """Una tabella di uno snapshot, da directory se c'è ancora, altrimenti dallo storico."""
+    snapshots_dir = Path(snapshots_dir)
+    p = snapshots_dir / snapshot_id / f"{table}.csv"
+    if p.exists():
+        return _read_table(p)
+    df = load_history(snapshots_dir, table, [snapshot_id])
+    return None if df.empty else df.drop(columns=["snapshot_id"])
+
+
+# -------------------- compattazione --------------------
+def compact_snapshots(
+    snapshots_dir: Union[str, Path],
+    policy: Optional[RetentionPolicy] = None,
+    now: Optional[datetime] = None,
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    """
+    Applica la politica: piega nello storico gli snapshot non trattenuti, aggiorna
+    index.json e solo alla fine rimuove le directory piegate (un'interruzione lascia
+    al massimo directory già nello storico, ripulite al giro successivo).
+    """
+    snapshots_dir = Path(snapshots_dir)
+    policy = policy or RetentionPolicy()
+    index = read_index(snapshots_dir)
+    entries: Dict[str, Any] = index.setdefault("snapshots", {})
+
+    dirs = {p.name: p for p in snapshots_dir.iterdir() if p.is_dir() and _ID_RE.match(p.name)} if snapshots_dir.exists() else {}
+    plan = plan_retention(dirs, policy, now)
+    fold = [sid for sid in sorted(dirs) if plan.get(sid) == "fold"]
+    report: Dict[str, Any] = {
+        "policy": asdict(policy),
+        "plan": {sid: plan[sid] for sid in sorted(dirs)},
+        "folded": fold,
+        "bytes_before": sum(_dir_size(p) for p in dirs.values()),
+        "history_rows": {},
+    }
+    if dry_run:
+        return report
+
+    # sha256 delle tabelle già nello storico -> snapshot che le contiene
+    known: Dict[str, Dict[str, str]] = {}
+    for sid, e in sorted(entries.items()):
+        if e.get("location") != "history":
+            continue
+        for table, t in e.get("tables", {}).items():
+            if not t.get("same_as"):
+                known.setdefault(table, {})[t["sha256"]] = sid
+
+    new_rows: Dict[str, List[pd.DataFrame]] = {}
+    for sid in fold:
+        if entries.get(sid, {}).get("location") == "history":
+            continue  # già piegato da un giro interrotto: resta solo da rimuovere la directory
+        d = dirs[sid]
+        tables: Dict[str, Any] = {}
+        for p in sorted(d.glob("*.csv")):
+            b = p.read_bytes()
+            sha = hashlib.sha256(b).hexdigest()
+            same = known.get(p.stem, {}).get(sha)
+            if same is not None:
+                tables[p.stem] = {"sha256": sha, "same_as": same}
+                continue
+            try:
+                df = pd.read_csv(io.BytesIO(b), dtype=str, keep_default_na=False, na_values=[""], encoding="utf-8")
+            except (pd.errors.EmptyDataError, UnicodeDecodeError, pd.errors.ParserError):
+                continue
+            df.insert(0, "snapshot_id", sid)
+            new_rows.setdefault(p.stem, []).append(df)
+            known.setdefault(p.stem, {})[sha] = sid
+            tables[p.stem] = {"sha256": sha, "rows": int(len(df))}
+        entries[sid] = {"location": "history", "tables": tables, "manifest": _read_manifest(d)}
+
+    for table, frames in new_rows.items():
+        hist = pd.concat([_read_history(snapshots_dir, table)] + frames, ignore_index=True)
+        _write_history(snapshots_dir, table, hist)
+        report["history_rows"][table] = int(len(hist))
+
+    for sid, d in dirs.items():
+        if sid not in fold:
+            entries[sid] = {
+                "location": "dir",
+                "tables": {p.stem: {"bytes": p.stat().st_size} for p in sorted(d.glob("*.csv"))},
+                "manifest": _read_manifest(d),
+            }
+    index["snapshots"] = dict(sorted(entries.items()))
+    index["updated_at"] = datetime.now().isoformat(timespec="seconds")
+    index["policy"] = asdict(policy)
+    atomic_write_json(snapshots_dir / INDEX_NAME, index)
+
+    for sid in fold:
+        shutil.rmtree(dirs[sid], ignore_errors=True)
+    hist_dir = snapshots_dir / HISTORY_DIR
+    report["bytes_after"] = sum(_dir_size(p) for sid, p in dirs.items() if sid not in fold) + (
+        _dir_size(hist_dir) if hist_dir.exists() else 0
+    )
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Fold old published snapshots into a compressed history")
+    ap.add_argument("--snapshots", default="data/public/snapshots")
+    ap.add_argument("--keep-all-days", type=int, default=7)
+    ap.add_argument("--daily-days", type=int, default=30)
+    ap.add_argument("--weekly-days", type=int, default=None, help="default: weekly snapshots kept forever")
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args(argv)
+
+    policy = RetentionPolicy(args.keep_all_days, args.daily_days, args.weekly_days)
+    report = compact_snapshots(args.snapshots, policy, dry_run=args.dry_run)
+    for sid, why in report["plan"].items():
+        print(f"{sid}  {why}")
+    print(f"folded {len(report['folded'])} snapshot(s); bytes {report['bytes_before']} -> {report.get('bytes_after', '-')}")
+
+
+if __name__ == "__main__":
+    main()
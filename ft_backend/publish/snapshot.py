@@ -4,10 +4,11 @@ from __future__ import annotations
 import hashlib
 import json
 from dataclasses import dataclass
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Optional, Tuple
 import pandas as pd
 
-from ..io.github_store import GitHubStore
+from ..io.stores import Store
+from ..utils.instrumentation import RunMetrics
 
 
 def _sha256(b: bytes) -> str:
@@ -27,12 +28,13 @@ def build_manifest(files: Dict[str, bytes]) -> Dict[str, Any]:
 
 
 def publish_snapshot(
-    store: GitHubStore,
+    store: Store,
     snapshot_prefix: str,
     latest_prefix: str,
     datasets: Dict[str, pd.DataFrame],
     latest_json_path: str,
     message_prefix: str = "Publish snapshot",
+    metrics: Optional[RunMetrics] = None,
 ) -> Dict[str, Any]:
     """
     Scrive:
@@ -41,24 +43,42 @@ def publish_snapshot(
       - manifest.json in entrambi
       - latest.json puntatore
     """
-    files_bytes: Dict[str, bytes] = {}
-    for name, df in datasets.items():
-        b = df.to_csv(index=False).encode("utf-8")
-        files_bytes[f"{snapshot_prefix}/{name}.csv"] = b
-        files_bytes[f"{latest_prefix}/{name}.csv"] = b
+    metrics = metrics or RunMetrics("publish")
 
-    manifest = build_manifest(files_bytes)
-    manifest_b = json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8")
-    files_bytes[f"{snapshot_prefix}/manifest.json"] = manifest_b
-    files_bytes[f"{latest_prefix}/manifest.json"] = manifest_b
+    with metrics.stage("publish", rows_in=sum(len(df) for df in datasets.values())) as m:
+        files_bytes: Dict[str, bytes] = {}
+        for name, df in datasets.items():
+            b = df.to_csv(index=False).encode("utf-8")
+            files_bytes[f"{snapshot_prefix}/{name}.csv"] = b
+            files_bytes[f"{latest_prefix}/{name}.csv"] = b
+
+        manifest = build_manifest(files_bytes)
+        for name, df in datasets.items():
+            for prefix in (snapshot_prefix, latest_prefix):
+                manifest["files"][f"{prefix}/{name}.csv"]["rows"] = int(len(df))
+        # publish/upload sono ancora aperti: nel manifest finiscono gli stage già chiusi (normalize, score, marts)
+        manifest["stage_metrics"] = metrics.summary()
+        manifest_b = json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8")
+        files_bytes[f"{snapshot_prefix}/manifest.json"] = manifest_b
+        files_bytes[f"{latest_prefix}/manifest.json"] = manifest_b
+        m.rows_out = len(files_bytes)
 
     # write all
-    for path, b in files_bytes.items():
-        store.write_bytes(path, b, f"{message_prefix}: {path}")
+    with metrics.stage("upload", rows_in=len(files_bytes)) as m:
+        for path, b in files_bytes.items():
+            store.write_bytes(path, b, f"{message_prefix}: {path}")
+            m.add_written(b)
 
-    # write latest.json
-    latest_obj = {"latest_snapshot": snapshot_prefix}
-    store.write_bytes(latest_json_path, json.dumps(latest_obj, ensure_ascii=False, indent=2).encode("utf-8"),
-                     f"{message_prefix}: update latest.json")
+        # write latest.json
+        latest_obj = {"latest_snapshot": snapshot_prefix}
+        latest_b = json.dumps(latest_obj, ensure_ascii=False, indent=2).encode("utf-8")
+        store.write_bytes(latest_json_path, latest_b, f"{message_prefix}: update latest.json")
+        m.add_written(latest_b)
+        m.rows_out = len(files_bytes) + 1
 
-    return {"snapshot_prefix": snapshot_prefix, "latest_prefix": latest_prefix, "manifest": manifest}
+    return {
+        "snapshot_prefix": snapshot_prefix,
+        "latest_prefix": latest_prefix,
+        "manifest": manifest,
+        "metrics": metrics.summary(),
+    }
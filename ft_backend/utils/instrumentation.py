@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+try:  # non disponibile su Windows
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+
+def peak_rss_kb() -> Optional[int]:
+    """Picco RSS del processo in KB (None se la piattaforma non lo espone)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KB, macOS: bytes
+    if sys.platform == "darwin":
+        peak //= 1024
+    return int(peak)
+
+
+def _size_of(obj: Union[bytes, str, os.PathLike, int, None]) -> int:
+    if obj is None:
+        return 0
+    if isinstance(obj, int):
+        return obj
+    if isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    p = Path(obj)
+    return int(p.stat().st_size) if p.exists() else 0
+
+
+@dataclass
+class StageMetrics:
+    stage: str
+    started_at: str = ""
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    peak_rss_kb: Optional[int] = None
+    rows_in: Optional[int] = None
+    rows_out: Optional[int] = None
+    bytes_read: int = 0
+    bytes_written: int = 0
+    status: str = "ok"
+    error: Optional[str] = None
+
+    def add_read(self, obj: Union[bytes, str, os.PathLike, int, None]) -> None:
+        """Accetta bytes, un path (usa la size su disco) o un intero."""
+        self.bytes_read += _size_of(obj)
+
+    def add_written(self, obj: Union[bytes, str, os.PathLike, int, None]) -> None:
+        self.bytes_written += _size_of(obj)
+
+    def fail(self, error: str) -> str:
+        """Esito negativo senza eccezione (return anticipato nel blocco); ritorna il messaggio."""
+        self.status = "error"
+        self.error = error
+        return error
+
+
+class RunMetrics:
+    """
+    Raccoglie le metriche di una run della pipeline (normalize, score, marts, publish, upload).
+
+    Uso:
+        metrics = RunMetrics("compute")
+        with metrics.stage("score", rows_in=len(df)) as m:
+            out = add_fantapoints(df, mult)
+            m.rows_out = len(out)
+            if out.empty:
+                return False, m.fail("no rows")   # uscita anticipata: lo stage resta "error"
+        metrics.write_report(paths.stage_reports_dir)
+    """
+
+    def __init__(self, kind: str, run_id: Optional[str] = None):
+        self.kind = kind
+        self.run_id = run_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.created_at = datetime.now().isoformat()
+        self.stages: List[StageMetrics] = []
+
+    @contextmanager
+    def stage(self, name: str, rows_in: Optional[int] = None) -> Iterator[StageMetrics]:
+        m = StageMetrics(stage=name, started_at=datetime.now().isoformat(), rows_in=rows_in)
+        wall0 = time.perf_counter()
+        cpu0 = time.process_time()
+        try:
+            yield m
+        except BaseException as e:
+            m.status = "error"
+            m.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            m.wall_s = round(time.perf_counter() - wall0, 6)
+            m.cpu_s = round(time.process_time() - cpu0, 6)
+            m.peak_rss_kb = peak_rss_kb()
+            self.stages.append(m)
+
+    def instrument(self, name: str) -> Callable:
+        """Decorator: misura la funzione come stage; se ritorna un DataFrame registra rows_out."""
+        def deco(fn: Callable) -> Callable:
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.stage(name) as m:
+                    out = fn(*args, **kwargs)
+                    if hasattr(out, "shape"):
+                        m.rows_out = int(out.shape[0])
+                    return out
+            return wrapper
+        return deco
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "kind": self.kind,
+            "created_at": self.created_at,
+            "stages": [asdict(s) for s in self.stages],
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """Versione compatta per il manifest pubblicato."""
+        return summarize_report(self.to_dict())
+
+    def write_report(self, reports_dir: Union[str, os.PathLike]) -> Path:
+        """Scrive <reports_dir>/<run_id>_<kind>.json e ritorna il path."""
+        d = Path(reports_dir)
+        d.mkdir(parents=True, exist_ok=True)
+        path = d / f"{self.run_id}_{self.kind}.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        return path
+
+
+def latest_report(reports_dir: Union[str, os.PathLike], kind: str) -> Optional[Dict[str, Any]]:
+    """Ultimo report scritto per il tipo di run (es. 'compute'), o None."""
+    files = sorted(Path(reports_dir).glob(f"*_{kind}.json"))
+    if not files:
+        return None
+    try:
+        with open(files[-1], "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def summarize_report(report: Dict[str, Any]) -> Dict[str, Any]:
+    """Riassunto compatto (per il manifest) di un report già scritto su disco."""
+    stages = report.get("stages", []) or []
+    return {
+        "run_id": report.get("run_id"),
+        "kind": report.get("kind"),
+        "total_wall_s": round(sum(float(s.get("wall_s") or 0) for s in stages), 6),
+        "stages": {
+            s["stage"]: {
+                "wall_s": s.get("wall_s"),
+                "cpu_s": s.get("cpu_s"),
+                "rows_out": s.get("rows_out"),
+                "bytes_written": s.get("bytes_written"),
+                "status": s.get("status"),
+            }
+            for s in stages
+        },
+    }
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+from ft_backend.compute.build_marts import add_fantapoints
+from ft_backend.compute.multipliers import MultiplierStore
+from ft_backend.io.multipliers import load_multipliers
+
+
+def _results(players):
+    return pd.DataFrame({
+        "Season": 2025,
+        "Tournament": "Australian Open",
+        "Tournament Type": "Slam",
+        "Giocatore": players,
+        "Round Reached": "R32",
+        "Matches Won": 1,
+        "Matches Lost": 1,
+    })
+
+
+def test_id_only_file_scores_names_at_default():
+    mult = pd.DataFrame({
+        "id_player": ["p1", "p2"],
+        "Moltiplicatore Bonus": [1.5, 2.0],
+        "Moltiplicatore Malus": [0.5, 0.8],
+    })
+    table, report = load_multipliers(mult)
+    assert report.loaded == 2
+
+    bonus, malus = table.lookup_names(pd.Series(["Sinner", "Alcaraz"]))
+    assert bonus.tolist() == [1.0, 1.0] and malus.tolist() == [1.0, 1.0]
+    bonus, _ = table.lookup_ids(pd.Series(["p2", "p9"]))
+    assert bonus.tolist() == [2.0, 1.0]
+
+    out = add_fantapoints(_results(["Sinner", "Alcaraz"]), mult)
+    assert out["BonusMultiplier"].tolist() == [1.0, 1.0]
+
+
+def test_duplicate_and_empty_ids_use_last_row_and_are_reported():
+    mult = pd.DataFrame({
+        "Giocatore": ["Sinner", "Alcaraz", "Zverev", "Medvedev"],
+        "id_player": ["p1", "p1", "", ""],
+        "Moltiplicatore Bonus": [1.5, 2.0, 1.2, 1.3],
+        "Moltiplicatore Malus": [0.5, 0.8, 0.9, 0.7],
+    })
+    table, report = load_multipliers(mult)
+    assert report.loaded == 4
+    assert report.duplicates == ["id_player p1"]
+
+    bonus, malus = table.lookup_ids(pd.Series(["p1", "", "p9"]))
+    assert bonus.tolist() == [2.0, 1.0, 1.0]
+    assert malus.tolist() == [0.8, 1.0, 1.0]
+
+    # i nomi restano tutti raggiungibili
+    bonus, _ = table.lookup_names(pd.Series(["zverev", "Medvedev", "Sinner"]))
+    assert np.allclose(bonus, [1.2, 1.3, 1.5])
+    assert table.ids_for_names(pd.Series(["Medvedev", "Alcaraz", "Nadal"])).tolist() == ["", "p1", ""]
+
+
+def _version(ids, bonus):
+    return pd.DataFrame({
+        "id_player": ids,
+        "Moltiplicatore Bonus": bonus,
+        "Moltiplicatore Malus": 1.0,
+    })
+
+
+def test_add_version_closes_players_dropped_from_the_file():
+    history = MultiplierStore()
+    assert history.add_version(_version(["p1", "p2"], [1.5, 2.0]), "2025-01-01") == 2
+    # p2 sparisce dal file: il suo intervallo si chiude, p1 resta com'è
+    assert history.add_version(_version(["p1"], [1.5]), "2025-03-01") == 1
+
+    ids = pd.Series(["p2", "p2", "p1"])
+    dates = pd.Series(pd.to_datetime(["2025-02-01", "2025-04-01", "2025-04-01"]))
+    bonus, _ = history.lookup(ids, dates)
+    assert bonus.tolist() == [2.0, 1.0, 1.5]
+
+    # rientra: nuova riga aperta
+    assert history.add_version(_version(["p1", "p2"], [1.5, 3.0]), "2025-05-01") == 1
+    bonus, _ = history.lookup(pd.Series(["p2"]), pd.Series(pd.to_datetime(["2025-06-01"])))
+    assert bonus.tolist() == [3.0]
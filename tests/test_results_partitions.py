@@ -0,0 +1,117 @@
+import json
+
+import pandas as pd
+
+from ft_backend.io.results_partitions import PartitionedResults
+from ft_backend.io.stores import CachedStore, MemoryStore
+from ft_backend.io.write_queue import WriteBehindQueue
+
+INDEX = "data/results/index.json"
+
+
+def _rows(season, tournament, players, **extra):
+    df = pd.DataFrame({
+        "Season": season,
+        "Tournament": tournament,
+        "Tournament Type": "Slam",
+        "Giocatore": players,
+        "Round Reached": "R32",
+        "Matches Won": 1,
+        "Matches Lost": 1,
+    })
+    for col, value in extra.items():
+        df[col] = value
+    return df
+
+
+def _seed(store):
+    parts = PartitionedResults(store, legacy_path=None)
+    parts.save(_rows(2025, "Australian Open", ["A", "B"]))
+    return parts
+
+
+def _kinds(store):
+    index = json.loads(store.files[INDEX].decode("utf-8"))
+    return [(p["tournament"], p["kind"]) for p in index["partitions"]]
+
+
+def test_commit_merges_index_updated_after_load():
+    store = MemoryStore()
+    _seed(store)
+    a = PartitionedResults(store, legacy_path=None)
+    b = PartitionedResults(store, legacy_path=None)
+    df_a, df_b = a.load(), b.load()
+
+    a.save(pd.concat([df_a, _rows(2025, "Roland Garros", ["C"])], ignore_index=True))
+    b.save(pd.concat([df_b, _rows(2025, "Wimbledon", ["D"])], ignore_index=True))
+
+    out = PartitionedResults(store, legacy_path=None).load()
+    assert set(out["Tournament"]) == {"Australian Open", "Roland Garros", "Wimbledon"}
+    assert len(out) == 4
+
+
+def test_commit_bypasses_a_stale_cached_index():
+    backend = MemoryStore()
+    _seed(backend)
+    # due processi: ognuno con la propria cache davanti allo stesso backend
+    a = PartitionedResults(CachedStore(backend), legacy_path=None)
+    b = PartitionedResults(CachedStore(backend), legacy_path=None)
+    df_a, df_b = a.load(), b.load()
+
+    a.save(pd.concat([df_a, _rows(2025, "Roland Garros", ["C"])], ignore_index=True))
+    b.save(pd.concat([df_b, _rows(2025, "Wimbledon", ["D"])], ignore_index=True))
+
+    out = PartitionedResults(backend, legacy_path=None).load()
+    assert set(out["Tournament"]) == {"Australian Open", "Roland Garros", "Wimbledon"}
+
+
+def test_queued_commits_from_different_sessions_are_not_coalesced():
+    store = MemoryStore()
+    _seed(store)
+    queue = WriteBehindQueue(store, delay=0.05)
+    sessions = []
+    for name, tournament in (("s1", "Roland Garros"), ("s2", "Wimbledon")):
+        parts = PartitionedResults(store, legacy_path=None)
+        df = pd.concat([parts.load(), _rows(2025, tournament, [name])], ignore_index=True)
+        sessions.append((parts, df, f"{INDEX}#{name}"))
+    for parts, df, key in sessions:
+        queue.submit(INDEX, lambda parts=parts, df=df: parts.commit(df), "index", key=key)
+    assert queue.flush(timeout=5)
+
+    out = PartitionedResults(store, legacy_path=None).load()
+    assert set(out["Tournament"]) == {"Australian Open", "Roland Garros", "Wimbledon"}
+
+
+def test_same_key_still_coalesces():
+    store = MemoryStore()
+    queue = WriteBehindQueue(store, delay=0.2)
+    queue.submit("a.txt", b"1", "first", key="a.txt#s1")
+    queue.submit("a.txt", b"2", "second", key="a.txt#s1")
+    assert queue.flush(timeout=5)
+    assert store.files["a.txt"] == b"2"
+    assert store.commits == [("a.txt", "second")]
+
+
+def test_new_column_does_not_rewrite_saved_tournaments():
+    store = MemoryStore()
+    _seed(store)
+    parts = PartitionedResults(store, legacy_path=None)
+    df = parts.load()
+    # torneo in formato stats: colonne nuove che gli altri tornei non hanno
+    new = _rows(2025, "Wimbledon", ["C", "D"], match_id=["m1", "m2"], Aces=[3, 7])
+    parts.save(pd.concat([df, new], ignore_index=True))
+
+    assert _kinds(store) == [("Australian Open", "append"), ("Wimbledon", "append")]
+
+
+def test_changed_row_still_rewrites_its_tournament():
+    store = MemoryStore()
+    _seed(store)
+    parts = PartitionedResults(store, legacy_path=None)
+    df = parts.load()
+    df.loc[df["Giocatore"] == "B", "Matches Won"] = 3
+    parts.save(df)
+
+    assert _kinds(store)[-1] == ("Australian Open", "full")
+    out = PartitionedResults(store, legacy_path=None).load()
+    assert out.loc[out["Giocatore"] == "B", "Matches Won"].tolist() == [3]